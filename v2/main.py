@@ -1,8 +1,32 @@
 import sys
 import json
 import os
-from PyQt5.QtCore import Qt, QPoint, QSettings, QPropertyAnimation, QEasingCurve, QUrl
-from PyQt5.QtGui import QIcon, QColor, QIntValidator
+import shlex
+import time
+import datetime
+import threading
+import traceback
+import logging
+import functools
+import html
+import inspect
+import uuid
+import hashlib
+import asyncio
+import urllib.parse
+import http.server
+import socket
+import ssl
+import statistics
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import RotatingFileHandler
+import importlib.util
+from collections import Counter, deque
+from PyQt5.QtCore import Qt, QPoint, QRect, QSettings, QEasingCurve, QUrl, QEventLoop
+from PyQt5.QtCore import QObject, QTimer, QProcess, QProcessEnvironment, QFileSystemWatcher, QFile, QIODevice, QEvent, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QIcon, QColor, QIntValidator, QPixmap, QPainter, QRegion, QImage
 from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtGui import QFontDatabase, QFont
 from PyQt5.QtWidgets import (
@@ -15,78 +39,3807 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QH
                              QLabel, QLineEdit, QListWidget, QStackedWidget, QSystemTrayIcon, 
                              QMenu, QStyle, QDialog, QSlider, QColorDialog, QCheckBox, QSizePolicy,
                              QMessageBox)# 你问我为啥又来一遍，我只能史山代码不想动了
-from PyQt5.QtWidgets import QListWidgetItem
-from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings
+from PyQt5.QtWidgets import QListWidgetItem, QComboBox, QPlainTextEdit, QGraphicsOpacityEffect
+from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEngineSettings, QWebEngineScript, QWebEngineProfile, QWebEnginePage
+from PyQt5.QtWebEngineCore import QWebEngineUrlRequestInterceptor, QWebEngineUrlRequestInfo
+from PyQt5.QtWebChannel import QWebChannel
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket, QNetworkAccessManager, QNetworkRequest, QNetworkConfigurationManager
+from PyQt5.QtWebSockets import QWebSocket
+try:
+    # QtDBus 只在 Linux 上可用，没有时不检测锁屏
+    from PyQt5.QtDBus import QDBusConnection, QDBusMessage, QDBusPendingCallWatcher, QDBusPendingReply
+except ImportError:
+    QDBusConnection = None
+try:
+    import psutil  # 可选依赖，没有时 CPU 小部件读取 /proc/stat
+except ImportError:
+    psutil = None
 # 这是v2版本
 # 配置文件路径
 CONFIG_FILE = "web_widgets_config.json"
 
-class DraggableWebView(QWebEngineView):
-    def __init__(self, url, opacity=1.0, bg_color="#00000000", x=100, y=100, width=400, height=300, always_on_top=True, parent=None):
+def read_config_file(path=CONFIG_FILE):
+    """读取配置文件，返回 (全局设置, 小部件列表)，兼容只有小部件列表的旧版格式"""
+    with open(path, "r") as f:
+        return config_from_data(json.load(f))
+
+def config_from_data(data):
+    # 旧版配置文件只有小部件列表
+    if isinstance(data, list):
+        data = {"settings": {}, "web_widgets": data}
+    if not isinstance(data, dict):
+        raise ValueError("配置文件格式不正确")
+    return data.get("settings", {}), data.get("web_widgets", [])
+
+def new_widget_id():
+    """小部件的稳定编号，配置热更新时按编号比较差异"""
+    return uuid.uuid4().hex[:8]
+
+# 性能追踪：设置环境变量 PYGLASSPANE_TRACE=1 开启
+# 关闭时 traced() 直接返回原函数，页面加载信号也不会连接，可以放心留在正式版本里
+TRACE_ENABLED = os.environ.get("PYGLASSPANE_TRACE") == "1"
+TRACE_BUFFER_SIZE = 100000
+
+class Tracer:
+    """用环形缓冲区记录追踪事件，导出为 Chrome trace JSON（可用 Perfetto 打开）"""
+
+    def __init__(self, capacity):
+        self.events = deque(maxlen=capacity)
+        self.pid = os.getpid()
+        self.origin = time.perf_counter()
+
+    def now_us(self):
+        return (time.perf_counter() - self.origin) * 1000000
+
+    def complete(self, name, start_us, duration_us, cat="slot", args=None):
+        self.events.append(("X", name, cat, start_us, duration_us, threading.get_ident(), None, args))
+
+    def async_event(self, phase, name, event_id, cat="page", args=None):
+        """异步事件：b 开始、n 中间步骤、e 结束，同一 id 的事件会画在同一条轨道上"""
+        self.events.append((phase, name, cat, self.now_us(), None, threading.get_ident(), event_id, args))
+
+    def export(self, path):
+        trace_events = []
+        for phase, name, cat, ts, duration, tid, event_id, args in list(self.events):
+            event = {"ph": phase, "name": name, "cat": cat, "ts": ts, "pid": self.pid, "tid": tid}
+            if duration is not None:
+                event["dur"] = duration
+            if event_id is not None:
+                event["id"] = event_id
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return len(trace_events)
+
+TRACER = Tracer(TRACE_BUFFER_SIZE) if TRACE_ENABLED else None
+
+def traced(name=None, cat="slot"):
+    """给函数加一个追踪区间，追踪关闭时原样返回函数"""
+    def decorator(func):
+        if not TRACE_ENABLED:
+            return func
+        label = name or func.__qualname__
+        # 和 PyQt 一样丢掉槽函数接收不了的多余信号参数（比如 clicked 的 checked）
+        params = inspect.signature(func).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in params):
+            limit = None
+        else:
+            limit = sum(1 for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = TRACER.now_us()
+            try:
+                return func(*args[:limit], **kwargs)
+            finally:
+                TRACER.complete(label, start, TRACER.now_us() - start, cat)
+        return wrapper
+    return decorator
+
+# 合成路径：从开销最小到最大
+COMPOSITION_OPAQUE = "opaque"                  # 完全不透明，不需要任何透明合成
+COMPOSITION_WINDOW_OPACITY = "window_opacity"  # 背景不透明，整窗统一透明度
+COMPOSITION_PER_PIXEL = "per_pixel_alpha"      # 背景带透明，需要逐像素透明合成
+
+def parse_color(bg_color):
+    """解析配置里的颜色，支持 #AARRGGBB（颜色选择器写入的格式）和 rgba(r, g, b, a)"""
+    text = str(bg_color).strip()
+    if text.startswith("rgba(") and text.endswith(")"):
+        parts = [p.strip() for p in text[5:-1].split(",")]
+        try:
+            r, g, b = (int(float(v)) for v in parts[:3])
+            alpha = 255
+            if len(parts) > 3:
+                # 透明度的范围按写法判断：百分比、带小数点或不大于 1 的是 0-1（CSS），大于 1 的整数是 0-255，
+                # 和 Qt 样式表的理解一致；颜色选择器改为写入 #AARRGGBB，旧版写入的 rgba(..., 1) 无法区分
+                value = parts[3]
+                if value.endswith("%"):
+                    alpha = float(value[:-1]) * 255 / 100
+                elif "." in value or float(value) <= 1:
+                    alpha = float(value) * 255
+                else:
+                    alpha = float(value)
+        except ValueError:
+            return QColor(0, 0, 0, 0)
+        return QColor(r, g, b, max(0, min(255, int(round(alpha)))))
+    color = QColor(text)
+    return color if color.isValid() else QColor(0, 0, 0, 0)
+
+def choose_composition(opacity, bg_color):
+    """根据透明度和背景色选择开销最小的合成路径"""
+    if parse_color(bg_color).alpha() < 255:
+        return COMPOSITION_PER_PIXEL
+    if opacity < 1.0:
+        return COMPOSITION_WINDOW_OPACITY
+    return COMPOSITION_OPAQUE
+
+# 数据总线推送的合批间隔（约一帧）
+DATA_BUS_FLUSH_MS = 16
+
+# 注入页面的订阅封装：pyglass.subscribe(topic, callback)
+# 收到的增量在 requestAnimationFrame 里合并后再回调，一帧最多回调一次
+DATA_BUS_CLIENT_JS = """
+(function () {
+    if (window.pyglass) return;
+    var handlers = {}, state = {}, dirty = {}, scheduled = false, bus = null, pending = [];
+
+    function flush() {
+        scheduled = false;
+        var topics = Object.keys(dirty);
+        dirty = {};
+        topics.forEach(function (topic) {
+            (handlers[topic] || []).forEach(function (cb) { cb(state[topic], topic); });
+        });
+    }
+
+    function apply(batch) {
+        JSON.parse(batch).forEach(function (msg) {
+            if ("full" in msg) {
+                state[msg.topic] = msg.full;
+            } else {
+                var current = state[msg.topic] || {};
+                Object.assign(current, msg.set || {});
+                (msg.del || []).forEach(function (key) { delete current[key]; });
+                state[msg.topic] = current;
+            }
+            dirty[msg.topic] = true;
+        });
+        if (!scheduled) {
+            scheduled = true;
+            requestAnimationFrame(flush);
+        }
+    }
+
+    window.pyglass = {
+        subscribe: function (topic, cb) {
+            (handlers[topic] = handlers[topic] || []).push(cb);
+            if (bus) bus.subscribe(topic); else pending.push(topic);
+            if (topic in state) cb(state[topic], topic);
+        },
+        unsubscribe: function (topic) {
+            delete handlers[topic];
+            if (bus) bus.unsubscribe(topic);
+        }
+    };
+
+    new QWebChannel(qt.webChannelTransport, function (channel) {
+        bus = channel.objects.pyglassBus;
+        bus.updates.connect(apply);
+        pending.forEach(function (topic) { bus.subscribe(topic); });
+        pending = [];
+    });
+})();
+"""
+
+def decode_payload(text):
+    """数据源输出优先按JSON解析，否则当作纯文本"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text.strip()
+
+def build_data_bus_script():
+    """组装注入页面的数据总线脚本（qwebchannel.js + 订阅封装）"""
+    source = QFile(":/qtwebchannel/qwebchannel.js")
+    if not source.open(QIODevice.ReadOnly):
+        print("无法读取 qwebchannel.js，数据总线不可用")
+        return None
+    channel_js = bytes(source.readAll()).decode("utf-8")
+    source.close()
+
+    script = QWebEngineScript()
+    script.setName("pyglass-data-bus")
+    script.setSourceCode(channel_js + DATA_BUS_CLIENT_JS)
+    script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+    script.setWorldId(QWebEngineScript.MainWorld)
+    script.setRunsOnSubFrames(False)
+    return script
+
+class DataSource(QObject):
+    """数据总线的上游数据源，同一个主题只有一个实例在轮询"""
+    data_ready = pyqtSignal(str, object)
+
+    def __init__(self, topic, config, parent=None):
+        super().__init__(parent)
+        self.topic = topic
+        self.config = config
+        self.last_mtime = None
+        self.process = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(config.get("interval", 1000)))
+        self.timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.timer.start()
+        self.poll()
+
+    def stop(self):
+        self.timer.stop()
+        if self.process and self.process.state() != QProcess.NotRunning:
+            self.process.kill()
+
+    def poll(self):
+        kind = self.config.get("type")
+        if kind == "file":
+            self.poll_file()
+        elif kind == "command":
+            self.poll_command()
+
+    def poll_file(self):
+        """文件数据源：修改时间变化时才重新读取"""
+        path = self.config.get("path", "")
+        try:
+            mtime = os.path.getmtime(path)
+            if mtime == self.last_mtime:
+                return
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except OSError as e:
+            print(f"读取数据源 {self.topic} 出错: {e}")
+            return
+        self.last_mtime = mtime
+        self.data_ready.emit(self.topic, decode_payload(text))
+
+    def poll_command(self):
+        """命令数据源：异步执行，上一次还没结束就跳过本轮"""
+        if self.process and self.process.state() != QProcess.NotRunning:
+            return
+        args = shlex.split(self.config.get("command", ""), posix=(os.name != "nt"))
+        if not args:
+            return
+        self.process = QProcess(self)
+        self.process.finished.connect(self.on_command_finished)
+        self.process.start(args[0], args[1:])
+
+    def on_command_finished(self):
+        output = bytes(self.process.readAllStandardOutput()).decode("utf-8", "replace")
+        self.data_ready.emit(self.topic, decode_payload(output))
+
+class DataBus(QObject):
+    """Python 侧的数据总线：按主题分发数据，同一主题的所有订阅者共用一个数据源"""
+
+    def __init__(self, sources=None, socket_name=None, parent=None):
+        super().__init__(parent)
+        self.source_configs = {s["topic"]: s for s in (sources or []) if "topic" in s}
+        self.sources = {}       # 主题 -> 正在运行的数据源（只在有订阅者时存在）
+        self.subscribers = {}   # 主题 -> 订阅该主题的桥接对象
+        self.values = {}        # 主题 -> 最新数据
+        self.server = None
+        self.clients = {}
+        if socket_name:
+            self.listen(socket_name)
+
+    def listen(self, socket_name):
+        """本地套接字：外部程序每行写一个 {"topic": ..., "data": ...}"""
+        QLocalServer.removeServer(socket_name)
+        self.server = QLocalServer(self)
+        if not self.server.listen(socket_name):
+            print(f"数据总线无法监听 {socket_name}: {self.server.errorString()}")
+            return
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            self.clients[conn] = b""
+            conn.readyRead.connect(lambda c=conn: self.on_client_data(c))
+            conn.disconnected.connect(lambda c=conn: self.clients.pop(c, None))
+
+    def on_client_data(self, conn):
+        buffer = self.clients.get(conn, b"") + bytes(conn.readAll())
+        *lines, rest = buffer.split(b"\n")
+        self.clients[conn] = rest
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                message = json.loads(line.decode("utf-8"))
+                self.publish(message["topic"], message.get("data"))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"数据总线收到无效消息: {e}")
+
+    def subscribe(self, bridge, topic):
+        subscribers = self.subscribers.setdefault(topic, set())
+        first = not subscribers
+        subscribers.add(bridge)
+        if topic in self.values:
+            bridge.queue(topic, self.values[topic])
+        # 第一个订阅者出现时才启动上游数据源
+        if first and topic in self.source_configs:
+            source = DataSource(topic, self.source_configs[topic], self)
+            source.data_ready.connect(self.publish)
+            self.sources[topic] = source
+            source.start()
+
+    def unsubscribe(self, bridge, topic):
+        subscribers = self.subscribers.get(topic)
+        if not subscribers:
+            return
+        subscribers.discard(bridge)
+        # 最后一个订阅者离开时停止数据源
+        if not subscribers:
+            del self.subscribers[topic]
+            source = self.sources.pop(topic, None)
+            if source:
+                source.stop()
+                source.deleteLater()
+
+    def unsubscribe_all(self, bridge):
+        for topic in list(self.subscribers):
+            self.unsubscribe(bridge, topic)
+
+    def publish(self, topic, data):
+        self.values[topic] = data
+        for bridge in list(self.subscribers.get(topic, ())):
+            bridge.queue(topic, data)
+
+    def shutdown(self):
+        for source in self.sources.values():
+            source.stop()
+        self.sources = {}
+        self.subscribers = {}
+        if self.server:
+            self.server.close()
+
+class DataBusBridge(QObject):
+    """注册到 QWebChannel 的桥接对象，每个网页小部件一个"""
+    updates = pyqtSignal(str)
+
+    def __init__(self, bus, parent=None):
+        super().__init__(parent)
+        self.bus = bus
+        self.sent = {}      # 主题 -> 上次推给页面的数据，用于计算增量
+        self.pending = {}   # 主题 -> 等待推送的数据
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(DATA_BUS_FLUSH_MS)
+        self.flush_timer.timeout.connect(self.flush)
+
+    @pyqtSlot(str)
+    def subscribe(self, topic):
+        # 页面重新订阅时要发完整数据
+        self.sent.pop(topic, None)
+        self.bus.subscribe(self, topic)
+
+    @pyqtSlot(str)
+    def unsubscribe(self, topic):
+        self.bus.unsubscribe(self, topic)
+
+    def reset(self):
+        """页面重新加载后，之前的订阅全部失效"""
+        self.bus.unsubscribe_all(self)
+        self.sent = {}
+        self.pending = {}
+
+    def queue(self, topic, data):
+        self.pending[topic] = data
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        batch = []
+        for topic, data in self.pending.items():
+            previous = self.sent.get(topic)
+            if isinstance(previous, dict) and isinstance(data, dict):
+                changed = {k: v for k, v in data.items() if k not in previous or previous[k] != v}
+                removed = [k for k in previous if k not in data]
+                if not changed and not removed:
+                    continue
+                batch.append({"topic": topic, "set": changed, "del": removed})
+            elif topic in self.sent and previous == data:
+                continue
+            else:
+                batch.append({"topic": topic, "full": data})
+            self.sent[topic] = data
+        self.pending = {}
+        if batch:
+            self.updates.emit(json.dumps(batch))
+
+# DevTools 性能采集：类型 -> (菜单名称, 文件扩展名)
+DEVTOOLS_CAPTURE_KINDS = {
+    "cpu": ("CPU 性能分析", "cpuprofile"),
+    "heap": ("堆快照", "heapsnapshot"),
+    "trace": ("性能追踪", "json"),
+}
+DEVTOOLS_CAPTURE_DIR = "devtools_captures"
+DEVTOOLS_TRACE_CATEGORIES = [
+    "devtools.timeline", "disabled-by-default-devtools.timeline", "disabled-by-default-devtools.timeline.frame",
+    "v8.execute", "blink.user_timing", "loading", "latencyInfo",
+]
+
+class CdpSession(QObject):
+    """与单个调试目标的 Chrome DevTools Protocol 连接"""
+    closed = pyqtSignal()
+
+    def __init__(self, ws_url, parent=None):
+        super().__init__(parent)
+        self.next_id = 1
+        self.callbacks = {}       # 请求 id -> 回调(result, error)
+        self.event_handlers = {}  # 事件名 -> 回调(params)
+        self.queued = []          # 连接建立前发送的消息
+        self.connected = False
+        self.socket = QWebSocket()
+        self.socket.setParent(self)
+        self.socket.connected.connect(self.on_connected)
+        self.socket.disconnected.connect(self.closed.emit)
+        self.socket.textMessageReceived.connect(self.on_message)
+        self.socket.open(QUrl(ws_url))
+
+    def send(self, method, params=None, callback=None):
+        message_id = self.next_id
+        self.next_id += 1
+        if callback:
+            self.callbacks[message_id] = callback
+        text = json.dumps({"id": message_id, "method": method, "params": params or {}})
+        if self.connected:
+            self.socket.sendTextMessage(text)
+        else:
+            self.queued.append(text)
+
+    def on(self, event, handler):
+        self.event_handlers[event] = handler
+
+    def on_connected(self):
+        self.connected = True
+        for text in self.queued:
+            self.socket.sendTextMessage(text)
+        self.queued = []
+
+    def on_message(self, text):
+        message = json.loads(text)
+        if "id" in message:
+            callback = self.callbacks.pop(message["id"], None)
+            if callback:
+                callback(message.get("result", {}), message.get("error"))
+        elif message.get("method") in self.event_handlers:
+            self.event_handlers[message["method"]](message.get("params", {}))
+
+    def close(self):
+        self.socket.close()
+
+class DevToolsCapture(QObject):
+    """驱动 CDP 采集 CPU 性能分析、堆快照或性能追踪，完成后写入文件"""
+    finished = pyqtSignal(str)   # 文件路径
+    failed = pyqtSignal(str)     # 错误信息
+
+    def __init__(self, ws_url, kind, seconds, path, parent=None):
+        super().__init__(parent)
+        self.kind = kind
+        self.seconds = seconds
+        self.path = path
+        self.chunks = []
+        self.session = CdpSession(ws_url, self)
+
+    def start(self):
+        if self.kind == "cpu":
+            self.session.send("Profiler.enable")
+            self.session.send("Profiler.start", callback=self.check_error)
+            QTimer.singleShot(int(self.seconds * 1000), self.stop_cpu_profile)
+        elif self.kind == "heap":
+            self.session.on("HeapProfiler.addHeapSnapshotChunk", lambda params: self.chunks.append(params["chunk"]))
+            self.session.send("HeapProfiler.enable")
+            self.session.send("HeapProfiler.takeHeapSnapshot", {"reportProgress": False}, self.on_heap_done)
+        elif self.kind == "trace":
+            self.session.on("Tracing.dataCollected", lambda params: self.chunks.extend(params.get("value", [])))
+            self.session.on("Tracing.tracingComplete", self.on_trace_complete)
+            self.session.send("Tracing.start", {
+                "transferMode": "ReportEvents",
+                "traceConfig": {"includedCategories": DEVTOOLS_TRACE_CATEGORIES},
+            }, self.check_error)
+            QTimer.singleShot(int(self.seconds * 1000), lambda: self.session.send("Tracing.end"))
+
+    def check_error(self, result, error):
+        if error:
+            self.fail(error.get("message", str(error)))
+
+    def stop_cpu_profile(self):
+        self.session.send("Profiler.stop", callback=self.on_cpu_done)
+
+    def on_cpu_done(self, result, error):
+        if error:
+            self.fail(error.get("message", str(error)))
+            return
+        self.write(json.dumps(result.get("profile", {})))
+
+    def on_heap_done(self, result, error):
+        if error:
+            self.fail(error.get("message", str(error)))
+            return
+        self.write("".join(self.chunks))
+
+    def on_trace_complete(self, params):
+        self.write(json.dumps({"traceEvents": self.chunks}))
+
+    def write(self, text):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(text)
+        except OSError as e:
+            self.fail(str(e))
+            return
+        self.session.close()
+        self.finished.emit(self.path)
+
+    def fail(self, message):
+        self.session.close()
+        self.failed.emit(message)
+
+class CdpNetworkMeter(QObject):
+    """通过 CDP 网络事件统计单个页面的收发字节数，交给 BandwidthMeter；
+    连接建立后页面内的估算不再计入，连接断开后退回估算"""
+
+    def __init__(self, ws_url, meter, parent=None):
+        super().__init__(parent)
+        self.meter = meter
+        self.received = {}      # 请求 id -> 已经按数据块计入的字节数
+        self.session = CdpSession(ws_url, self)
+        self.session.closed.connect(self.on_closed)
+        self.session.on("Network.requestWillBeSent", self.on_request)
+        self.session.on("Network.dataReceived", self.on_data)
+        self.session.on("Network.loadingFinished", self.on_finished)
+        self.session.on("Network.loadingFailed", lambda params: self.received.pop(params.get("requestId"), None))
+        self.session.on("Network.webSocketFrameReceived", self.on_frame)
+        self.session.on("Network.webSocketFrameSent", self.on_frame)
+        self.session.send("Network.enable", callback=self.on_enabled)
+
+    def on_enabled(self, result, error):
+        if error:
+            self.session.close()
+            return
+        self.meter.set_source(BANDWIDTH_SOURCE_NETWORK)
+
+    def add(self, size):
+        if size > 0:
+            self.meter.add_bytes(size, BANDWIDTH_SOURCE_NETWORK)
+
+    def on_request(self, params):
+        # 请求体很大时 CDP 不附带 postData，只能统计附带的部分
+        body = params.get("request", {}).get("postData")
+        if body:
+            self.add(len(body.encode("utf-8")))
+
+    def on_data(self, params):
+        # 流媒体边下载边计入，不用等请求结束
+        size = params.get("encodedDataLength", 0)
+        if size:
+            request_id = params.get("requestId")
+            self.received[request_id] = self.received.get(request_id, 0) + size
+            self.add(size)
+
+    def on_finished(self, params):
+        # 数据块的 encodedDataLength 可能是 0（网络服务在独立进程时），以结束时的总数补上差额
+        self.add(params.get("encodedDataLength", 0) - self.received.pop(params.get("requestId"), 0))
+
+    def on_frame(self, params):
+        self.add(len(params.get("response", {}).get("payloadData", "").encode("utf-8")))
+
+    def on_closed(self):
+        self.meter.set_source(BANDWIDTH_SOURCE_ESTIMATE)
+
+    def close(self):
+        """视图销毁前调用，之后不再回写统计"""
+        self.session.closed.disconnect(self.on_closed)
+        self.session.close()
+
+class DevToolsClient(QObject):
+    """把小部件对应到本机远程调试端口上的 DevTools 目标，并发起性能采集"""
+    notify = pyqtSignal(str, str)
+
+    def __init__(self, port, capture_seconds=5, parent=None):
+        super().__init__(parent)
+        self.port = port
+        self.capture_seconds = capture_seconds
+        self.network = QNetworkAccessManager(self)
+        self.captures = set()
+
+    def marker_script(self, view_id):
+        """在页面里写入小部件编号，网址相同的多个目标靠它区分"""
+        script = QWebEngineScript()
+        script.setName("pyglass-devtools-marker")
+        script.setSourceCode(f"window.__pyglassViewId = {json.dumps(view_id)};")
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        return script
+
+    def find_target(self, view, callback, quiet=False):
+        """异步查询 /json/list，找到小部件对应的调试目标后回调 callback(target)；quiet 为 True 时找不到不提示"""
+        reply = self.network.get(QNetworkRequest(QUrl(f"http://127.0.0.1:{self.port}/json/list")))
+        reply.finished.connect(lambda: self.on_target_list(reply, view, callback, quiet))
+
+    def on_target_list(self, reply, view, callback, quiet=False):
+        try:
+            targets = json.loads(bytes(reply.readAll()).decode("utf-8"))
+        except ValueError:
+            targets = []
+        finally:
+            reply.deleteLater()
+        url = view.url().toString()
+        candidates = [t for t in targets if t.get("type") == "page" and t.get("url") == url]
+        if not candidates:
+            if not quiet:
+                self.notify.emit("DevTools", f"找不到 {url} 对应的调试目标，请确认调试端口 {self.port} 已启用")
+            return
+        if len(candidates) == 1:
+            callback(candidates[0])
+            return
+        # 网址相同的目标有多个，逐个读取页面里的小部件编号
+        for target in candidates:
+            session = CdpSession(target["webSocketDebuggerUrl"], self)
+            session.send("Runtime.evaluate", {"expression": "window.__pyglassViewId", "returnByValue": True},
+                         lambda result, error, t=target, s=session: self.on_marker(result, t, s, view, callback))
+
+    def on_marker(self, result, target, session, view, callback):
+        session.close()
+        session.deleteLater()
+        if result.get("result", {}).get("value") == view.view_id:
+            callback(target)
+
+    def inspector_url(self, target):
+        """本机调试端口自带的 DevTools 前端，不需要联网"""
+        ws = target["webSocketDebuggerUrl"].replace("ws://", "")
+        return f"http://127.0.0.1:{self.port}/devtools/inspector.html?ws={ws}"
+
+    def copy_inspector_url(self, view):
+        def on_target(target):
+            url = self.inspector_url(target)
+            QApplication.clipboard().setText(url)
+            self.notify.emit("DevTools", f"已复制调试地址: {url}")
+        self.find_target(view, on_target)
+
+    def capture(self, view, kind):
+        label, extension = DEVTOOLS_CAPTURE_KINDS[kind]
+
+        def on_target(target):
+            name = "".join(c if c.isalnum() else "_" for c in view.url().host()) or "page"
+            path = os.path.join(DEVTOOLS_CAPTURE_DIR, f"{name}_{kind}_{time.strftime('%Y%m%d_%H%M%S')}.{extension}")
+            job = DevToolsCapture(target["webSocketDebuggerUrl"], kind, self.capture_seconds, path, self)
+            self.captures.add(job)
+            job.finished.connect(lambda p: self.on_capture_done(job, f"{label}已保存到 {os.path.abspath(p)}"))
+            job.failed.connect(lambda message: self.on_capture_done(job, f"{label}失败: {message}"))
+            job.start()
+            if kind != "heap":
+                self.notify.emit("DevTools", f"正在采集{label}，{self.capture_seconds} 秒后保存")
+        self.find_target(view, on_target)
+
+    def meter_network(self, view):
+        """给小部件接上网络层流量统计"""
+        def on_target(target):
+            view.network_meter = CdpNetworkMeter(target["webSocketDebuggerUrl"], view.meter, view)
+        self.find_target(view, on_target, quiet=True)
+
+    def on_capture_done(self, job, message):
+        self.captures.discard(job)
+        job.deleteLater()
+        self.notify.emit("DevTools", message)
+
+# 命名存储分区的默认存放目录
+PROFILE_ROOT = "profiles"
+DEFAULT_PROFILE_LABEL = "默认"
+
+def directory_size(path):
+    """统计目录占用的字节数"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+class ProfileManager(QObject):
+    """命名存储分区：每个分区有独立的持久化目录、Cookie 和缓存配额，按需创建并被小部件共用"""
+    usage_ready = pyqtSignal(dict)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.profiles = {}   # 名称 -> QWebEngineProfile
+
+    @staticmethod
+    def storage_path(name, config):
+        return os.path.abspath(config.get("storage_path") or os.path.join(PROFILE_ROOT, name))
+
+    def get(self, name, config):
+        """没有名称时使用默认配置，否则第一次用到时才创建"""
+        if not name:
+            return QWebEngineProfile.defaultProfile()
+        if name in self.profiles:
+            return self.profiles[name]
+        path = self.storage_path(name, config)
+        profile = QWebEngineProfile(name, self)
+        profile.setPersistentStoragePath(os.path.join(path, "storage"))
+        profile.setCachePath(os.path.join(path, "cache"))
+        profile.setHttpCacheType(QWebEngineProfile.DiskHttpCache)
+        quota_mb = config.get("cache_quota_mb")
+        if quota_mb:
+            profile.setHttpCacheMaximumSize(int(quota_mb * 1024 * 1024))
+        if config.get("persistent_cookies", True):
+            profile.setPersistentCookiesPolicy(QWebEngineProfile.ForcePersistentCookies)
+        else:
+            profile.setPersistentCookiesPolicy(QWebEngineProfile.NoPersistentCookies)
+        self.profiles[name] = profile
+        return profile
+
+    def measure_usage(self, configs):
+        """在后台线程统计各分区的磁盘占用，结果通过 usage_ready 发回"""
+        paths = {name: self.storage_path(name, config) for name, config in configs.items()}
+
+        def worker():
+            self.usage_ready.emit({name: directory_size(path) for name, path in paths.items()})
+        threading.Thread(target=worker, name="profile-usage", daemon=True).start()
+
+# 用户片段：编译成 QWebEngineScript，在文档创建时注入，首帧之前生效
+SNIPPET_SCRIPT_PREFIX = "pyglass-snippet-"
+
+# CSS 片段包装成脚本插入 <style>，文档还没有根节点时等它出现
+CSS_SNIPPET_JS = """
+(function () {
+    var id = %(id)s;
+    if (document.getElementById(id)) return;
+    var style = document.createElement("style");
+    style.id = id;
+    style.textContent = %(css)s;
+    function attach() {
+        var target = document.head || document.documentElement;
+        if (!target) return false;
+        target.appendChild(style);
+        return true;
+    }
+    if (!attach()) {
+        new MutationObserver(function (_, observer) {
+            if (attach()) observer.disconnect();
+        }).observe(document, {childList: true, subtree: true});
+    }
+})();
+"""
+
+class SnippetRegistry:
+    """按内容去重的用户片段编译缓存，相同内容的片段在所有小部件间只编译一次"""
+
+    def __init__(self):
+        self.compiled = {}   # 内容摘要 -> QWebEngineScript
+
+    def compile(self, kind, source):
+        digest = hashlib.sha1(f"{kind}:{source}".encode("utf-8")).hexdigest()[:16]
+        if digest in self.compiled:
+            return self.compiled[digest]
+        name = SNIPPET_SCRIPT_PREFIX + digest
+        if kind == "css":
+            code = CSS_SNIPPET_JS % {"id": json.dumps(name), "css": json.dumps(source)}
+        else:
+            code = source
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setSourceCode(code)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.ApplicationWorld)
+        script.setRunsOnSubFrames(False)
+        self.compiled[digest] = script
+        return script
+
+    def scripts_for(self, widget, shared_snippets):
+        """小部件引用的共享片段加上它自己的 CSS/JS，同名引用只算一次"""
+        sources = []
+        for name in widget.get("snippets", []):
+            snippet = shared_snippets.get(name)
+            if snippet is None:
+                print(f"未找到共享片段: {name}")
+                continue
+            sources.append(("css", snippet.get("css", "")))
+            sources.append(("js", snippet.get("js", "")))
+        sources.append(("css", widget.get("user_css", "")))
+        sources.append(("js", widget.get("user_js", "")))
+
+        scripts = {}
+        for kind, source in sources:
+            if source.strip():
+                script = self.compile(kind, source)
+                scripts[script.name()] = script
+        return list(scripts.values())
+
+# 页面通过 console.log 向 Python 上报数据时使用的前缀
+PAGE_REPORT_PREFIX = "__pyglass__:"
+
+class WidgetPage(QWebEnginePage):
+    """小部件使用的页面：带前缀的控制台消息当作页面上报的数据分发出去"""
+    report = pyqtSignal(str, object)   # 上报类型, 数据
+
+    def javaScriptConsoleMessage(self, level, message, line_number, source_id):
+        if message.startswith(PAGE_REPORT_PREFIX):
+            try:
+                data = json.loads(message[len(PAGE_REPORT_PREFIX):])
+            except ValueError:
+                return
+            self.report.emit(data.get("type", ""), data)
+            return
+        super().javaScriptConsoleMessage(level, message, line_number, source_id)
+
+# 流量统计：页面内用 PerformanceObserver 汇总资源传输字节数，每 2 秒上报一次
+# 跨域且没有 Timing-Allow-Origin 的资源浏览器不提供大小，流媒体要等请求结束才算，上传不计，
+# 所以这里只是下限估计；启用调试端口时改用 CdpNetworkMeter 在网络层统计
+BANDWIDTH_REPORT_JS = """
+(function () {
+    if (window.__pyglassBandwidth || !window.PerformanceObserver) return;
+    window.__pyglassBandwidth = true;
+    var pending = 0;
+    try {
+        new PerformanceObserver(function (list) {
+            list.getEntries().forEach(function (entry) {
+                pending += entry.transferSize || entry.encodedBodySize || 0;
+            });
+        }).observe({entryTypes: ["resource", "navigation"]});
+    } catch (e) {
+        return;
+    }
+    setInterval(function () {
+        if (!pending) return;
+        console.log("%(prefix)s" + JSON.stringify({type: "bytes", bytes: pending}));
+        pending = 0;
+    }, 2000);
+})();
+""" % {"prefix": PAGE_REPORT_PREFIX}
+# 首次内容绘制时间：用于比较连接预热等优化的效果，timeOrigin 换算成绝对时间和创建窗口的时间对比
+FIRST_PAINT_JS = """
+(function () {
+    if (window.__pyglassPaint || !window.PerformanceObserver) return;
+    window.__pyglassPaint = true;
+    try {
+        new PerformanceObserver(function (list, observer) {
+            list.getEntries().forEach(function (entry) {
+                if (entry.name !== "first-contentful-paint") return;
+                console.log("%(prefix)s" + JSON.stringify({
+                    type: "paint", ms: entry.startTime, epoch_ms: performance.timeOrigin + entry.startTime}));
+                observer.disconnect();
+            });
+        }).observe({type: "paint", buffered: true});
+    } catch (e) {}
+})();
+""" % {"prefix": PAGE_REPORT_PREFIX}
+BANDWIDTH_WINDOW = 60           # 统计速率的时间窗口（秒）
+BANDWIDTH_RECOVER_RATIO = 0.8   # 降到预算的这个比例以下才恢复，避免来回切换
+BANDWIDTH_SOURCE_ESTIMATE = "estimate"  # 页面内 PerformanceObserver 估算（下限）
+BANDWIDTH_SOURCE_NETWORK = "network"    # DevTools 网络事件，包括跨域资源、流媒体和上传
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+# 页面卡顿：长任务（超过 50ms 的脚本执行）和布局偏移，页面内汇总后每 5 秒上报一次
+JANK_REPORT_JS = """
+(function () {
+    if (window.__pyglassJank || !window.PerformanceObserver) return;
+    window.__pyglassJank = true;
+    var longMs = 0, longCount = 0, longest = 0, shift = 0;
+    try {
+        new PerformanceObserver(function (list) {
+            list.getEntries().forEach(function (entry) {
+                longMs += entry.duration;
+                longCount += 1;
+                longest = Math.max(longest, entry.duration);
+            });
+        }).observe({type: "longtask", buffered: true});
+        new PerformanceObserver(function (list) {
+            list.getEntries().forEach(function (entry) {
+                if (!entry.hadRecentInput) shift += entry.value;
+            });
+        }).observe({type: "layout-shift", buffered: true});
+    } catch (e) {}
+    setInterval(function () {
+        if (!longCount && !shift) return;
+        console.log("%(prefix)s" + JSON.stringify({
+            type: "jank", long_ms: longMs, long_count: longCount, longest_ms: longest, shift: shift}));
+        longMs = longCount = longest = shift = 0;
+    }, 5000);
+})();
+""" % {"prefix": PAGE_REPORT_PREFIX}
+# 省电模式：停掉 CSS 动画和过渡，暂停媒体；作为用户脚本注入，之后加载的页面同样生效
+LOW_POWER_JS = """
+(function () {
+    function apply() {
+        if (document.getElementById("pyglass-low-power")) return;
+        var style = document.createElement("style");
+        style.id = "pyglass-low-power";
+        style.textContent = "*, *::before, *::after { animation-play-state: paused !important; transition: none !important; }";
+        (document.head || document.documentElement).appendChild(style);
+        document.querySelectorAll("video, audio").forEach(function (m) { m.pause(); });
+    }
+    if (document.readyState === "loading") document.addEventListener("DOMContentLoaded", apply);
+    else apply();
+})();
+"""
+JANK_WINDOW = 60                    # 统计长任务时间的窗口（秒）
+JANK_DEFAULT_LONG_TASK_MS = 3000    # 默认每分钟长任务总时间上限
+JANK_COOLDOWN_SECONDS = 300         # 处理一次后多久内不再重复处理
+JANK_FREEZE_SECONDS = 300           # 冻结多久后自动恢复
+JANK_SUSPEND_REASON = "jank"
+JANK_ACTIONS = {"none": "只记录", "warn": "提醒", "low_power": "省电模式", "freeze": "冻结", "reload": "重新加载"}
+
+def check_jank_policy(policy):
+    if not isinstance(policy, dict) or policy.get("action", "none") not in JANK_ACTIONS:
+        raise ValueError(f"jank_policy 的 action 必须是 {'、'.join(JANK_ACTIONS)} 之一")
+    for key in ("long_task_ms", "layout_shift"):
+        value = policy.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            raise ValueError(f"jank_policy 的 {key} 必须是非负数")
+
+class JankMeter(QObject):
+    """单个小部件最近一分钟的长任务时间和布局偏移，超过阈值时通知小部件按策略处理"""
+    exceeded = pyqtSignal(dict)     # 最近一分钟的统计
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.long_task_limit_ms = 0     # 每分钟长任务总时间上限，0 表示不检查
+        self.layout_shift_limit = 0     # 每分钟布局偏移分数上限，0 表示不检查
+        self.log = deque()              # (时间, 长任务毫秒, 长任务次数, 布局偏移)
+        self.total_long_ms = 0
+        self.total_long_count = 0
+        self.longest_ms = 0
+        self.worst_minute_ms = 0
+        self.triggered = 0
+        self.last_triggered = None
+
+    def add(self, long_ms, long_count, longest_ms, shift):
+        now = time.monotonic()
+        self.total_long_ms += long_ms
+        self.total_long_count += long_count
+        self.longest_ms = max(self.longest_ms, longest_ms)
+        self.log.append((now, long_ms, long_count, shift))
+        while now - self.log[0][0] > JANK_WINDOW:
+            self.log.popleft()
+        stats = self.minute()
+        self.worst_minute_ms = max(self.worst_minute_ms, stats["long_task_ms"])
+        over = bool(
+            (self.long_task_limit_ms and stats["long_task_ms"] > self.long_task_limit_ms)
+            or (self.layout_shift_limit and stats["layout_shift"] > self.layout_shift_limit))
+        cooling = self.last_triggered is not None and now - self.last_triggered < JANK_COOLDOWN_SECONDS
+        if over and not cooling:
+            self.last_triggered = now
+            self.triggered += 1
+            self.exceeded.emit(stats)
+
+    def minute(self):
+        return {
+            "long_task_ms": round(sum(entry[1] for entry in self.log)),
+            "long_tasks": sum(entry[2] for entry in self.log),
+            "layout_shift": round(sum(entry[3] for entry in self.log), 3),
+        }
+
+    def snapshot(self):
+        stats = self.minute()
+        stats.update({
+            "total_long_task_ms": round(self.total_long_ms),
+            "total_long_tasks": self.total_long_count,
+            "longest_ms": round(self.longest_ms),
+            "worst_minute_ms": round(self.worst_minute_ms),
+            "triggered": self.triggered,
+        })
+        return stats
+
+class BandwidthMeter(QObject):
+    """单个小部件的流量和请求统计，超出限额时通知小部件降级"""
+    budget_changed = pyqtSignal(bool)   # True 表示超出预算
+
+    def __init__(self, limit_kbps=0, request_limit=0, parent=None):
+        super().__init__(parent)
+        self.limit_kbps = limit_kbps         # 带宽上限，0 表示不限
+        self.request_limit = request_limit   # 每分钟请求数上限，0 表示不限
+        self.total_bytes = 0
+        self.total_requests = 0
+        self.blocked_requests = 0
+        self.byte_log = deque()       # (时间, 字节数)
+        self.request_log = deque()    # 请求时间
+        self.over_budget = False
+        self.source = BANDWIDTH_SOURCE_ESTIMATE
+        self.estimate_over = False    # 估算的流量超出上限，只提示不限制
+
+    def prune(self, now):
+        while self.byte_log and now - self.byte_log[0][0] > BANDWIDTH_WINDOW:
+            self.byte_log.popleft()
+        while self.request_log and now - self.request_log[0] > BANDWIDTH_WINDOW:
+            self.request_log.popleft()
+
+    def rate_kbps(self):
+        return sum(size for _, size in self.byte_log) * 8 / 1000 / BANDWIDTH_WINDOW
+
+    def requests_per_minute(self):
+        return len(self.request_log) * 60 / BANDWIDTH_WINDOW
+
+    def set_source(self, source):
+        if source == self.source:
+            return
+        # 两种来源的数字不能混在一起算速率
+        self.source = source
+        self.byte_log.clear()
+        self.check_budget()
+
+    def add_bytes(self, size, source=BANDWIDTH_SOURCE_ESTIMATE):
+        if source != self.source:
+            return
+        now = time.monotonic()
+        self.total_bytes += size
+        self.byte_log.append((now, size))
+        self.prune(now)
+        self.check_budget()
+
+    def allow_request(self):
+        """记录一次请求，超出请求频率上限时返回 False"""
+        now = time.monotonic()
+        self.prune(now)
+        if self.request_limit and self.requests_per_minute() >= self.request_limit:
+            self.blocked_requests += 1
+            self.check_budget()
+            return False
+        self.total_requests += 1
+        self.request_log.append(now)
+        self.check_budget()
+        return True
+
+    def check_budget(self):
+        ratio = 1.0 if not self.over_budget else BANDWIDTH_RECOVER_RATIO
+        bytes_over = bool(self.limit_kbps and self.rate_kbps() > self.limit_kbps * ratio)
+        # 估算值偏低且不完整，不能据此暂停媒体和刷新；请求数由拦截器准确统计，照常限制
+        self.estimate_over = bytes_over and self.source == BANDWIDTH_SOURCE_ESTIMATE
+        over = bool(
+            (bytes_over and self.source == BANDWIDTH_SOURCE_NETWORK)
+            or (self.request_limit and self.requests_per_minute() >= self.request_limit * ratio)
+        )
+        if over != self.over_budget:
+            self.over_budget = over
+            self.budget_changed.emit(over)
+
+    def snapshot(self):
+        return {
+            "total_bytes": self.total_bytes,
+            "total_requests": self.total_requests,
+            "blocked_requests": self.blocked_requests,
+            "rate_kbps": round(self.rate_kbps(), 1),
+            "requests_per_minute": round(self.requests_per_minute(), 1),
+            "over_budget": self.over_budget,
+            "bytes_source": "network" if self.source == BANDWIDTH_SOURCE_NETWORK else "estimate_lower_bound",
+            "estimate_over_budget": self.estimate_over,
+        }
+
+class WidgetRequestInterceptor(QWebEngineUrlRequestInterceptor):
+    """单个页面的请求拦截器：计数，超出预算时拦截媒体和超频请求"""
+
+    def __init__(self, meter, parent=None):
+        super().__init__(parent)
+        self.meter = meter
+
+    def interceptRequest(self, info):
+        resource_type = info.resourceType()
+        if self.meter.over_budget and resource_type == QWebEngineUrlRequestInfo.ResourceTypeMedia:
+            self.meter.blocked_requests += 1
+            info.block(True)
+            return
+        # 主页面请求不拦截，否则小部件会直接变成错误页
+        if not self.meter.allow_request() and resource_type != QWebEngineUrlRequestInfo.ResourceTypeMainFrame:
+            info.block(True)
+
+# 镜像小部件抓取主小部件画面的间隔
+MIRROR_FRAME_INTERVAL_MS = 100
+MIRROR_PAUSED_TEXT = "主小部件已暂停"
+MIRROR_CLOSED_TEXT = "主小部件已关闭"
+
+# 拖动边缘调整大小：拖动期间只移动预览窗口，松开后才真正改变大小，页面只重新布局一次
+RESIZE_GRIP_SIZE = 6
+RESIZE_MIN_SIZE = 100           # 和设置界面的最小宽高一致
+RESIZE_MAX_SIZE = 5000
+# (左, 上, 右, 下) 是否跟随鼠标 -> 光标
+RESIZE_EDGES = {
+    (True, False, False, False): Qt.SizeHorCursor,
+    (False, False, True, False): Qt.SizeHorCursor,
+    (False, True, False, False): Qt.SizeVerCursor,
+    (False, False, False, True): Qt.SizeVerCursor,
+    (True, True, False, False): Qt.SizeFDiagCursor,
+    (False, False, True, True): Qt.SizeFDiagCursor,
+    (False, True, True, False): Qt.SizeBDiagCursor,
+    (True, False, False, True): Qt.SizeBDiagCursor,
+}
+
+class ResizePreview(QWidget):
+    """调整大小期间显示的最后一帧画面，按新的大小缩放，不接收鼠标事件"""
+
+    def __init__(self, frame):
+        super().__init__(None, Qt.FramelessWindowHint | Qt.Tool | Qt.WindowStaysOnTopHint)
+        self.frame = frame
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawPixmap(self.rect(), self.frame)
+        painter.setPen(QColor("#3498db"))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+
+class ResizeGrip(QWidget):
+    """小部件边缘和角上的透明拖动区域"""
+
+    def __init__(self, target, edges):
+        super().__init__(target)
+        self.target = target
+        self.edges = edges
+        self.setCursor(RESIZE_EDGES[edges])
+        self.press_pos = None
+        self.start_rect = QRect()
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton:
+            return
+        self.press_pos = event.globalPos()
+        self.start_rect = QRect(self.target.mapToGlobal(QPoint()), self.target.size())
+        self.target.begin_resize()
+
+    def mouseMoveEvent(self, event):
+        if self.press_pos is not None:
+            self.target.preview_resize(self.resized_rect(event.globalPos()))
+
+    def mouseReleaseEvent(self, event):
+        if self.press_pos is not None:
+            rect = self.resized_rect(event.globalPos())
+            self.press_pos = None
+            self.target.end_resize(rect)
+
+    def resized_rect(self, pos):
+        """按拖动的边调整全局坐标下的矩形，宽高限制在设置界面允许的范围内"""
+        delta = pos - self.press_pos
+        rect = QRect(self.start_rect)
+        left, top, right, bottom = self.edges
+        if left:
+            rect.setLeft(max(min(rect.left() + delta.x(), rect.right() + 1 - RESIZE_MIN_SIZE), rect.right() + 1 - RESIZE_MAX_SIZE))
+        if right:
+            rect.setRight(min(max(rect.right() + delta.x(), rect.left() - 1 + RESIZE_MIN_SIZE), rect.left() - 1 + RESIZE_MAX_SIZE))
+        if top:
+            rect.setTop(max(min(rect.top() + delta.y(), rect.bottom() + 1 - RESIZE_MIN_SIZE), rect.bottom() + 1 - RESIZE_MAX_SIZE))
+        if bottom:
+            rect.setBottom(min(max(rect.bottom() + delta.y(), rect.top() - 1 + RESIZE_MIN_SIZE), rect.top() - 1 + RESIZE_MAX_SIZE))
+        return rect
+
+class WidgetWindowMixin:
+    """小部件窗口的公共行为：合成路径、无边框、拖动、调整大小、置顶和右键菜单"""
+
+    def init_window_behavior(self, opacity, bg_color, always_on_top):
+        # 父控件是叠加窗口时作为子控件托管，不再是独立的顶层窗口
+        self.overlay = self.parentWidget() if isinstance(self.parentWidget(), OverlayHost) else None
+
+        # 保存置顶状态
+        self.always_on_top = always_on_top
+        
+        # 拖动变量
+        self.dragging = False
+        self.offset = QPoint()
+
+        # 暂停原因（锁屏、空闲等），全部解除后才重新显示
+        self.suspend_reasons = set()
+
+        # 边缘调整大小，松开鼠标后调用 on_resized(self) 保存新位置
+        self.resize_grips = [ResizeGrip(self, edges) for edges in RESIZE_EDGES]
+        self.resize_preview = None
+        self.resize_opacity = None
+        self.on_resized = None
+        self.place_resize_grips()
+        
+        # 选择合成路径（首次会设置窗口标志）
+        self.composition = None
+        self.apply_appearance(opacity, bg_color)
+
+    def apply_appearance(self, opacity, bg_color):
+        """按配置切换合成路径，返回是否重新设置了窗口标志"""
+        composition = choose_composition(opacity, bg_color)
+        translucent = composition == COMPOSITION_PER_PIXEL
+        # 只有逐像素透明的开关变化时才需要重建原生窗口
+        need_flags = self.composition is None or translucent != (self.composition == COMPOSITION_PER_PIXEL)
+        self.composition = composition
+
+        self.setAttribute(Qt.WA_TranslucentBackground, translucent)
+        if translucent:
+            self.setStyleSheet(f"background-color: {bg_color}; border-radius: 10px;")
+        else:
+            self.setAttribute(Qt.WA_NoSystemBackground, False)
+            self.setStyleSheet("")
+        self.set_content_background(parse_color(bg_color))
+        if self.overlay:
+            # 子控件没有窗口透明度，改用控件自己的透明效果
+            self.apply_hosted_opacity(opacity)
+        else:
+            self.setWindowOpacity(opacity)
+
+        if need_flags:
+            self.update_flags()
+        return need_flags
+
+    def apply_hosted_opacity(self, opacity):
+        if opacity >= 1.0:
+            self.setGraphicsEffect(None)
+            return
+        effect = self.graphicsEffect()
+        if not isinstance(effect, QGraphicsOpacityEffect):
+            effect = QGraphicsOpacityEffect(self)
+            self.setGraphicsEffect(effect)
+        effect.setOpacity(opacity)
+
+    def set_content_background(self, color):
+        """由子类设置内容区域的背景色"""
+        pass
+        
+    @traced("update_flags")
+    def update_flags(self):
+        """更新窗口标志，特别是置顶状态；只重新显示原本就可见的窗口，创建时由调用方决定是否显示"""
+        if self.overlay:
+            # 托管在叠加窗口里时只需要更新叠加窗口，不用每个小部件都找窗口管理器
+            self.overlay.update_pin()
+            return
+        visible = self.isVisible()
+        flags = Qt.FramelessWindowHint | Qt.Tool
+        if self.always_on_top:
+            flags |= Qt.WindowStaysOnTopHint
+        self.setWindowFlags(flags)
+        # 设置标志会隐藏窗口，需要重新显示以应用新标志
+        if visible:
+            self.show()
+    
+    def place_resize_grips(self):
+        width, height, size = self.width(), self.height(), RESIZE_GRIP_SIZE
+        for grip in self.resize_grips:
+            left, top, right, bottom = grip.edges
+            x = 0 if left else width - size if right else size
+            y = 0 if top else height - size if bottom else size
+            grip.setGeometry(x, y, size if left or right else width - 2 * size,
+                             size if top or bottom else height - 2 * size)
+            grip.raise_()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if getattr(self, "resize_grips", None):
+            self.place_resize_grips()
+
+    def childEvent(self, event):
+        """网页的渲染控件在页面加载后才创建，要把拖动区域重新放到它上面"""
+        super().childEvent(event)
+        if event.added() and getattr(self, "resize_grips", None):
+            QTimer.singleShot(0, self.place_resize_grips)
+
+    def begin_resize(self):
+        """截下当前画面作为预览；顶层窗口变为全透明而不是隐藏，隐藏会中断鼠标拖动"""
+        self.resize_preview = ResizePreview(self.grab())
+        if not self.overlay:
+            self.resize_opacity = self.windowOpacity()
+
+    def preview_resize(self, rect):
+        if self.resize_preview is None:
+            return
+        self.resize_preview.setGeometry(rect)
+        if not self.resize_preview.isVisible():
+            self.resize_preview.show()
+            if self.resize_opacity is not None:
+                self.setWindowOpacity(0.0)
+
+    def end_resize(self, rect):
+        if self.resize_preview is not None:
+            self.resize_preview.close()
+            self.resize_preview.deleteLater()
+            self.resize_preview = None
+        if self.resize_opacity is not None:
+            self.setWindowOpacity(self.resize_opacity)
+            self.resize_opacity = None
+        if rect.size() == self.size() and rect.topLeft() == self.mapToGlobal(QPoint()):
+            return
+        if self.overlay:
+            rect.moveTopLeft(self.overlay.mapFromGlobal(rect.topLeft()))
+        self.setGeometry(rect)
+        if self.on_resized:
+            self.on_resized(self)
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.dragging = True
+            self.offset = event.globalPos() - self.pos()
+        super().mousePressEvent(event)
+    
+    def mouseMoveEvent(self, event):
+        if self.dragging:
+            self.move(event.globalPos() - self.offset)
+        super().mouseMoveEvent(event)
+    
+    def mouseReleaseEvent(self, event):
+        self.dragging = False
+        super().mouseReleaseEvent(event)
+    
+    def contextMenuEvent(self, event):
+        # 创建自定义右键菜单
+        menu = QMenu(self)
+        
+        # 置顶切换菜单项
+        pin_action = menu.addAction("置顶" if not self.always_on_top else "取消置顶")
+        pin_action.triggered.connect(self.toggle_pin)
+
+        # 子类追加的菜单项
+        self.add_menu_actions(menu)
+        
+        # 关闭菜单项
+        close_action = menu.addAction("关闭")
+        close_action.triggered.connect(self.close)
+        
+        menu.exec_(event.globalPos())
+
+    def add_menu_actions(self, menu):
+        """子类可以在这里往右键菜单追加菜单项"""
+        pass
+    
+    def suspend(self, reason, freeze=True):
+        """暂停小部件：先隐藏窗口，所有暂停原因解除后再显示"""
+        self.suspend_reasons.add(reason)
+        self.hide()
+
+    def resume(self, reason):
+        self.suspend_reasons.discard(reason)
+        if not self.suspend_reasons:
+            self.show()
+
+    def toggle_pin(self):
+        self.always_on_top = not self.always_on_top
+        self.update_flags()
+
+# 页面缩放：缩小的小部件按较小的布局宽度排版和栅格化，修改时不重新加载页面
+ZOOM_AUTO = "auto"
+ZOOM_MIN = 0.25
+ZOOM_MAX = 5.0
+ZOOM_FIT_DELAY_MS = 300         # 调整窗口大小时合并多次重新计算
+ZOOM_CHOICES = ("100%", "75%", "50%", "33%", "自适应")
+RENDER_SCALE_CHOICES = ("100%", "75%", "50%")
+FIT_CONTENT_JS = ("document.documentElement ? Math.max(document.documentElement.scrollWidth, "
+                  "document.body ? document.body.scrollWidth : 0) : 0")
+
+def check_render_scale(scale):
+    """手动修改的配置里 render_scale 可能是字符串（"0.75" 或 "75%"），统一转成 0 到 1 之间的小数"""
+    try:
+        if isinstance(scale, str) and scale.strip().endswith("%"):
+            scale = float(scale.strip().rstrip("%")) / 100
+        elif isinstance(scale, bool):
+            raise ValueError
+        else:
+            scale = float(scale)
+    except (TypeError, ValueError):
+        raise ValueError("render_scale 必须是数字")
+    if not 0 < scale <= 1:
+        raise ValueError("render_scale 必须在 0 到 1 之间")
+    return scale
+
+def render_scale_of(settings):
+    """读取渲染分辨率，配置无效时按 100% 处理"""
+    try:
+        return check_render_scale(settings.get("render_scale", 1.0))
+    except ValueError:
+        return 1.0
+
+def check_zoom(zoom):
+    if zoom == ZOOM_AUTO:
+        return
+    if isinstance(zoom, bool) or not isinstance(zoom, (int, float)) or not ZOOM_MIN <= zoom <= ZOOM_MAX:
+        raise ValueError(f"缩放必须是 {ZOOM_MIN} 到 {ZOOM_MAX} 之间的数字或 {ZOOM_AUTO}")
+
+def parse_zoom(text):
+    """解析 "75%"、"0.75" 或 "自适应"，留空表示不缩放"""
+    text = text.strip()
+    if text in ("自适应", ZOOM_AUTO):
+        return ZOOM_AUTO
+    if not text:
+        return 1.0
+    zoom = float(text.rstrip("%")) / 100 if text.endswith("%") else float(text)
+    check_zoom(zoom)
+    return zoom
+
+def format_zoom(zoom):
+    return "自适应" if zoom == ZOOM_AUTO else f"{round(zoom * 100)}%"
+
+class DraggableWebView(WidgetWindowMixin, QWebEngineView):
+    jank_detected = pyqtSignal(str, dict)   # 执行的处理, 最近一分钟的统计
+
+    @traced("DraggableWebView.__init__")
+    def __init__(self, url, opacity=1.0, bg_color="#00000000", x=100, y=100, width=400, height=300, always_on_top=True, data_bus=None, devtools=None, profile=None, scripts=None, parent=None):
+        super().__init__(parent)
+        self.view_id = uuid.uuid4().hex
+        # 使用自己的页面类，命名存储分区也在这里生效
+        self.setPage(WidgetPage(profile or QWebEngineProfile.defaultProfile(), self))
+        self.page().report.connect(self.on_page_report)
+
+        # 流量统计和限额
+        self.meter = BandwidthMeter(parent=self)
+        self.meter.budget_changed.connect(self.on_budget_changed)
+        self.interceptor = WidgetRequestInterceptor(self.meter, self)
+        self.page().setUrlRequestInterceptor(self.interceptor)
+        self.page().scripts().insert(self.page_script("pyglass-bandwidth", BANDWIDTH_REPORT_JS))
+        self.page().scripts().insert(self.page_script("pyglass-first-paint", FIRST_PAINT_JS))
+        self.page().scripts().insert(self.page_script("pyglass-jank", JANK_REPORT_JS))
+        self.jank = JankMeter(self)
+        self.jank.exceeded.connect(self.on_jank)
+        self.jank_action = "none"
+        self.low_power = False
+        # 挂在视图上，冻结期间视图被销毁时定时器一起销毁
+        self.jank_freeze_timer = QTimer(self)
+        self.jank_freeze_timer.setSingleShot(True)
+        self.jank_freeze_timer.setInterval(JANK_FREEZE_SECONDS * 1000)
+        self.jank_freeze_timer.timeout.connect(self.end_jank_freeze)
+        self.created_epoch_ms = time.time() * 1000
+        self.first_paint_ms = None      # 相对页面导航开始
+        self.launch_to_paint_ms = None  # 相对创建窗口，包含渲染进程启动和连接建立
+
+        # 定时刷新，多个原因可以同时暂停它
+        self.refresh_interval = 0
+        self.refresh_pauses = set()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.warmer = None
+        # 缩放，自适应时按页面内容宽度计算
+        self.zoom = 1.0
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setSingleShot(True)
+        self.zoom_timer.setInterval(ZOOM_FIT_DELAY_MS)
+        self.zoom_timer.timeout.connect(self.fit_zoom)
+        self.loadFinished.connect(self.reapply_zoom)
+        # 数据总线和调试标记要在加载页面之前装好
+        self.bridge = None
+        if data_bus:
+            self.enable_data_bus(data_bus)
+        self.devtools = devtools
+        self.network_meter = None
+        if devtools:
+            self.page().scripts().insert(devtools.marker_script(self.view_id))
+            self.loadFinished.connect(self.attach_network_meter)
+        if scripts:
+            self.apply_snippets(scripts)
+        if TRACE_ENABLED:
+            self.trace_page_load()
+        self.setUrl(QUrl(url))
+        self.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
+
+        # 共用本页面渲染结果的镜像小部件：只在页面重绘后抓取，两次抓取至少间隔 MIRROR_FRAME_INTERVAL_MS
+        self.mirrors = []
+        self.mirror_dirty = True
+        self.grabbing = False
+        self.render_widget = None       # Chromium 绘制画面的子控件，渲染进程重启后会换掉
+        self.mirror_timer = QTimer(self)
+        self.mirror_timer.setSingleShot(True)
+        self.mirror_timer.setInterval(MIRROR_FRAME_INTERVAL_MS)
+        self.mirror_timer.timeout.connect(self.push_mirror_frame)
+        self.loadFinished.connect(self.update_mirror_timer)
+        
+        self.init_window_behavior(opacity, bg_color, always_on_top)
+        
+        # 设置位置和大小
+        self.setGeometry(x, y, width, height)
+
+    def attach_network_meter(self, ok):
+        """第一次加载完成后按网址找到调试目标，之后的导航沿用同一个连接"""
+        if not ok:
+            return
+        self.loadFinished.disconnect(self.attach_network_meter)
+        self.devtools.meter_network(self)
+
+    def trace_page_load(self):
+        """把页面加载的各个阶段记录为异步追踪事件"""
+        trace_id = id(self)
+        self.loadStarted.connect(
+            lambda: TRACER.async_event("b", "page_load", trace_id, args={"url": self.url().toString()}))
+        self.loadProgress.connect(
+            lambda progress: TRACER.async_event("n", "loadProgress", trace_id, args={"progress": progress}))
+        self.loadFinished.connect(
+            lambda ok: TRACER.async_event("e", "page_load", trace_id, args={"ok": ok}))
+
+    def enable_data_bus(self, bus):
+        """通过 QWebChannel 把数据总线暴露给页面"""
+        script = build_data_bus_script()
+        if script is None:
+            return
+        self.bridge = DataBusBridge(bus, self)
+        self.channel = QWebChannel(self.page())
+        self.channel.registerObject("pyglassBus", self.bridge)
+        self.page().setWebChannel(self.channel)
+        self.page().scripts().insert(script)
+        self.loadStarted.connect(self.bridge.reset)
+
+    def closeEvent(self, event):
+        if self.bridge:
+            self.bridge.reset()
+        self.mirror_timer.stop()
+        self.refresh_timer.stop()
+        self.jank_freeze_timer.stop()
+        # 视图随后会被销毁，镜像不能再引用它
+        for mirror in self.mirrors:
+            mirror.primary_closed()
+        self.mirrors = []
+        super().closeEvent(event)
+
+    def set_content_background(self, color):
+        self.page().setBackgroundColor(color)
+
+    @staticmethod
+    def page_script(name, source):
+        script = QWebEngineScript()
+        script.setName(name)
+        script.setSourceCode(source)
+        script.setInjectionPoint(QWebEngineScript.DocumentCreation)
+        script.setWorldId(QWebEngineScript.MainWorld)
+        script.setRunsOnSubFrames(False)
+        return script
+
+    def apply_hosted_opacity(self, opacity):
+        """网页画面不受控件透明效果影响，叠加窗口模式下用页面 CSS 实现透明度"""
+        if not hasattr(self, "hosted_opacity"):
+            self.loadFinished.connect(lambda ok: self.run_opacity_css())
+        self.hosted_opacity = opacity
+        self.run_opacity_css()
+
+    def run_opacity_css(self):
+        self.page().runJavaScript(
+            f"if (document.documentElement) document.documentElement.style.opacity = {self.hosted_opacity};")
+
+    def on_page_report(self, kind, data):
+        if kind == "bytes":
+            self.meter.add_bytes(int(data.get("bytes", 0)))
+        elif kind == "jank":
+            self.jank.add(data.get("long_ms", 0), int(data.get("long_count", 0)),
+                          data.get("longest_ms", 0), data.get("shift", 0))
+        elif kind == "paint" and self.first_paint_ms is None:
+            self.first_paint_ms = round(data.get("ms", 0))
+            self.launch_to_paint_ms = round(data.get("epoch_ms", 0) - self.created_epoch_ms)
+            if TRACE_ENABLED:
+                TRACER.async_event("n", "first_contentful_paint", id(self), args=data)
+
+    def refresh(self):
+        """间隔较长的定时刷新先预热连接，握手完成后再重新加载"""
+        if self.warmer and self.refresh_interval >= WARMUP_REFRESH_MIN_SECONDS:
+            self.warmer.warm([url_origin(self.url().toString())], self.page().profile())
+            QTimer.singleShot(WARMUP_LEAD_MS, self.reload)
+        else:
+            self.reload()
+
+    def set_zoom(self, zoom):
+        self.zoom = zoom
+        if zoom == ZOOM_AUTO:
+            self.fit_zoom()
+        else:
+            self.setZoomFactor(zoom)
+
+    def reapply_zoom(self, ok):
+        """跳转到其他站点后 Chromium 会换成该站点的缩放，加载完成后重新应用"""
+        if self.zoom == ZOOM_AUTO:
+            self.fit_zoom()
+        elif self.zoomFactor() != self.zoom:
+            self.setZoomFactor(self.zoom)
+
+    def fit_zoom(self):
+        if self.zoom == ZOOM_AUTO and not self.url().isEmpty():
+            self.page().runJavaScript(FIT_CONTENT_JS, QWebEngineScript.ApplicationWorld, self.apply_fit_zoom)
+
+    def apply_fit_zoom(self, content_width):
+        """页面内容宽度以 CSS 像素计，和缩放无关；自适应只缩小，响应式页面会保持当前缩放"""
+        if self.zoom != ZOOM_AUTO or not content_width:
+            return
+        zoom = max(ZOOM_MIN, min(1.0, self.width() / content_width))
+        if abs(zoom - self.zoomFactor()) > 0.02:
+            self.setZoomFactor(zoom)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if self.zoom == ZOOM_AUTO:
+            self.zoom_timer.start()
+
+    def set_jank_policy(self, policy):
+        """policy 为 None 时只统计不处理；换成别的处理方式时退出省电模式"""
+        policy = policy or {}
+        self.jank_action = policy.get("action", "none")
+        if self.jank_action == "none":
+            self.jank.long_task_limit_ms = self.jank.layout_shift_limit = 0
+        else:
+            self.jank.long_task_limit_ms = policy.get("long_task_ms", JANK_DEFAULT_LONG_TASK_MS)
+            self.jank.layout_shift_limit = policy.get("layout_shift", 0)
+        if self.low_power and self.jank_action != "low_power":
+            self.set_low_power(False)
+
+    def on_jank(self, stats):
+        action = self.jank_action
+        if action == "low_power":
+            self.set_low_power(True)
+        elif action == "freeze":
+            self.suspend(JANK_SUSPEND_REASON)
+            self.jank_freeze_timer.start()
+        elif action == "reload":
+            self.reload()
+        if TRACE_ENABLED:
+            TRACER.async_event("n", "jank", id(self), args=dict(stats, action=action))
+        self.jank_detected.emit(action, stats)
+
+    def end_jank_freeze(self):
+        self.resume(JANK_SUSPEND_REASON)
+
+    def set_low_power(self, enabled):
+        """省电模式：暂停定时刷新、静音，停掉页面动画；关闭后已暂停的媒体和动画要等下次加载才恢复"""
+        if enabled == self.low_power:
+            return
+        self.low_power = enabled
+        self.page().setAudioMuted(enabled)
+        collection = self.page().scripts()
+        if enabled:
+            self.pause_refresh("low_power")
+            collection.insert(self.page_script("pyglass-low-power", LOW_POWER_JS))
+            self.page().runJavaScript(LOW_POWER_JS, QWebEngineScript.ApplicationWorld)
+        else:
+            self.resume_refresh("low_power")
+            for script in collection.findScripts("pyglass-low-power"):
+                collection.remove(script)
+            self.page().runJavaScript(
+                "var el = document.getElementById('pyglass-low-power'); if (el) el.remove();",
+                QWebEngineScript.ApplicationWorld)
+
+    def set_limits(self, limit_kbps, request_limit):
+        self.meter.limit_kbps = limit_kbps
+        self.meter.request_limit = request_limit
+        self.meter.check_budget()
+
+    def on_budget_changed(self, over_budget):
+        """超出流量预算时暂停刷新并停止媒体播放，恢复后再继续"""
+        if over_budget:
+            self.pause_refresh("bandwidth")
+            self.page().runJavaScript("document.querySelectorAll('video, audio').forEach(function (m) { m.pause(); });")
+        else:
+            self.resume_refresh("bandwidth")
+
+    def set_refresh_interval(self, seconds):
+        self.refresh_interval = seconds
+        self.refresh_timer.setInterval(int(seconds * 1000))
+        if seconds and not self.refresh_pauses:
+            self.refresh_timer.start()
+        else:
+            self.refresh_timer.stop()
+
+    def pause_refresh(self, reason):
+        self.refresh_pauses.add(reason)
+        self.refresh_timer.stop()
+
+    def resume_refresh(self, reason):
+        self.refresh_pauses.discard(reason)
+        if self.refresh_interval and not self.refresh_pauses and not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+    def suspend(self, reason, freeze=True):
+        """隐藏后冻结页面，脚本计时器、动画和渲染全部停止，恢复时页面状态还在；
+        freeze 为 False 时只隐藏，页面继续加载（用于提前创建）"""
+        super().suspend(reason)
+        self.pause_refresh(reason)
+        # 可见的页面不能冻结，所以要在隐藏之后设置
+        if freeze:
+            self.page().setLifecycleState(QWebEnginePage.Frozen)
+
+    def resume(self, reason):
+        self.resume_refresh(reason)
+        if not self.suspend_reasons - {reason}:
+            self.page().setLifecycleState(QWebEnginePage.Active)
+        super().resume(reason)
+
+    def apply_snippets(self, scripts):
+        """更新页面的用户片段：之后的文档创建时自动注入，当前页面立即补上新增的部分"""
+        collection = self.page().scripts()
+        wanted = {script.name(): script for script in scripts}
+        for script in collection.toList():
+            name = script.name()
+            if name.startswith(SNIPPET_SCRIPT_PREFIX) and name not in wanted:
+                collection.remove(script)
+                # CSS 片段可以直接撤掉，JS 片段的效果要等下次加载才会消失
+                self.page().runJavaScript(
+                    f"var el = document.getElementById({json.dumps(name)}); if (el) el.remove();",
+                    QWebEngineScript.ApplicationWorld)
+        for name, script in wanted.items():
+            if collection.findScripts(name):
+                continue
+            collection.insert(script)
+            if not self.url().isEmpty():
+                self.page().runJavaScript(script.sourceCode(), QWebEngineScript.ApplicationWorld)
+
+    def add_menu_actions(self, menu):
+        if not self.devtools:
+            return
+        capture_menu = menu.addMenu("性能采集")
+        for kind, (label, _) in DEVTOOLS_CAPTURE_KINDS.items():
+            action = capture_menu.addAction(label)
+            action.triggered.connect(lambda checked=False, k=kind: self.devtools.capture(self, k))
+        inspect_action = menu.addAction("复制 DevTools 地址")
+        inspect_action.triggered.connect(lambda: self.devtools.copy_inspector_url(self))
+
+    def add_mirror(self, mirror):
+        self.mirrors.append(mirror)
+        self.update_mirror_timer()
+
+    def remove_mirror(self, mirror):
+        if mirror in self.mirrors:
+            self.mirrors.remove(mirror)
+        self.update_mirror_timer()
+
+    def active_mirrors(self):
+        return [mirror for mirror in self.mirrors if not mirror.suspend_reasons]
+
+    def update_mirror_timer(self, *_):
+        """镜像增减、暂停恢复或页面加载完成时调用：有镜像在显示时跟踪重绘并补一帧，否则停止抓取"""
+        if not self.active_mirrors():
+            self.mirror_timer.stop()
+            return
+        widget = self.focusProxy()
+        if widget is not None and widget is not self.render_widget:
+            widget.installEventFilter(self)
+            self.render_widget = widget
+        self.schedule_mirror_frame()
+
+    def schedule_mirror_frame(self):
+        self.mirror_dirty = True
+        if not self.mirror_timer.isActive() and self.active_mirrors():
+            self.mirror_timer.start()
+
+    def eventFilter(self, obj, event):
+        # grab() 自己也会让子控件绘制一次，不能当作页面有了新画面
+        if obj is self.render_widget and not self.grabbing and event.type() == QEvent.Paint:
+            self.schedule_mirror_frame()
+        return super().eventFilter(obj, event)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.schedule_mirror_frame()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # 隐藏的页面 Chromium 不再渲染，截不到新画面，镜像保留最后一帧并显示暂停
+        for mirror in self.mirrors:
+            mirror.set_paused(MIRROR_PAUSED_TEXT)
+
+    def push_mirror_frame(self):
+        """抓取当前画面分发给显示中的镜像小部件，各自按窗口大小缩放"""
+        if not self.mirror_dirty or not self.isVisible():
+            return
+        self.mirror_dirty = False
+        self.grabbing = True
+        try:
+            frame = self.grab()
+        finally:
+            self.grabbing = False
+        for mirror in self.active_mirrors():
+            mirror.set_frame(frame)
+
+def release_view(view):
+    """close 只是隐藏窗口，这里还要丢弃页面并销毁视图，渲染进程里的内存和脚本才会真正释放；
+    主进程和宿主进程都用它关闭小部件"""
+    view.close()
+    if isinstance(view, DraggableWebView):
+        if view.network_meter:
+            view.network_meter.close()
+        # 隐藏之后才能丢弃
+        view.page().setLifecycleState(QWebEnginePage.Discarded)
+    view.deleteLater()
+
+class MirrorWebView(WidgetWindowMixin, QWidget):
+    """镜像小部件：与主小部件网址相同，不启动渲染进程，只显示主小部件的画面"""
+
+    def __init__(self, primary, opacity=1.0, bg_color="#00000000", x=100, y=100, width=400, height=300, always_on_top=True, parent=None):
+        super().__init__(parent)
+        self.primary = primary
+        self.frame = QPixmap()
+        self.paused_text = None     # 主小部件暂停或关闭时显示在最后一帧上
+        self.background = QColor(0, 0, 0, 0)
+        self.setToolTip("镜像小部件，双击切换到主小部件进行操作")
+        
+        self.init_window_behavior(opacity, bg_color, always_on_top)
+        
+        # 设置位置和大小
+        self.setGeometry(x, y, width, height)
+        primary.add_mirror(self)
+
+    def set_content_background(self, color):
+        self.background = color
+        self.update()
+
+    def set_frame(self, frame):
+        self.frame = frame
+        self.paused_text = None
+        self.update()
+
+    def set_paused(self, text):
+        if text != self.paused_text:
+            self.paused_text = text
+            self.update()
+
+    def primary_closed(self):
+        self.primary = None
+        self.set_paused(MIRROR_CLOSED_TEXT)
+
+    def suspend(self, reason, freeze=True):
+        super().suspend(reason, freeze)
+        # 镜像自己暂停时主小部件不必再为它抓取画面
+        if self.primary is not None:
+            self.primary.update_mirror_timer()
+
+    def resume(self, reason):
+        super().resume(reason)
+        if self.primary is not None:
+            self.primary.update_mirror_timer()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.background)
+        if not self.frame.isNull():
+            # 保持比例缩放并居中
+            scaled = self.frame.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+            painter.drawPixmap((self.width() - scaled.width()) // 2, (self.height() - scaled.height()) // 2, scaled)
+        if self.paused_text:
+            painter.fillRect(self.rect(), QColor(0, 0, 0, 120))
+            painter.setPen(QColor("#ecf0f1"))
+            painter.drawText(self.rect(), Qt.AlignCenter, self.paused_text)
+        painter.end()
+
+    def mouseDoubleClickEvent(self, event):
+        # 输入交给主小部件处理；主小部件已关闭或暂停（锁屏、时段外、没有屏幕等）时不能把它强行显示出来
+        if self.primary is None or self.primary.suspend_reasons:
+            return
+        self.primary.show()
+        self.primary.raise_()
+        self.primary.activateWindow()
+
+    def closeEvent(self, event):
+        if self.primary is not None:
+            self.primary.remove_mirror(self)
+        super().closeEvent(event)
+
+# 卡顿检测
+STALL_PROBE_INTERVAL_MS = 10        # 探测定时器间隔
+STALL_SAMPLE_INTERVAL = 0.05        # 卡顿期间采样主线程调用栈的间隔（秒）
+STALL_LOG_FILE = "stall_log.txt"
+STALL_HISTOGRAM_BUCKETS = (50, 100, 250, 500, 1000, 2000, 5000)  # 毫秒
+STALL_WORST_KEEP = 10
+
+class EventLoopWatchdog(QObject):
+    """GUI 事件循环卡顿检测：高频定时器测量漂移，辅助线程在卡顿时采样主线程调用栈"""
+
+    def __init__(self, threshold_ms=200, parent=None):
+        super().__init__(parent)
+        self.threshold = threshold_ms / 1000
+        self.main_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+        self.histogram = [0] * (len(STALL_HISTOGRAM_BUCKETS) + 1)
+        self.worst = []          # (时长毫秒, 发生时间, 最常见的调用栈)
+        self.samples = []        # 当前这次卡顿中采到的调用栈
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+        self.logger = logging.getLogger("pyglasspane.stall")
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        if not self.logger.handlers:
+            handler = RotatingFileHandler(STALL_LOG_FILE, maxBytes=1024 * 1024, backupCount=3, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self.logger.addHandler(handler)
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(STALL_PROBE_INTERVAL_MS)
+        self.timer.timeout.connect(self.on_probe)
+
+    def start(self):
+        self.last_beat = time.perf_counter()
+        self.stop_event.clear()
+        self.sampler = threading.Thread(target=self.sample_loop, name="stall-sampler", daemon=True)
+        self.sampler.start()
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+        self.stop_event.set()
+
+    def on_probe(self):
+        """定时器实际触发时间比预期晚多少，就是事件循环被堵住的时间"""
+        now = time.perf_counter()
+        drift = now - self.last_beat - STALL_PROBE_INTERVAL_MS / 1000
+        self.last_beat = now
+        with self.lock:
+            samples, self.samples = self.samples, []
+        if drift >= self.threshold:
+            self.record_stall(drift * 1000, samples)
+
+    def sample_loop(self):
+        """辅助线程：主线程超过阈值没有心跳时采样它的 Python 调用栈"""
+        while not self.stop_event.wait(STALL_SAMPLE_INTERVAL):
+            if time.perf_counter() - self.last_beat < self.threshold:
+                continue
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame)[-8:])
+            with self.lock:
+                self.samples.append(stack)
+
+    def record_stall(self, duration_ms, samples):
+        bucket = len(STALL_HISTOGRAM_BUCKETS)
+        for i, limit in enumerate(STALL_HISTOGRAM_BUCKETS):
+            if duration_ms < limit:
+                bucket = i
+                break
+        self.histogram[bucket] += 1
+
+        # 出现次数最多的调用栈最能说明卡在哪里
+        stack = Counter(samples).most_common(1)[0][0] if samples else "（未采到调用栈，可能卡在 Qt 内部）\n"
+        self.worst.append((duration_ms, time.strftime("%H:%M:%S"), stack))
+        self.worst.sort(key=lambda entry: entry[0], reverse=True)
+        del self.worst[STALL_WORST_KEEP:]
+
+        self.logger.info(f"卡顿 {duration_ms:.0f}ms，采样 {len(samples)} 次\n{stack}分布: {self.histogram_text()}")
+
+    def histogram_text(self):
+        labels = []
+        lower = 0
+        for limit, count in zip(STALL_HISTOGRAM_BUCKETS, self.histogram):
+            labels.append(f"{lower}-{limit}ms:{count}")
+            lower = limit
+        labels.append(f">{lower}ms:{self.histogram[-1]}")
+        return " ".join(labels)
+
+# 后台任务：asyncio 事件循环由 Qt 定时器驱动，协程和界面在同一线程，阻塞操作放到线程池
+ASYNC_TICK_MS = 20              # 有任务时驱动 asyncio 的间隔
+ASYNC_SLOW_TICK_MS = 50         # 单次驱动超过这个时间说明有协程在阻塞界面线程
+ASYNC_STUCK_SECONDS = 60        # 没有指定超时的任务运行超过这个时间视为可能卡住
+ASYNC_WORKERS = 4
+
+class AsyncTaskManager(QObject):
+    """启动、取消和跟踪协程；每次只处理已经就绪的回调，不会在 select 上等待，绘制和输入不受影响"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="pyglass-worker")
+        self.loop.set_default_executor(self.executor)
+        self.tasks = {}         # 任务 -> (名称, 开始时间, 超时秒数)
+        self.slow_ticks = deque(maxlen=20)
+        self.tick_timer = QTimer(self)
+        self.tick_timer.setInterval(ASYNC_TICK_MS)
+        self.tick_timer.timeout.connect(self.tick)
+
+    def start(self, coro, name=None, timeout=None):
+        """启动协程并返回 asyncio.Task，timeout 只用于诊断时判断是否卡住"""
+        task = self.loop.create_task(coro)
+        self.tasks[task] = (name or getattr(coro, "__qualname__", "任务"), time.monotonic(), timeout)
+        task.add_done_callback(self.on_task_done)
+        self.tick_timer.start()
+        return task
+
+    def cancel(self, name):
+        for task, (task_name, _, _) in list(self.tasks.items()):
+            if task_name == name:
+                task.cancel()
+        self.tick_timer.start()  # 让任务有机会处理取消
+
+    def run_blocking(self, func, *args):
+        """在线程池中运行阻塞函数，返回可以 await 的 Future"""
+        return self.loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    def on_task_done(self, task):
+        name, _, _ = self.tasks.pop(task, ("任务", 0, None))
+        if not task.cancelled() and task.exception() is not None:
+            error = task.exception()
+            print(f"后台任务 {name} 出错: {error}")
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def tick(self):
+        """先安排 stop 再 run_forever，循环只跑一轮就返回"""
+        started = time.perf_counter()
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > ASYNC_SLOW_TICK_MS:
+            self.slow_ticks.append((time.strftime("%H:%M:%S"), elapsed_ms))
+            print(f"后台任务阻塞界面线程 {elapsed_ms:.0f}ms，耗时操作请用 run_blocking")
+        if not self.tasks:
+            self.tick_timer.stop()
+
+    def snapshot(self):
+        """每个任务的名称、运行时间、是否可能卡住以及当前停在哪一行"""
+        now = time.monotonic()
+        rows = []
+        for task, (name, started, timeout) in self.tasks.items():
+            age = now - started
+            stack = task.get_stack(limit=1)
+            where = f"{os.path.basename(stack[-1].f_code.co_filename)}:{stack[-1].f_lineno}" if stack else ""
+            rows.append({"name": name, "age": age, "stuck": age > (timeout or ASYNC_STUCK_SECONDS), "where": where})
+        return sorted(rows, key=lambda row: -row["age"])
+
+    def shutdown(self):
+        for task in list(self.tasks):
+            task.cancel()
+        # 再跑一轮让任务执行清理代码
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        self.tick_timer.stop()
+        self.executor.shutdown(wait=False)
+
+# 锁屏和空闲检测：离开时暂停所有小部件，回来后错峰恢复
+SESSION_IDLE_MINUTES = 60       # 默认无操作多久算空闲，0 表示只检测锁屏
+SESSION_POLL_MS = 5000
+SESSION_DBUS_TIMEOUT_MS = 1000
+SESSION_RESUME_STAGGER_MS = 150
+SESSION_FAKE_STATE_FILE = "session_state.json"
+SESSION_SUSPEND_REASON = "session"
+
+class SessionDetector(QObject):
+    """会话状态检测的基类：锁屏、屏保或长时间无操作时发出 away_changed(True, 原因)；本身不检测任何状态"""
+    away_changed = pyqtSignal(bool, str)
+
+    def __init__(self, idle_minutes=SESSION_IDLE_MINUTES, parent=None):
+        super().__init__(parent)
+        self.idle_limit = idle_minutes * 60
+        self.locked = False
+        self.idle = False
+        self.away = False
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(SESSION_POLL_MS)
+        self.poll_timer.timeout.connect(self.poll)
+
+    def start(self):
+        self.poll_timer.start()
+        self.poll()
+
+    def stop(self):
+        self.poll_timer.stop()
+
+    def poll(self):
+        """子类在这里读取空闲时间，可以异步读取，读到后调用 report_idle_time"""
+
+    def report_idle_time(self, seconds):
+        self.idle = bool(self.idle_limit) and seconds >= self.idle_limit
+        self.update_away()
+
+    def set_locked(self, locked):
+        self.locked = locked
+        self.update_away()
+
+    def update_away(self):
+        away = self.locked or self.idle
+        if away != self.away:
+            self.away = away
+            self.away_changed.emit(away, "锁屏" if self.locked else "空闲" if self.idle else "")
+
+class DBusSessionDetector(SessionDetector):
+    """Linux：屏保和 logind 的锁屏信号，空闲时间从 KDE 或 GNOME 的接口读取，调用全部异步"""
+    IDLE_METHODS = [
+        ("org.freedesktop.ScreenSaver", "/org/freedesktop/ScreenSaver", "org.freedesktop.ScreenSaver", "GetSessionIdleTime"),
+        ("org.gnome.Mutter.IdleMonitor", "/org/gnome/Mutter/IdleMonitor/Core", "org.gnome.Mutter.IdleMonitor", "GetIdletime"),
+    ]
+    SCREENSAVERS = [
+        ("/org/freedesktop/ScreenSaver", "org.freedesktop.ScreenSaver"),
+        ("/org/gnome/ScreenSaver", "org.gnome.ScreenSaver"),
+    ]
+
+    def __init__(self, idle_minutes=SESSION_IDLE_MINUTES, parent=None):
+        super().__init__(idle_minutes, parent)
+        self.session_bus = QDBusConnection.sessionBus()
+        self.system_bus = QDBusConnection.systemBus()
+        self.idle_method = 0    # 当前使用的空闲时间接口，都不可用时为 None
+        self.connected = False
+
+    def start(self):
+        if not self.connected:
+            self.connected = True
+            for path, interface in self.SCREENSAVERS:
+                self.session_bus.connect("", path, interface, "ActiveChanged", self.on_screensaver_active)
+            # "auto" 代表调用者所在的会话
+            self.call(self.system_bus, "org.freedesktop.login1", "/org/freedesktop/login1",
+                      "org.freedesktop.login1.Manager", "GetSession", self.on_session_path,
+                      os.environ.get("XDG_SESSION_ID") or "auto")
+        super().start()
+
+    def call(self, bus, service, path, interface, method, callback, *args):
+        """异步调用 D-Bus 方法，失败时回调收到 None"""
+        message = QDBusMessage.createMethodCall(service, path, interface, method)
+        if args:
+            message.setArguments(list(args))
+        watcher = QDBusPendingCallWatcher(bus.asyncCall(message, SESSION_DBUS_TIMEOUT_MS), self)
+
+        def finished(w):
+            reply = QDBusPendingReply(w)
+            w.deleteLater()
+            callback(None if reply.isError() else reply.argumentAt(0))
+        watcher.finished.connect(finished)
+
+    def on_session_path(self, session_path):
+        path = session_path.path() if session_path is not None else ""
+        # 找不到自己的会话时监听所有会话的锁屏信号
+        self.system_bus.connect("org.freedesktop.login1", path, "org.freedesktop.login1.Session", "Lock", self.on_lock)
+        self.system_bus.connect("org.freedesktop.login1", path, "org.freedesktop.login1.Session", "Unlock", self.on_unlock)
+
+    @pyqtSlot(bool)
+    def on_screensaver_active(self, active):
+        self.set_locked(active)
+
+    @pyqtSlot()
+    def on_lock(self):
+        self.set_locked(True)
+
+    @pyqtSlot()
+    def on_unlock(self):
+        self.set_locked(False)
+
+    def poll(self):
+        if self.idle_method is None or not self.idle_limit:
+            return
+        service, path, interface, method = self.IDLE_METHODS[self.idle_method]
+        self.call(self.session_bus, service, path, interface, method, self.on_idle_time)
+
+    def on_idle_time(self, idle_ms):
+        if idle_ms is None:
+            # 这个桌面环境不支持，换下一个接口
+            self.idle_method += 1
+            if self.idle_method >= len(self.IDLE_METHODS):
+                self.idle_method = None
+            return
+        self.report_idle_time(int(idle_ms) / 1000)
+
+class WindowsSessionDetector(SessionDetector):
+    """Windows：GetLastInputInfo 读取空闲时间，输入桌面无法切换时视为锁屏"""
+
+    def poll(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class LASTINPUTINFO(ctypes.Structure):
+            _fields_ = [("cbSize", wintypes.UINT), ("dwTime", wintypes.DWORD)]
+        user32 = ctypes.windll.user32
+        info = LASTINPUTINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if user32.GetLastInputInfo(ctypes.byref(info)):
+            idle_ms = (ctypes.windll.kernel32.GetTickCount() - info.dwTime) & 0xFFFFFFFF
+            self.report_idle_time(idle_ms / 1000)
+        desktop = user32.OpenInputDesktop(0, False, 0x0100)  # DESKTOP_SWITCHDESKTOP
+        locked = not desktop or not user32.SwitchDesktop(desktop)
+        if desktop:
+            user32.CloseDesktop(desktop)
+        self.set_locked(bool(locked))
+
+class FakeSessionDetector(SessionDetector):
+    """测试用：直接调用 set_locked / report_idle_time，或者在工作目录写 session_state.json，
+    例如 {"locked": true, "idle_seconds": 0}"""
+
+    def poll(self):
+        try:
+            with open(SESSION_FAKE_STATE_FILE, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.locked = bool(state.get("locked", False))
+        self.report_idle_time(state.get("idle_seconds", 0))
+
+def create_session_detector(kind, idle_minutes, parent=None):
+    """kind: auto、fake 或 none"""
+    if kind == "fake":
+        return FakeSessionDetector(idle_minutes, parent)
+    if kind == "auto" and os.name == "nt":
+        return WindowsSessionDetector(idle_minutes, parent)
+    if kind == "auto" and QDBusConnection is not None and QDBusConnection.sessionBus().isConnected():
+        return DBusSessionDetector(idle_minutes, parent)
+    return SessionDetector(idle_minutes, parent)
+
+# 显示时段：不在时段内的小部件完全卸载，开始前提前创建好隐藏的窗口
+SCHEDULE_PRELOAD_MINUTES = 2        # 默认提前多少分钟创建
+SCHEDULE_RESYNC_MS = 60000          # 最长隔这么久重新对一次时间，睡眠唤醒或改系统时间后也能及时更新
+SCHEDULE_SUSPEND_REASON = "schedule"
+
+def parse_clock(text):
+    """"HH:MM" -> 一天中的分钟数"""
+    hours, minutes = (int(part) for part in str(text).strip().split(":"))
+    # 24:00 表示一天结束
+    if not 0 <= hours <= 24 or not 0 <= minutes < 60 or hours * 60 + minutes > 24 * 60:
+        raise ValueError(f"时间无效: {text}")
+    return hours * 60 + minutes
+
+def parse_days(text):
+    """"1-5" 或 "1,3,5"，1-7 表示周一到周日"""
+    days = set()
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            days.update(range(int(first), int(last) + 1))
+        else:
+            days.add(int(part))
+    if not days or not days <= set(range(1, 8)):
+        raise ValueError(f"星期无效: {text}")
+    return sorted(days)
+
+def parse_schedule(text):
+    """"1-5 09:00-18:00; 22:00-02:00" -> 时段列表，省略星期表示每天"""
+    windows = []
+    for part in text.split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        days, _, hours = part.rpartition(" ")
+        start, end = hours.split("-")
+        window = {"start": start.strip(), "end": end.strip()}
+        if days.strip():
+            window["days"] = parse_days(days.strip())
+        windows.append(window)
+    check_schedule(windows)
+    return windows
+
+def format_days(days):
+    """[1, 2, 3, 5] -> 1-3,5"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and day == ranges[-1][1] + 1:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ",".join(f"{first}-{last}" if last > first else str(first) for first, last in ranges)
+
+def format_schedule(windows):
+    parts = []
+    for window in windows:
+        text = f"{window['start']}-{window['end']}"
+        if window.get("days"):
+            text = f"{format_days(window['days'])} {text}"
+        parts.append(text)
+    return "; ".join(parts)
+
+def check_schedule(windows):
+    """配置文件里的时段格式不对时抛出 ValueError"""
+    if not isinstance(windows, list):
+        raise ValueError("schedule 必须是列表")
+    for window in windows:
+        if not isinstance(window, dict) or parse_clock(window.get("start", "")) == parse_clock(window.get("end", "")):
+            raise ValueError(f"时段无效: {window}")
+        # 空的星期列表写回设置界面时会变成每天，直接拒绝
+        if "days" in window and (not isinstance(window["days"], list) or not window["days"]
+                                 or not set(window["days"]) <= set(range(1, 8))):
+            raise ValueError(f"星期无效: {window['days']}")
+
+def schedule_intervals(windows, now):
+    """now 前一天到之后一周内的所有显示时段，跨午夜的时段算在开始那天"""
+    midnight = datetime.datetime.combine(now.date(), datetime.time())
+    intervals = []
+    for offset in range(-1, 8):
+        day = midnight + datetime.timedelta(days=offset)
+        for window in windows:
+            if day.isoweekday() not in window.get("days", range(1, 8)):
+                continue
+            start = day + datetime.timedelta(minutes=parse_clock(window["start"]))
+            end = day + datetime.timedelta(minutes=parse_clock(window["end"]))
+            if end <= start:
+                end += datetime.timedelta(days=1)
+            intervals.append((start, end))
+    return intervals
+
+def schedule_state(windows, now, preload_minutes):
+    """返回 (状态, 下次变化的时间)，状态为 visible、preload 或 off"""
+    lead = datetime.timedelta(minutes=preload_minutes)
+    visible = preload = False
+    changes = []
+    for start, end in schedule_intervals(windows, now):
+        visible = visible or start <= now < end
+        preload = preload or start - lead <= now < start
+        changes.extend(moment for moment in (start - lead, start, end) if moment > now)
+    state = "visible" if visible else "preload" if preload else "off"
+    return state, min(changes, default=None)
+
+class WidgetScheduler(QObject):
+    """所有有显示时段的小部件共用一个定时器，只在下一个时段边界醒来"""
+    state_changed = pyqtSignal(str, str)    # 小部件编号, 状态
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.widgets = []
+        self.states = {}
+        self.preload_minutes = SCHEDULE_PRELOAD_MINUTES
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.evaluate)
+
+    def state_of(self, widget):
+        if not widget.get("schedule"):
+            return "visible"
+        preload_minutes = widget.get("preload_minutes", self.preload_minutes)
+        return schedule_state(widget["schedule"], datetime.datetime.now(), preload_minutes)[0]
+
+    def set_widgets(self, widgets, preload_minutes=SCHEDULE_PRELOAD_MINUTES):
+        """配置变化后重新开始，当前状态会全部重新发出一次"""
+        self.widgets = [widget for widget in widgets if widget.get("schedule")]
+        self.preload_minutes = preload_minutes
+        self.states = {}
+        self.evaluate()
+
+    def evaluate(self):
+        if not self.widgets:
+            self.timer.stop()
+            return
+        now = datetime.datetime.now()
+        next_change = None
+        for widget in self.widgets:
+            preload_minutes = widget.get("preload_minutes", self.preload_minutes)
+            state, change = schedule_state(widget["schedule"], now, preload_minutes)
+            if self.states.get(widget["id"]) != state:
+                self.states[widget["id"]] = state
+                self.state_changed.emit(widget["id"], state)
+            if change and (next_change is None or change < next_change):
+                next_change = change
+        delay_ms = SCHEDULE_RESYNC_MS
+        if next_change:
+            delay_ms = min(delay_ms, int((next_change - now).total_seconds() * 1000) + 50)
+        self.timer.start(max(delay_ms, 0))
+
+    def stop(self):
+        self.timer.stop()
+        self.widgets = []
+        self.states = {}
+
+# 原生小部件：不需要 Chromium 渲染进程，用 QPainter 直接绘制
+WEB_WIDGET_TYPE = "web"
+NATIVE_PLUGIN_DIR = "plugins"
+NATIVE_WIDGET_TYPES = {}   # 类型 -> 小部件类
+
+def register_native_widget(widget_type):
+    """注册原生小部件类型，插件文件里同样用它注册"""
+    def decorator(cls):
+        cls.widget_type = widget_type
+        NATIVE_WIDGET_TYPES[widget_type] = cls
+        return cls
+    return decorator
+
+def native_widget_class(widget_type):
+    """按类型取原生小部件类，内置类型之外的在第一次用到时才从插件目录加载"""
+    if widget_type in NATIVE_WIDGET_TYPES:
+        return NATIVE_WIDGET_TYPES[widget_type]
+    path = os.path.join(NATIVE_PLUGIN_DIR, f"{widget_type}.py")
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location(f"pyglass_plugin_{widget_type}", path)
+    module = importlib.util.module_from_spec(spec)
+    # 插件直接使用这两个名字，不需要 import 主程序
+    module.NativeWidget = NativeWidget
+    module.register_native_widget = register_native_widget
+    try:
+        spec.loader.exec_module(module)
+    except Exception as e:
+        print(f"加载插件 {path} 出错: {e}")
+        return None
+    return NATIVE_WIDGET_TYPES.get(widget_type)
+
+def available_widget_types():
+    """内置类型加上插件目录里的文件名，列出时不加载插件"""
+    types = [WEB_WIDGET_TYPE] + sorted(NATIVE_WIDGET_TYPES)
+    if os.path.isdir(NATIVE_PLUGIN_DIR):
+        for name in sorted(os.listdir(NATIVE_PLUGIN_DIR)):
+            widget_type, ext = os.path.splitext(name)
+            if ext == ".py" and widget_type not in types:
+                types.append(widget_type)
+    return types
+
+class NativeWidget(WidgetWindowMixin, QWidget):
+    """原生小部件基类：与网页小部件共用窗口行为，只在数据变化时按限定帧率重绘
+
+    子类实现 paint(painter)，需要更新时调用 set_data()。
+    """
+    widget_type = None
+    DEFAULT_MAX_FPS = 2
+
+    def __init__(self, config, opacity=1.0, bg_color="#00000000", x=100, y=100, width=400, height=300, always_on_top=True, parent=None):
+        super().__init__(parent)
+        self.config = config
+        self.data = None
+        self.background = QColor(0, 0, 0, 0)
+        self.last_paint = 0.0
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.timeout.connect(self.update)
+        self.apply_config(config)
+
+        self.init_window_behavior(opacity, bg_color, always_on_top)
+        self.setGeometry(x, y, width, height)
+        self.start()
+
+    def apply_config(self, config):
+        """配置变化时调用，子类可以覆盖来读取自己的字段"""
+        self.config = config
+        self.min_interval = 1.0 / max(0.1, float(config.get("max_fps", self.DEFAULT_MAX_FPS)))
+        self.update()
+
+    def start(self):
+        """子类在这里启动自己的数据源"""
+        pass
+
+    def set_content_background(self, color):
+        self.background = color
+        self.update()
+
+    def set_data(self, data):
+        """数据没变就不重绘，变了也不超过最大帧率"""
+        if data == self.data:
+            return
+        self.data = data
+        wait = self.last_paint + self.min_interval - time.monotonic()
+        if wait <= 0:
+            self.update()
+        elif not self.repaint_timer.isActive():
+            self.repaint_timer.start(int(wait * 1000))
+
+    def paintEvent(self, event):
+        self.last_paint = time.monotonic()
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), self.background)
+        self.paint(painter)
+        painter.end()
+
+    def paint(self, painter):
+        pass
+
+    def draw_centered_text(self, painter, text, scale=0.4):
+        font = QFont(self.font())
+        font.setPixelSize(max(10, int(min(self.height() * scale, self.width() * scale / max(1, len(text)) * 2))))
+        painter.setFont(font)
+        painter.setPen(QColor(self.config.get("text_color", "#f0f0f0")))
+        painter.drawText(self.rect(), Qt.AlignCenter | Qt.TextWordWrap, text)
+
+@register_native_widget("clock")
+class ClockWidget(NativeWidget):
+    """时钟：定时器对齐到下一秒，显示内容变化时才重绘"""
+
+    def start(self):
+        self.tick_timer = QTimer(self)
+        self.tick_timer.setSingleShot(True)
+        self.tick_timer.setTimerType(Qt.PreciseTimer)
+        self.tick_timer.timeout.connect(self.tick)
+        self.tick()
+
+    def tick(self):
+        self.set_data(time.strftime(self.config.get("format", "%H:%M:%S")))
+        now = time.time()
+        self.tick_timer.start(max(1, int((1 - (now - int(now))) * 1000)))
+
+    def paint(self, painter):
+        if self.data:
+            self.draw_centered_text(painter, self.data)
+
+@register_native_widget("cpu")
+class CpuWidget(NativeWidget):
+    """CPU 占用：按间隔采样，数值取整后没变化就不重绘"""
+
+    def start(self):
+        self.last_times = None
+        self.sample_timer = QTimer(self)
+        self.sample_timer.setInterval(int(self.config.get("interval", 1000)))
+        self.sample_timer.timeout.connect(self.sample)
+        self.sample_timer.start()
+        self.sample()
+
+    def read_cpu_percent(self):
+        if psutil:
+            return psutil.cpu_percent(interval=None)
+        try:
+            with open("/proc/stat", "r") as f:
+                fields = [int(v) for v in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle, total = fields[3] + fields[4], sum(fields)
+        previous, self.last_times = self.last_times, (idle, total)
+        if previous is None or total == previous[1]:
+            return 0.0
+        return 100.0 * (1 - (idle - previous[0]) / (total - previous[1]))
+
+    def sample(self):
+        percent = self.read_cpu_percent()
+        self.set_data(None if percent is None else round(percent))
+
+    def paint(self, painter):
+        if self.data is None:
+            self.draw_centered_text(painter, "CPU 不可用", 0.2)
+            return
+        # 底部的占用条
+        bar_height = max(4, self.height() // 10)
+        painter.fillRect(0, self.height() - bar_height, int(self.width() * self.data / 100), bar_height,
+                         QColor(self.config.get("bar_color", "#4a9bdf")))
+        self.draw_centered_text(painter, f"CPU {self.data}%", 0.3)
+
+@register_native_widget("note")
+class NoteWidget(NativeWidget):
+    """文字便签：只在文字变化时重绘"""
+
+    def apply_config(self, config):
+        super().apply_config(config)
+        self.set_data(config.get("text", ""))
+
+    def paint(self, painter):
+        if self.data:
+            self.draw_centered_text(painter, self.data, 0.15)
+
+# 网络恢复后的重新加载
+RELOAD_STAGGER_MS = 800             # 两次重新加载之间的间隔，避免同时发起一大堆请求
+RELOAD_BACKOFF_BASE = 5             # 连续失败的重试间隔（秒），每失败一次翻倍
+RELOAD_BACKOFF_MAX = 600
+CONNECTIVITY_PROBE_INTERVAL = 10    # 连通性探测间隔（秒）
+CONNECTIVITY_PROBE_TIMEOUT_MS = 5000
+
+class ReloadCoordinator(QObject):
+    """记录每个网页小部件最近一次加载的结果，网络恢复或休眠唤醒后只错峰重新加载失败或过期的小部件"""
+
+    def __init__(self, probe_url=None, stale_after=1800, parent=None):
+        super().__init__(parent)
+        self.probe_url = probe_url      # 没有配置时根据小部件的加载结果判断网络状态
+        self.stale_after = stale_after
+        self.states = {}                # 小部件 -> 加载状态
+        self.queue = deque()
+        self.online = None
+        self.probing = False
+        self.last_wall = time.time()
+        self.network = QNetworkAccessManager(self)
+
+        # 系统报告网络变化时立即探测一次
+        self.config_manager = QNetworkConfigurationManager(self)
+        self.config_manager.onlineStateChanged.connect(self.on_online_state_changed)
+
+        self.probe_timer = QTimer(self)
+        self.probe_timer.setInterval(CONNECTIVITY_PROBE_INTERVAL * 1000)
+        self.probe_timer.timeout.connect(self.probe)
+        self.probe_timer.start()
+
+        self.stagger_timer = QTimer(self)
+        self.stagger_timer.setInterval(RELOAD_STAGGER_MS)
+        self.stagger_timer.timeout.connect(self.reload_next)
+
+        self.retry_timer = QTimer(self)
+        self.retry_timer.setInterval(1000)
+        self.retry_timer.timeout.connect(self.check_retries)
+        self.retry_timer.start()
+
+    def track(self, view):
+        # deferred: 轮到重新加载时小部件正在暂停，等恢复后再排队
+        self.states[view] = {"ok": None, "time": time.monotonic(), "failures": 0, "next_retry": None,
+                             "deferred": False}
+        # 不用捕获视图的 lambda，否则连接会让关闭后的视图一直活着
+        view.loadFinished.connect(self.on_load_finished)
+
+    def untrack(self, view):
+        if self.states.pop(view, None) is not None:
+            try:
+                view.loadFinished.disconnect(self.on_load_finished)
+            except TypeError:
+                pass
+        if view in self.queue:
+            self.queue.remove(view)
+
+    def clear(self):
+        self.states = {}
+        self.queue.clear()
+        self.stagger_timer.stop()
+
+    def on_load_finished(self, ok):
+        view = self.sender()
+        state = self.states.get(view)
+        if state is None:
+            return
+        now = time.monotonic()
+        state["ok"] = ok
+        state["time"] = now
+        if ok:
+            state["failures"] = 0
+            state["next_retry"] = None
+            # 没有探测地址时，任何一个小部件加载成功都说明网络已经恢复
+            if not self.probe_url and self.online is False:
+                self.set_online(True)
+        else:
+            state["failures"] += 1
+            delay = min(RELOAD_BACKOFF_MAX, RELOAD_BACKOFF_BASE * 2 ** (state["failures"] - 1))
+            state["next_retry"] = now + delay
+            if not self.probe_url and all(s["ok"] is False for s in self.states.values()):
+                self.online = False
+
+    def on_online_state_changed(self, online):
+        if self.probe_url:
+            self.probe()
+        elif online:
+            # 没有探测地址时相信系统的联网通知，失败的小部件立即排队
+            self.set_online(True)
+
+    def retries_blocked(self):
+        """只有探测地址确认断网时才暂停重试；没有探测地址时退避重试本身就是探测，
+        否则全部失败后再也不会有加载成功来恢复 online"""
+        return bool(self.probe_url) and self.online is False
+
+    def probe(self):
+        # 墙上时间比定时器间隔多走了很多，说明机器刚从休眠中唤醒
+        now_wall = time.time()
+        resumed = now_wall - self.last_wall > CONNECTIVITY_PROBE_INTERVAL * 3
+        self.last_wall = now_wall
+        if resumed:
+            print("检测到休眠唤醒，检查需要重新加载的小部件")
+            self.reconcile()
+        if not self.probe_url or self.probing:
+            return
+        self.probing = True
+        request = QNetworkRequest(QUrl(self.probe_url))
+        request.setTransferTimeout(CONNECTIVITY_PROBE_TIMEOUT_MS)
+        reply = self.network.head(request)
+        reply.finished.connect(lambda: self.on_probe_finished(reply))
+
+    def on_probe_finished(self, reply):
+        self.probing = False
+        # 收到任何 HTTP 响应都说明网络是通的
+        online = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute) is not None
+        reply.deleteLater()
+        self.set_online(online)
+
+    def set_online(self, online):
+        was_online = self.online
+        self.online = online
+        if online and was_online is False:
+            print("网络已恢复，重新加载失败或过期的小部件")
+            self.reconcile()
+
+    def reconcile(self):
+        """把加载失败或内容过期的小部件排进错峰队列"""
+        now = time.monotonic()
+        for view, state in self.states.items():
+            if state["ok"] is False or now - state["time"] > self.stale_after:
+                state["next_retry"] = None
+                self.enqueue(view)
+
+    def check_retries(self):
+        """失败的小部件按指数退避重试，确认网络断开时不重试；暂停期间推迟的小部件恢复后补上"""
+        if self.retries_blocked():
+            return
+        now = time.monotonic()
+        for view, state in self.states.items():
+            if state["deferred"] and not view.suspend_reasons:
+                state["deferred"] = False
+                self.enqueue(view)
+            elif state["next_retry"] is not None and state["next_retry"] <= now:
+                state["next_retry"] = None
+                self.enqueue(view)
+
+    def enqueue(self, view):
+        if view not in self.queue:
+            self.queue.append(view)
+        if not self.stagger_timer.isActive():
+            self.stagger_timer.start()
+
+    def reload_next(self):
+        if not self.queue or self.retries_blocked():
+            # 网络又断了就等下次恢复
+            self.stagger_timer.stop()
+            return
+        # 暂停中的小部件（显示时段外、锁屏、没有屏幕等）是有意让渲染进程休眠的，重新加载会把它唤醒
+        while self.queue:
+            view = self.queue.popleft()
+            if view not in self.states:
+                continue
+            if view.suspend_reasons:
+                self.states[view]["deferred"] = True
+                continue
+            view.reload()
+            return
+
+# 宿主进程：一组网页小部件放到独立进程里运行，主进程通过本地套接字管理
+HOST_HEARTBEAT_MS = 1000        # 宿主进程心跳间隔
+HOST_START_TIMEOUT_MS = 20000   # 启动阶段加载 WebEngine 比较慢，单独放宽
+HOST_HANG_TIMEOUT_MS = 5000     # 超过这个时间没有心跳视为卡死
+HOST_RESTART_LIMIT = 3          # 每次启动网页后允许的重启次数
+
+def encode_message(message):
+    """进程间消息：每行一个 JSON"""
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+def split_messages(buffer):
+    """从缓冲区拆出完整的消息，返回 (消息列表, 剩余数据)"""
+    *lines, rest = buffer.split(b"\n")
+    messages = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            messages.append(json.loads(line.decode("utf-8")))
+        except ValueError as e:
+            print(f"宿主进程消息无效: {e}")
+    return messages, rest
+
+class WidgetHost(QObject):
+    """宿主进程一侧：按主进程发来的消息创建、更新和关闭本组的网页小部件"""
+
+    def __init__(self, server_name, group, parent=None):
+        super().__init__(parent)
+        self.group = group
+        self.views = {}      # 小部件编号 -> 网页视图
+        self.settings = {}
+        self.buffer = b""
+        self.profile_manager = ProfileManager(self)
+        self.snippets = SnippetRegistry()
+        self.heartbeat_timer = QTimer(self)
+        self.heartbeat_timer.setInterval(HOST_HEARTBEAT_MS)
+        self.heartbeat_timer.timeout.connect(self.heartbeat)
+        self.socket = QLocalSocket(self)
+        self.socket.readyRead.connect(self.on_ready_read)
+        # 主进程退出或断开时宿主进程跟着退出
+        self.socket.disconnected.connect(QApplication.quit)
+        self.socket.connectToServer(server_name)
+        if not self.socket.waitForConnected(3000):
+            print(f"宿主进程无法连接主进程: {self.socket.errorString()}")
+            QTimer.singleShot(0, QApplication.quit)
+            return
+        self.send({"type": "hello", "group": group, "pid": os.getpid()})
+        self.heartbeat_timer.start()
+
+    def send(self, message):
+        self.socket.write(encode_message(message))
+
+    def heartbeat(self):
+        """心跳由界面线程发出，界面线程卡住时心跳自然停止；顺带报告窗口位置"""
+        geometry = {}
+        for widget_id, view in self.views.items():
+            rect = view.geometry()
+            geometry[widget_id] = [rect.x(), rect.y(), rect.width(), rect.height()]
+        self.send({"type": "heartbeat", "geometry": geometry})
+
+    def on_ready_read(self):
+        messages, self.buffer = split_messages(self.buffer + bytes(self.socket.readAll()))
+        for message in messages:
+            kind = message.get("type")
+            try:
+                if kind == "open":
+                    # 重启后重新打开时，主进程把每个小部件的暂停原因和是否已显示一起发过来
+                    self.settings = message.get("settings", {})
+                    suspended = message.get("suspended", {})
+                    shown = set(message.get("shown", []))
+                    for widget_id, widget in message.get("widgets", {}).items():
+                        self.open_widget(widget_id, widget, suspended.get(widget_id, {}), widget_id in shown)
+                elif kind == "show":
+                    view = self.views.get(message["id"])
+                    if view and not view.suspend_reasons:
+                        view.show()
+                elif kind == "update":
+                    self.update_widget(message["id"], message["widget"])
+                elif kind == "close":
+                    view = self.views.pop(message["id"], None)
+                    if view:
+                        release_view(view)
+                elif kind == "suspend":
+                    view = self.views.get(message["id"])
+                    if view:
+                        view.suspend(message["reason"], message.get("freeze", True))
+                elif kind == "resume":
+                    view = self.views.get(message["id"])
+                    if view:
+                        view.resume(message["reason"])
+                elif kind == "quit":
+                    for view in self.views.values():
+                        release_view(view)
+                    self.views = {}
+                    QApplication.quit()
+            except Exception as e:
+                print(f"宿主进程处理消息 {kind} 出错: {e}")
+
+    def open_widget(self, widget_id, widget, suspended=None, shown=False):
+        """suspended: 暂停原因 -> 是否冻结，先暂停再决定是否显示，提前创建或暂停中的小部件不会闪一下"""
+        name = widget.get("profile")
+        view = DraggableWebView(
+            url=widget["url"],
+            opacity=widget["opacity"],
+            bg_color=widget["bg_color"],
+            x=widget["x"],
+            y=widget["y"],
+            width=widget["width"],
+            height=widget["height"],
+            always_on_top=widget["always_on_top"],
+            profile=self.profile_manager.get(name, self.settings.get("profiles", {}).get(name, {})),
+            scripts=self.snippets.scripts_for(widget, self.settings.get("snippets", {}))
+        )
+        view.set_refresh_interval(widget.get("refresh_interval", 0))
+        view.set_limits(widget.get("bandwidth_limit_kbps", 0), widget.get("request_rate_limit", 0))
+        view.set_zoom(widget.get("zoom", 1.0))
+        view.set_jank_policy(widget.get("jank_policy"))
+        view.jank_detected.connect(
+            lambda action, stats: self.send({"type": "jank", "id": widget_id, "action": action, "stats": stats}))
+        view.on_resized = lambda v: self.send({
+            "type": "resized", "id": widget_id, "geometry": [v.x(), v.y(), v.width(), v.height()]})
+        for reason, freeze in (suspended or {}).items():
+            view.suspend(reason, freeze)
+        if shown and not view.suspend_reasons:
+            view.show()
+        self.views[widget_id] = view
+
+    def update_widget(self, widget_id, widget):
+        view = self.views.get(widget_id)
+        if view is None:
+            self.open_widget(widget_id, widget)
+            return
+        if view.url().toString() != widget["url"]:
+            view.setUrl(QUrl(widget["url"]))
+        view.setGeometry(widget["x"], widget["y"], widget["width"], widget["height"])
+        view.always_on_top = widget["always_on_top"]
+        if not view.apply_appearance(widget["opacity"], widget["bg_color"]):
+            view.update_flags()
+        view.apply_snippets(self.snippets.scripts_for(widget, self.settings.get("snippets", {})))
+        view.set_refresh_interval(widget.get("refresh_interval", 0))
+        view.set_limits(widget.get("bandwidth_limit_kbps", 0), widget.get("request_rate_limit", 0))
+        if view.zoom != widget.get("zoom", 1.0):
+            view.set_zoom(widget.get("zoom", 1.0))
+        view.set_jank_policy(widget.get("jank_policy"))
+
+class HostSupervisor(QObject):
+    """主进程一侧：每个分组一个宿主进程，转发配置变化，卡死或崩溃时杀掉重启"""
+    notify = pyqtSignal(str, str)
+    jank = pyqtSignal(str, str, dict)   # 小部件编号, 执行的处理, 统计
+    resized = pyqtSignal(str, list)     # 小部件编号, [x, y, 宽, 高]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.server_name = f"pyglasspane-host-{os.getpid()}"
+        self.groups = {}        # 分组 -> 进程、连接和小部件配置
+        self.settings = {}
+        self.buffers = {}       # 连接 -> 未读完的数据
+        self.connections = {}   # 连接 -> 分组
+        QLocalServer.removeServer(self.server_name)
+        self.server = QLocalServer(self)
+        if not self.server.listen(self.server_name):
+            print(f"宿主进程通道无法监听 {self.server_name}: {self.server.errorString()}")
+        self.server.newConnection.connect(self.on_new_connection)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(HOST_HEARTBEAT_MS)
+        self.watch_timer.timeout.connect(self.check_hosts)
+
+    def start_group(self, group, widgets, settings):
+        """widgets: 小部件编号 -> 配置副本，宿主进程报告的位置会写回这里，重启后保持原位"""
+        self.settings = settings
+        # suspended: 小部件编号 -> {暂停原因: 是否冻结}，shown: 主进程要求显示过的小部件；
+        # 宿主进程连上之前发的消息会丢失，重启后也要恢复，所以记在这里随 open 消息一起发送
+        self.groups[group] = {"widgets": widgets, "process": None, "socket": None,
+                              "last_beat": 0, "restarts": 0, "suspended": {}, "shown": set()}
+        self.spawn(group)
+        self.watch_timer.start()
+
+    def spawn(self, group):
+        state = self.groups[group]
+        process = QProcess(self)
+        env = QProcessEnvironment.systemEnvironment()
+        env.remove("QTWEBENGINE_REMOTE_DEBUGGING")  # 调试端口只留给主进程
+        process.setProcessEnvironment(env)
+        process.setProcessChannelMode(QProcess.ForwardedChannels)
+        process.finished.connect(lambda *_, g=group, p=process: self.on_host_finished(g, p))
+        process.finished.connect(process.deleteLater)
+        state.update(process=process, socket=None, last_beat=time.monotonic())
+        # 打包后的程序本身就是解释器，不需要再传脚本路径
+        args = [] if getattr(sys, "frozen", False) else [os.path.abspath(__file__)]
+        process.start(sys.executable, args + ["--host", group, "--server", self.server_name])
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            conn = self.server.nextPendingConnection()
+            self.buffers[conn] = b""
+            conn.readyRead.connect(lambda c=conn: self.on_host_data(c))
+            conn.disconnected.connect(lambda c=conn: self.forget_connection(c))
+
+    def forget_connection(self, conn):
+        self.buffers.pop(conn, None)
+        self.connections.pop(conn, None)
+        conn.deleteLater()
+
+    def on_host_data(self, conn):
+        messages, self.buffers[conn] = split_messages(self.buffers.get(conn, b"") + bytes(conn.readAll()))
+        for message in messages:
+            kind = message.get("type")
+            if kind == "hello":
+                group = message.get("group")
+                state = self.groups.get(group)
+                if state is None or state["socket"] is not None:
+                    conn.disconnectFromServer()
+                    return
+                self.connections[conn] = group
+                state["socket"] = conn
+                state["last_beat"] = time.monotonic()
+                self.send(group, {"type": "open", "settings": self.settings, "widgets": state["widgets"],
+                                  "suspended": state["suspended"], "shown": sorted(state["shown"])})
+            elif kind == "heartbeat":
+                state = self.groups.get(self.connections.get(conn))
+                if state is None:
+                    continue
+                state["last_beat"] = time.monotonic()
+                for widget_id, rect in message.get("geometry", {}).items():
+                    widget = state["widgets"].get(widget_id)
+                    if widget:
+                        widget["x"], widget["y"], widget["width"], widget["height"] = rect
+            elif kind == "resized":
+                state = self.groups.get(self.connections.get(conn))
+                widget = state["widgets"].get(message.get("id")) if state else None
+                if widget:
+                    widget["x"], widget["y"], widget["width"], widget["height"] = message["geometry"]
+                    self.resized.emit(message["id"], message["geometry"])
+            elif kind == "jank":
+                self.jank.emit(message.get("id", ""), message.get("action", "none"), message.get("stats", {}))
+
+    def send(self, group, message):
+        state = self.groups.get(group)
+        if state and state["socket"] is not None:
+            state["socket"].write(encode_message(message))
+
+    def update_widget(self, group, widget_id, widget):
+        state = self.groups.get(group)
+        if state is None:
+            return
+        state["widgets"][widget_id] = dict(widget)
+        self.send(group, {"type": "update", "id": widget_id, "widget": widget})
+
+    def show_widget(self, group, widget_id):
+        state = self.groups.get(group)
+        if state is None:
+            return
+        state["shown"].add(widget_id)
+        self.send(group, {"type": "show", "id": widget_id})
+
+    def suspend_widget(self, group, widget_id, reason, freeze=True):
+        state = self.groups.get(group)
+        if state is None:
+            return
+        state["suspended"].setdefault(widget_id, {})[reason] = freeze
+        self.send(group, {"type": "suspend", "id": widget_id, "reason": reason, "freeze": freeze})
+
+    def resume_widget(self, group, widget_id, reason):
+        state = self.groups.get(group)
+        if state is None:
+            return
+        reasons = state["suspended"].get(widget_id, {})
+        reasons.pop(reason, None)
+        if not reasons:
+            # 和本地小部件一样，所有暂停原因解除后窗口会显示出来
+            state["suspended"].pop(widget_id, None)
+            state["shown"].add(widget_id)
+        self.send(group, {"type": "resume", "id": widget_id, "reason": reason})
+
+    def suspend_reasons_of(self, group, widget_id):
+        state = self.groups.get(group)
+        return set(state["suspended"].get(widget_id, {})) if state else set()
+
+    def has_widget(self, group, widget_id):
+        return group in self.groups and widget_id in self.groups[group]["widgets"]
+
+    def add_widget(self, group, widget_id, widget, settings):
+        """分组已经在运行时交给现有宿主进程，否则为它启动一个"""
+        if group in self.groups:
+            self.update_widget(group, widget_id, widget)
+        else:
+            self.start_group(group, {widget_id: dict(widget)}, settings)
+
+    def close_widget(self, group, widget_id):
+        state = self.groups.get(group)
+        if state is None:
+            return
+        state["widgets"].pop(widget_id, None)
+        state["suspended"].pop(widget_id, None)
+        state["shown"].discard(widget_id)
+        self.send(group, {"type": "close", "id": widget_id})
+        # 分组里没有小部件了就结束宿主进程
+        if not state["widgets"]:
+            self.stop_group(group)
+
+    def check_hosts(self):
+        now = time.monotonic()
+        for group, state in list(self.groups.items()):
+            timeout = HOST_HANG_TIMEOUT_MS if state["socket"] is not None else HOST_START_TIMEOUT_MS
+            if (now - state["last_beat"]) * 1000 > timeout:
+                self.restart_group(group, "没有响应")
+
+    def on_host_finished(self, group, process):
+        state = self.groups.get(group)
+        if state and state["process"] is process:
+            self.restart_group(group, "意外退出")
+
+    def release(self, state):
+        """断开并结束宿主进程，之后的 finished 信号不再触发重启"""
+        process, conn = state["process"], state["socket"]
+        state.update(process=None, socket=None)
+        if conn is not None:
+            self.connections.pop(conn, None)
+            conn.abort()
+        return process
+
+    def restart_group(self, group, reason):
+        state = self.groups[group]
+        process = self.release(state)
+        if process is not None:
+            process.kill()
+        if state["restarts"] >= HOST_RESTART_LIMIT:
+            del self.groups[group]
+            self.notify.emit("宿主进程", f"分组 {group} {reason}，重启次数过多，已停止")
+            return
+        state["restarts"] += 1
+        self.notify.emit("宿主进程", f"分组 {group} {reason}，正在重启")
+        self.spawn(group)
+
+    def stop_group(self, group):
+        state = self.groups.pop(group, None)
+        if state is None:
+            return
+        conn = state["socket"]
+        if conn is not None:
+            conn.write(encode_message({"type": "quit"}))
+            conn.flush()
+        process = self.release(state)
+        if process is not None:
+            # 给宿主进程留时间正常退出，超时再强制结束
+            kill_timer = QTimer(process)
+            kill_timer.setSingleShot(True)
+            kill_timer.timeout.connect(process.kill)
+            kill_timer.start(HOST_HANG_TIMEOUT_MS)
+
+    def shutdown(self):
+        for group in list(self.groups):
+            self.stop_group(group)
+        self.watch_timer.stop()
+
+class HostedWidget(QObject):
+    """主进程里代表宿主进程中一个小部件的对象，提供和本地小部件相同的接口"""
+
+    def __init__(self, supervisor, group, widget_id, widget, parent=None):
+        super().__init__(parent)
+        self.supervisor = supervisor
+        self.group = group
+        self.widget_id = widget_id
+        self.widget = dict(widget)
+        self.always_on_top = widget["always_on_top"]
+        self.composition = f"宿主进程 {group}"
+
+    def apply_config(self, widget):
+        self.widget = dict(widget, always_on_top=self.always_on_top)
+        self.supervisor.update_widget(self.group, self.widget_id, self.widget)
+
+    def apply_appearance(self, opacity, bg_color):
+        self.widget.update(opacity=opacity, bg_color=bg_color)
+        self.update_flags()
+        return True
+
+    def update_flags(self):
+        self.widget["always_on_top"] = self.always_on_top
+        self.supervisor.update_widget(self.group, self.widget_id, self.widget)
+
+    @property
+    def suspend_reasons(self):
+        return self.supervisor.suspend_reasons_of(self.group, self.widget_id)
+
+    def show(self):
+        """窗口由宿主进程负责显示，有暂停原因时宿主进程不会显示"""
+        self.supervisor.show_widget(self.group, self.widget_id)
+
+    def suspend(self, reason, freeze=True):
+        self.supervisor.suspend_widget(self.group, self.widget_id, reason, freeze)
+
+    def resume(self, reason):
+        self.supervisor.resume_widget(self.group, self.widget_id, reason)
+
+    def close(self):
+        self.supervisor.close_widget(self.group, self.widget_id)
+
+# 配置热更新：外部程序修改配置文件后只把变化的部分应用到正在运行的小部件
+CONFIG_RELOAD_DEBOUNCE_MS = 500
+# 这些字段变化时需要重新创建小部件窗口，其余字段直接更新
+WIDGET_RECREATE_KEYS = ("type", "profile", "host_group", "data_bus")
+
+def validate_config(settings, widgets):
+    """校验外部修改的配置，有任何问题都抛出 ValueError，整个文件不生效"""
+    if not isinstance(settings, dict):
+        raise ValueError("settings 必须是对象")
+    if not isinstance(widgets, list):
+        raise ValueError("web_widgets 必须是列表")
+    if "render_scale" in settings:
+        settings["render_scale"] = check_render_scale(settings["render_scale"])
+    ids = set()
+    for i, widget in enumerate(widgets):
+        where = f"第 {i + 1} 个小部件"
+        if not isinstance(widget, dict):
+            raise ValueError(f"{where}不是对象")
+        for key in ("x", "y", "width", "height"):
+            if not isinstance(widget.get(key), int):
+                raise ValueError(f"{where}的 {key} 必须是整数")
+        if widget["width"] < 100 or widget["height"] < 100:
+            raise ValueError(f"{where}的窗口大小不能小于100x100")
+        opacity = widget.get("opacity")
+        if not isinstance(opacity, (int, float)) or not 0 <= opacity <= 1:
+            raise ValueError(f"{where}的 opacity 必须在 0 到 1 之间")
+        if not isinstance(widget.get("bg_color"), str):
+            raise ValueError(f"{where}缺少 bg_color")
+        if not isinstance(widget.get("always_on_top"), bool):
+            raise ValueError(f"{where}的 always_on_top 必须是 true 或 false")
+        if widget.get("type", WEB_WIDGET_TYPE) == WEB_WIDGET_TYPE and not isinstance(widget.get("url"), str):
+            raise ValueError(f"{where}缺少 url")
+        if "schedule" in widget:
+            check_schedule(widget["schedule"])
+        if "zoom" in widget:
+            check_zoom(widget["zoom"])
+        if "jank_policy" in widget:
+            check_jank_policy(widget["jank_policy"])
+        widget_id = widget.get("id")
+        if widget_id is not None:
+            if widget_id in ids:
+                raise ValueError(f"小部件编号重复: {widget_id}")
+            ids.add(widget_id)
+
+class ConfigWatcher(QObject):
+    """监视配置文件，外部修改经过防抖后在后台线程解析和校验，通过信号交给界面线程"""
+    config_changed = pyqtSignal(dict, list)
+    config_rejected = pyqtSignal(str)
+
+    def __init__(self, path, parent=None):
+        super().__init__(parent)
+        self.path = os.path.abspath(path)
+        self.last_digest = self.file_digest()  # 最近一次读到或写入的内容，相同内容不重复处理
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self.schedule)
+        self.watcher.directoryChanged.connect(self.schedule)
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(CONFIG_RELOAD_DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.reload)
+        self.watch()
+
+    def file_digest(self):
+        try:
+            with open(self.path, "rb") as f:
+                return hashlib.sha1(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def watch(self):
+        """很多编辑器保存时先写临时文件再改名，文件被替换后要重新加入监视；目录也一起监视"""
+        directory = os.path.dirname(self.path)
+        if directory not in self.watcher.directories():
+            self.watcher.addPath(directory)
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+
+    def schedule(self, *_):
+        self.watch()
+        self.debounce_timer.start()
+
+    def mark_written(self, data):
+        """记录程序自己写入的内容，随后收到的变化通知不会当作外部修改"""
+        self.last_digest = hashlib.sha1(data).hexdigest()
+
+    def reload(self):
+        def worker():
+            try:
+                with open(self.path, "rb") as f:
+                    raw = f.read()
+            except OSError:
+                return  # 文件正在被替换，等下一次通知
+            if not raw.strip():
+                return  # 对方刚清空文件还没写完
+            digest = hashlib.sha1(raw).hexdigest()
+            if digest == self.last_digest:
+                return
+            self.last_digest = digest
+            try:
+                settings, widgets = config_from_data(json.loads(raw.decode("utf-8")))
+                validate_config(settings, widgets)
+            except (ValueError, TypeError) as e:
+                self.config_rejected.emit(str(e))
+                return
+            self.config_changed.emit(settings, widgets)
+        threading.Thread(target=worker, name="config-reload", daemon=True).start()
+
+# 多显示器：位置记录为相对某个屏幕左上角的偏移，插拔显示器或改分辨率后重新计算
+SCREEN_RELAYOUT_DELAY_MS = 300      # 插拔时会连续收到多个信号，合并成一次重新布局
+SCREEN_SUSPEND_REASON = "screen"
+
+def screen_by_name(name):
+    for screen in QApplication.screens():
+        if screen.name() == name:
+            return screen
+    return None
+
+def screen_of_rect(x, y, width, height):
+    """与矩形重叠面积最大的屏幕，完全不在任何屏幕上时返回 None"""
+    rect = QRect(x, y, width, height)
+    best, best_area = None, 0
+    for screen in QApplication.screens():
+        overlap = screen.geometry().intersected(rect)
+        area = overlap.width() * overlap.height()
+        if area > best_area:
+            best, best_area = screen, area
+    return best
+
+def anchor_to_screen(widget):
+    """记录小部件相对所在屏幕的位置，小部件不在任何屏幕上时保留原来的记录"""
+    screen = screen_of_rect(widget["x"], widget["y"], widget["width"], widget["height"])
+    if screen is None:
+        return
+    geometry = screen.geometry()
+    widget["screen"] = {"name": screen.name(), "x": widget["x"] - geometry.x(), "y": widget["y"] - geometry.y()}
+
+def place_widget(widget, fallback="park"):
+    """按当前的屏幕计算小部件的位置，返回 (x, y)；无处可放时返回 None
+
+    记录的屏幕还在时放回原位并保证完整显示在可用区域内；屏幕不在了，fallback 为 primary
+    时移到主屏幕的同一相对位置，否则返回 None 由调用方暂停。
+    """
+    anchor = widget.get("screen")
+    screen = screen_by_name(anchor["name"]) if anchor else None
+    if screen is None:
+        if anchor is None and screen_of_rect(widget["x"], widget["y"], widget["width"], widget["height"]):
+            return widget["x"], widget["y"]
+        if fallback != "primary" or QApplication.primaryScreen() is None:
+            return None
+        screen = QApplication.primaryScreen()
+        anchor = anchor or {"x": 0, "y": 0}
+    geometry = screen.geometry()
+    area = screen.availableGeometry()
+    x = max(area.left(), min(geometry.x() + anchor["x"], area.right() + 1 - widget["width"]))
+    y = max(area.top(), min(geometry.y() + anchor["y"], area.bottom() + 1 - widget["height"]))
+    return x, y
+
+# 自动排列：把选中的小部件排进某个屏幕的可用区域
+LAYOUT_MODES = {"shelf": "按原尺寸紧凑排列", "grid": "等大网格"}
+LAYOUT_MIN_SIZE = 100
+
+def layout_order(widgets, by_height=False):
+    """优先级高的先排；by_height 时同优先级里高的先排（排成行时浪费最少），否则保持原顺序"""
+    return sorted(range(len(widgets)), key=lambda i: (
+        -widgets[i].get("layout_priority", 0), -widgets[i]["height"] if by_height else 0))
+
+def pack_shelves(widgets, area, gap):
+    """按行摆放：每行的高度由第一个放进去的小部件决定，后面的小部件优先塞进已有的行"""
+    left, top, width, height = area
+    result = [None] * len(widgets)
+    shelves = []    # [y, 行高, 已用宽度]
+    bottom = top
+    for i in layout_order(widgets, by_height=True):
+        widget = widgets[i]
+        w = max(min(widget["width"], width), widget.get("min_width", LAYOUT_MIN_SIZE))
+        h = max(min(widget["height"], height), widget.get("min_height", LAYOUT_MIN_SIZE))
+        for shelf in shelves:
+            if h <= shelf[1] and shelf[2] + w <= width:
+                result[i] = (left + shelf[2], shelf[0], w, h)
+                shelf[2] += w + gap
+                break
+        else:
+            if bottom + h > top + height or w > width:
+                continue  # 放不下，留给优先级更高的小部件
+            shelves.append([bottom, h, w + gap])
+            result[i] = (left, bottom, w, h)
+            bottom += h + gap
+    return result
+
+def pack_grid(widgets, area, gap):
+    """所有小部件用同样大小的格子；列数取让格子最接近小部件平均宽高比且面积最大的那个"""
+    left, top, width, height = area
+    count = len(widgets)
+    result = [None] * count
+    if not count:
+        return result
+    aspect = sum(widget["width"] / widget["height"] for widget in widgets) / count
+    min_width = max(widget.get("min_width", LAYOUT_MIN_SIZE) for widget in widgets)
+    min_height = max(widget.get("min_height", LAYOUT_MIN_SIZE) for widget in widgets)
+    best = None
+    for columns in range(1, count + 1):
+        rows = -(-count // columns)
+        cell_width = (width - gap * (columns - 1)) // columns
+        cell_height = (height - gap * (rows - 1)) // rows
+        if cell_width < min_width:
+            break
+        if cell_height < min_height:
+            continue
+        # 格子里能放下的、宽高比为 aspect 的最大矩形
+        fit_width = min(cell_width, cell_height * aspect)
+        score = fit_width * fit_width / aspect
+        if best is None or score > best[0]:
+            best = (score, columns, cell_width, cell_height)
+    if best is None:
+        # 全部放不下时按最小尺寸能放几个放几个
+        columns = max(1, (width + gap) // (min_width + gap))
+        rows = max(1, (height + gap) // (min_height + gap))
+        best = (0, columns, min_width, min_height)
+        count = min(count, columns * rows)
+    _, columns, cell_width, cell_height = best
+    for slot, i in enumerate(layout_order(widgets)[:count]):
+        row, column = divmod(slot, columns)
+        result[i] = (left + column * (cell_width + gap), top + row * (cell_height + gap), cell_width, cell_height)
+    return result
+
+def pack_widgets(widgets, area, mode="shelf", gap=10):
+    """返回与 widgets 同序的 (x, y, 宽, 高)，放不下的为 None；area 为 (x, y, 宽, 高)"""
+    if mode == "grid":
+        return pack_grid(widgets, area, gap)
+    return pack_shelves(widgets, area, gap)
+
+class LayoutDialog(QDialog):
+    """选择要排列的小部件、目标屏幕和排列方式"""
+
+    def __init__(self, widgets, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("自动排列")
+        self.setMinimumWidth(420)
+        layout = QVBoxLayout(self)
+
+        self.widget_list = QListWidget()
+        for widget in widgets:
+            item = QListWidgetItem(widget.get("name", "网页小部件"))
+            item.setData(Qt.UserRole, widget["id"])
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+            self.widget_list.addItem(item)
+        layout.addWidget(QLabel("参与排列的小部件（优先级高的先排，配置项 layout_priority）:"))
+        layout.addWidget(self.widget_list)
+
+        form = QGridLayout()
+        form.addWidget(QLabel("屏幕:"), 0, 0)
+        self.screen_combo = QComboBox()
+        for screen in QApplication.screens():
+            geometry = screen.availableGeometry()
+            self.screen_combo.addItem(f"{screen.name()} ({geometry.width()}x{geometry.height()})", screen.name())
+        form.addWidget(self.screen_combo, 0, 1)
+        form.addWidget(QLabel("方式:"), 1, 0)
+        self.mode_combo = QComboBox()
+        for mode, label in LAYOUT_MODES.items():
+            self.mode_combo.addItem(label, mode)
+        form.addWidget(self.mode_combo, 1, 1)
+        form.addWidget(QLabel("间距:"), 2, 0)
+        self.gap_edit = QLineEdit("10")
+        self.gap_edit.setValidator(QIntValidator(0, 200))
+        form.addWidget(self.gap_edit, 2, 1)
+        layout.addLayout(form)
+
+        buttons = QHBoxLayout()
+        ok_btn = QPushButton("排列")
+        ok_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(ok_btn)
+        buttons.addWidget(cancel_btn)
+        layout.addLayout(buttons)
+
+    def selected_ids(self):
+        items = (self.widget_list.item(i) for i in range(self.widget_list.count()))
+        return {item.data(Qt.UserRole) for item in items if item.checkState() == Qt.Checked}
+
+    def screen(self):
+        return screen_by_name(self.screen_combo.currentData()) or QApplication.primaryScreen()
+
+    def mode(self):
+        return self.mode_combo.currentData()
+
+    def gap(self):
+        return int(self.gap_edit.text() or 0)
+
+# 连接预热：启动和定时刷新之前先完成 DNS、TCP 和 TLS 握手
+WARMUP_CONCURRENCY = 6          # 同时预热的源数量
+WARMUP_TIMEOUT_MS = 5000        # 单个源的预热超时
+WARMUP_DONE_GRACE_MS = 2000     # 一轮预热超过预计时间这么久还没收到 warmup_done（页面崩溃或被导航走），就不再等它
+WARMUP_LEAD_MS = 1500           # 定时刷新时提前多久预热
+WARMUP_REFRESH_MIN_SECONDS = 120  # 刷新间隔短于这个时间时连接还在连接池里，不需要预热
+
+# 隐藏页面里并发受限地对每个源发一个 no-cors 的 HEAD 请求，连接留在该存储分区的连接池里
+WARMUP_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><script>
+(function () {
+    var origins = %(origins)s, limit = %(limit)d, next = 0, running = 0;
+    function report(data) { console.log("%(prefix)s" + JSON.stringify(data)); }
+    function pump() {
+        if (next >= origins.length && running === 0) { report({type: "warmup_done"}); return; }
+        while (running < limit && next < origins.length) {
+            var origin = origins[next++], started = performance.now(), controller = new AbortController();
+            running++;
+            setTimeout(controller.abort.bind(controller), %(timeout)d);
+            fetch(origin + "/", {method: "HEAD", mode: "no-cors", cache: "no-store", signal: controller.signal})
+                .then(function () { return true; }, function () { return false; })
+                .then(function (origin, started, ok) {
+                    running--;
+                    report({type: "warmup", origin: origin, ok: ok, ms: performance.now() - started});
+                    pump();
+                }.bind(null, origin, started));
+        }
+    }
+    pump();
+})();
+</script></head><body></body></html>"""
+
+def url_origin(url):
+    """http(s) 网址的源，其余协议返回 None"""
+    qurl = QUrl(url)
+    if qurl.scheme() not in ("http", "https") or not qurl.host():
+        return None
+    return qurl.adjusted(QUrl.RemovePath | QUrl.RemoveQuery | QUrl.RemoveFragment | QUrl.RemoveUserInfo).toString()
+
+class ConnectionWarmer(QObject):
+    """每个存储分区一个隐藏页面，连接池按分区隔离，所以要在小部件将要使用的分区里预热"""
+
+    def __init__(self, concurrency=WARMUP_CONCURRENCY, parent=None):
+        super().__init__(parent)
+        self.concurrency = concurrency
+        self.pages = {}         # 存储分区 -> 预热页面
+        self.pending = {}       # 存储分区 -> 等当前一轮结束后再预热的源
+        self.busy = set()
+        self.timers = {}        # 存储分区 -> 等待 warmup_done 的超时定时器
+        self.results = {}       # 源 -> 最近一次预热耗时（毫秒），失败为 None
+
+    def warm(self, origins, profile):
+        origins = {origin for origin in origins if origin}
+        if not origins:
+            return
+        if profile in self.busy:
+            self.pending.setdefault(profile, set()).update(origins)
+            return
+        page = self.pages.get(profile)
+        if page is None:
+            page = WidgetPage(profile, self)
+            page.report.connect(lambda kind, data, p=profile: self.on_report(p, kind, data))
+            self.pages[profile] = page
+        self.busy.add(profile)
+        timer = self.timers.get(profile)
+        if timer is None:
+            timer = QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda p=profile: self.finish(p))
+            self.timers[profile] = timer
+        rounds = -(-len(origins) // max(1, self.concurrency))
+        timer.start(rounds * WARMUP_TIMEOUT_MS + WARMUP_DONE_GRACE_MS)
+        html = WARMUP_HTML % {
+            "origins": json.dumps(sorted(origins)),
+            "limit": self.concurrency,
+            "timeout": WARMUP_TIMEOUT_MS,
+            "prefix": PAGE_REPORT_PREFIX,
+        }
+        page.setHtml(html, QUrl("about:blank"))
+
+    def on_report(self, profile, kind, data):
+        if kind == "warmup":
+            self.results[data.get("origin")] = round(data.get("ms", 0)) if data.get("ok") else None
+            if TRACE_ENABLED:
+                TRACER.async_event("n", "warmup", id(profile), args=data)
+        elif kind == "warmup_done":
+            self.finish(profile)
+
+    def finish(self, profile):
+        """一轮预热结束或超时，清掉忙碌标记并预热排队的源"""
+        timer = self.timers.get(profile)
+        if timer:
+            timer.stop()
+        self.busy.discard(profile)
+        pending = self.pending.pop(profile, None)
+        if pending:
+            self.warm(pending, profile)
+
+# 所有小部件的显示和隐藏合成一组动画，由同一个定时器驱动
+ANIMATION_DURATION_MS = 250
+ANIMATION_FRAME_MS = 16
+ANIMATION_FRAME_BUDGET_MS = 8   # 一帧里设置透明度超过这个时间说明窗口太多，直接切换到最终状态
+ANIMATION_LATE_FRAMES = 3       # 两帧间隔超过这么多帧说明界面线程忙，同样直接切换
+TRAY_SUSPEND_REASON = "tray"
+
+class WidgetAnimator(QObject):
+    """窗口透明度渐变：只处理屏幕上可见的顶层窗口，叠加窗口里的、宿主进程里的、屏幕外的和暂停中的小部件直接切换"""
+
+    def __init__(self, duration=ANIMATION_DURATION_MS, parent=None):
+        super().__init__(parent)
+        self.duration = duration
+        self.curve = QEasingCurve(QEasingCurve.InOutQuad)
+        self.timer = QTimer(self)
+        self.timer.setInterval(ANIMATION_FRAME_MS)
+        self.timer.timeout.connect(self.tick)
+        self.windows = {}       # 窗口 -> 最终透明度
+        self.showing = True
+        self.done = None
+        self.started = 0
+        self.last_tick = 0
+        self.degraded = 0       # 因为超出帧预算直接切换的次数
+
+    @staticmethod
+    def can_animate(view, ignore=()):
+        """ignore 是即将由 reveal 解除的暂停原因，不算作暂停"""
+        if not isinstance(view, QWidget) or not view.isWindow():
+            return False
+        if set(getattr(view, "suspend_reasons", ())) - set(ignore):
+            return False
+        rect = view.geometry()
+        return screen_of_rect(rect.x(), rect.y(), rect.width(), rect.height()) is not None
+
+    def show_views(self, views, reveal=None, reason=None):
+        """reveal 负责显示窗口（默认没有暂停原因时 show），reason 是 reveal 要解除的暂停原因；
+        先把透明度设为 0 再显示，避免闪一下"""
+        self.finish()
+        for view in views:
+            animate = self.can_animate(view, ignore=(reason,) if reason else ())
+            opacity = view.windowOpacity() if animate else None
+            if animate:
+                view.setWindowOpacity(0.0)
+            if reveal:
+                reveal(view)
+            elif not getattr(view, "suspend_reasons", None):
+                view.show()
+            if animate and view.isVisible():
+                self.windows[view] = opacity
+            elif animate:
+                view.setWindowOpacity(opacity)
+        self.start(True)
+
+    def hide_views(self, views, done=None):
+        """渐隐后隐藏窗口并恢复原来的透明度，done 在全部结束后调用"""
+        self.finish()
+        self.windows = {view: view.windowOpacity() for view in views if self.can_animate(view) and view.isVisible()}
+        self.done = done
+        self.start(False)
+
+    def start(self, showing):
+        self.showing = showing
+        if not self.windows:
+            self.finish()
+            return
+        if TRACE_ENABLED:
+            TRACER.async_event("b", "widget_animation", id(self), args={"windows": len(self.windows), "show": showing})
+        self.started = self.last_tick = time.perf_counter()
+        self.timer.start()
+
+    def tick(self):
+        now = time.perf_counter()
+        late = (now - self.last_tick) * 1000 > ANIMATION_FRAME_MS * ANIMATION_LATE_FRAMES
+        self.last_tick = now
+        progress = min(1.0, (now - self.started) * 1000 / self.duration)
+        value = self.curve.valueForProgress(progress if self.showing else 1.0 - progress)
+        for window, opacity in self.windows.items():
+            window.setWindowOpacity(opacity * value)
+        over_budget = (time.perf_counter() - now) * 1000 > ANIMATION_FRAME_BUDGET_MS
+        if over_budget or late:
+            self.degraded += 1
+        if progress >= 1.0 or over_budget or late:
+            self.finish()
+
+    def finish(self):
+        """直接切换到最终状态；动画进行中又触发新的显示或隐藏时也先走这里"""
+        self.timer.stop()
+        windows, self.windows = self.windows, {}
+        done, self.done = self.done, None
+        for window, opacity in windows.items():
+            if not self.showing:
+                window.hide()
+            window.setWindowOpacity(opacity)
+        if windows and TRACE_ENABLED:
+            TRACER.async_event("e", "widget_animation", id(self), args={"degraded": self.degraded})
+        if done:
+            done()
+
+# 小部件列表显示的网站图标、标题和缩略图，页面加载后记录，不用启动渲染进程也能区分小部件
+METADATA_DIR = "widget_metadata"
+METADATA_INDEX_FILE = "index.json"
+METADATA_ICON_SIZE = 32
+METADATA_THUMBNAIL_SIZE = (240, 160)
+METADATA_CAPTURE_DELAY_MS = 3000    # 加载完成后等页面渲染好再截图
+METADATA_SAVE_DELAY_MS = 1000
+METADATA_TIMER_NAME = "pyglass-metadata-timer"
+
+def read_metadata_index(directory):
+    try:
+        with open(os.path.join(directory, METADATA_INDEX_FILE), "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        return entries if isinstance(entries, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def write_metadata_files(directory, files):
+    """files 是 文件名 -> 图片或字节 的字典，在线程池中运行；QImage 不是 QPixmap，可以在后台线程编码"""
+    os.makedirs(directory, exist_ok=True)
+    for name, data in files.items():
+        path = os.path.join(directory, name)
+        if isinstance(data, QImage):
+            data.save(path)
+        else:
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+
+def read_metadata_images(directory, names):
+    """在线程池中解码图片，名称为空或文件损坏时对应位置是 None"""
+    images = []
+    for name in names:
+        image = QImage(os.path.join(directory, name)) if name else QImage()
+        images.append(None if image.isNull() else image)
+    return images
+
+def remove_metadata_files(directory, names):
+    for name in names:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+class WidgetMetadataCache(QObject):
+    """按小部件编号缓存图标、标题和缩略图；索引和图片在第一次查询时才在线程池中读取和解码，网址变化后作废"""
+    loaded = pyqtSignal(str)    # 小部件编号，条目读取、解码、更新或作废后发出
+
+    def __init__(self, tasks, directory=METADATA_DIR, parent=None):
         super().__init__(parent)
-        self.setUrl(QUrl(url))
+        self.tasks = tasks
+        self.directory = directory
+        self.entries = None     # 编号 -> {"url", "title", "icon", "thumbnail", "updated"}，读取前为 None
+        self.icons = {}         # 编号 -> 解码好的 QIcon
+        self.thumbnails = {}    # 编号 -> 解码好的缩略图 QImage
+        self.decoded = set()    # 磁盘上的图片已经解码过的编号
+        self.pending = set()    # 等待索引读取或图片解码的编号
+        self.loading = False
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(METADATA_SAVE_DELAY_MS)
+        self.save_timer.timeout.connect(self.save_index)
+
+    def lookup(self, widget):
+        """返回 (条目, 图标, 缩略图)，还没有读取或解码的返回 None 或空的图片，准备好后发出 loaded"""
+        widget_id = widget["id"]
+        if self.entries is None:
+            self.pending.add(widget_id)
+            if not self.loading:
+                self.loading = True
+                self.tasks.start(self.load_index(), name="读取小部件图标缓存")
+            return None
+        entry = self.entries.get(widget_id)
+        if entry is None:
+            return None
+        if entry.get("url") != widget.get("url"):
+            self.invalidate(widget_id)
+            return None
+        if widget_id not in self.decoded and widget_id not in self.pending and (entry.get("icon") or entry.get("thumbnail")):
+            self.pending.add(widget_id)
+            self.tasks.start(self.decode_images(widget_id, entry), name="解码小部件图标")
+        return entry, self.icons.get(widget_id), self.thumbnails.get(widget_id)
+
+    async def load_index(self):
+        entries = await self.tasks.run_blocking(read_metadata_index, self.directory)
+        # 读取期间新记录的条目比磁盘上的新
+        entries.update(self.entries or {})
+        self.entries = entries
+        self.loading = False
+        pending, self.pending = self.pending, set()
+        for widget_id in pending:
+            self.loaded.emit(widget_id)
+
+    async def decode_images(self, widget_id, entry):
+        icon, thumbnail = await self.tasks.run_blocking(
+            read_metadata_images, self.directory, [entry.get("icon"), entry.get("thumbnail")])
+        self.pending.discard(widget_id)
+        # 解码期间条目可能已经作废；期间新截到的图片比磁盘上的新，不覆盖
+        if widget_id not in (self.entries or {}):
+            return
+        self.decoded.add(widget_id)
+        if icon is not None:
+            self.icons.setdefault(widget_id, QIcon(QPixmap.fromImage(icon)))
+        if thumbnail is not None:
+            self.thumbnails.setdefault(widget_id, thumbnail)
+        self.loaded.emit(widget_id)
+
+    def store(self, widget_id, url, title, icon_image=None, thumbnail_image=None):
+        """记录一次加载结果；没有截到缩略图时保留上一次的"""
+        if self.entries is None:
+            self.entries = {}
+        previous = self.entries.get(widget_id)
+        entry = dict(previous) if previous and previous.get("url") == url else {}
+        entry.update({"url": url, "title": title, "updated": time.strftime("%Y-%m-%d %H:%M:%S")})
+        files = {}
+        if icon_image is not None and not icon_image.isNull():
+            entry["icon"] = f"{widget_id}_icon.png"
+            files[entry["icon"]] = icon_image
+            self.icons[widget_id] = QIcon(QPixmap.fromImage(icon_image))
+        if thumbnail_image is not None and not thumbnail_image.isNull():
+            entry["thumbnail"] = f"{widget_id}_thumb.jpg"
+            files[entry["thumbnail"]] = thumbnail_image
+            self.thumbnails[widget_id] = thumbnail_image
+        self.entries[widget_id] = entry
+        if files:
+            self.tasks.start(self.in_pool(write_metadata_files, self.directory, files), name="保存小部件缩略图")
+        self.save_timer.start()
+        self.loaded.emit(widget_id)
+
+    def invalidate(self, widget_id):
+        self.icons.pop(widget_id, None)
+        self.thumbnails.pop(widget_id, None)
+        self.decoded.discard(widget_id)
+        entry = (self.entries or {}).pop(widget_id, None)
+        if entry is None:
+            return
+        names = [entry[key] for key in ("icon", "thumbnail") if entry.get(key)]
+        if names:
+            self.tasks.start(self.in_pool(remove_metadata_files, self.directory, names), name="清理小部件缩略图")
+        self.save_timer.start()
+        self.loaded.emit(widget_id)
+
+    def save_index(self):
+        if self.entries is None:
+            return
+        data = json.dumps(self.entries, ensure_ascii=False, indent=2).encode("utf-8")
+        self.tasks.start(self.in_pool(write_metadata_files, self.directory, {METADATA_INDEX_FILE: data}), name="保存小部件图标缓存")
+
+    async def in_pool(self, func, *args):
+        await self.tasks.run_blocking(func, *args)
+
+class OverlayHost(QWidget):
+    """单一叠加窗口：一个屏幕上的所有小部件都作为子控件放在这个全屏透明窗口里
+
+    窗口遮罩只覆盖小部件所在区域，其余地方的鼠标事件会穿透到下面的窗口。
+    """
+
+    def __init__(self, screen):
+        super().__init__()
+        self.screen_name = screen.name()
+        self.pinned = None
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.setStyleSheet(f"background-color: {bg_color}; border-radius: 10px;")
-        self.setWindowOpacity(opacity)
-        
-        # 启用透明背景
-        self.page().setBackgroundColor(QColor(bg_color))
-        self.settings().setAttribute(QWebEngineSettings.LocalContentCanAccessRemoteUrls, True)
-        
-        # 保存置顶状态
-        self.always_on_top = always_on_top
-        
-        # 设置窗口标志
-        self.update_flags()
-        
-        # 设置位置和大小
-        self.setGeometry(x, y, width, height)
-        
-        # 拖动变量
-        self.dragging = False
-        self.offset = QPoint()
-        
-    def update_flags(self):
-        """更新窗口标志，特别是置顶状态"""
+        self.setGeometry(screen.geometry())
+        # 小部件移动或缩放时合并成一次遮罩更新
+        self.mask_timer = QTimer(self)
+        self.mask_timer.setSingleShot(True)
+        self.mask_timer.setInterval(0)
+        self.mask_timer.timeout.connect(self.update_mask)
+        self.update_pin()
+
+    def hosted(self):
+        return [child for child in self.children() if isinstance(child, WidgetWindowMixin)]
+
+    def host(self, view):
+        view.installEventFilter(self)
+        self.schedule_mask()
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.Move, QEvent.Resize, QEvent.Show, QEvent.Hide):
+            self.schedule_mask()
+        return False
+
+    def schedule_mask(self):
+        if not self.mask_timer.isActive():
+            self.mask_timer.start()
+
+    def update_mask(self):
+        region = QRegion()
+        for child in self.hosted():
+            if child.isVisibleTo(self):
+                region = region.united(QRegion(child.geometry()))
+        if region.isEmpty():
+            # 空遮罩等于没有遮罩，会挡住整个屏幕，直接隐藏
+            self.hide()
+            return
+        self.setMask(region)
+        if not self.isVisible():
+            self.show()
+
+    def update_pin(self):
+        """任意一个托管的小部件置顶，叠加窗口就置顶"""
+        pinned = any(getattr(child, "always_on_top", False) for child in self.hosted())
+        if pinned == self.pinned:
+            return
+        self.pinned = pinned
+        visible = self.isVisible()
         flags = Qt.FramelessWindowHint | Qt.Tool
-        if self.always_on_top:
+        if pinned:
             flags |= Qt.WindowStaysOnTopHint
         self.setWindowFlags(flags)
-        # 需要重新显示窗口以应用新标志
-        self.show()
-    
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self.dragging = True
-            self.offset = event.globalPos() - self.pos()
-        super().mousePressEvent(event)
-    
-    def mouseMoveEvent(self, event):
-        if self.dragging:
-            self.move(event.globalPos() - self.offset)
-        super().mouseMoveEvent(event)
-    
-    def mouseReleaseEvent(self, event):
-        self.dragging = False
-        super().mouseReleaseEvent(event)
-    
-    def contextMenuEvent(self, event):
-        # 创建自定义右键菜单
-        menu = QMenu(self)
-        
-        # 置顶切换菜单项
-        pin_action = menu.addAction("置顶" if not self.always_on_top else "取消置顶")
-        pin_action.triggered.connect(self.toggle_pin)
-        
-        # 关闭菜单项
-        close_action = menu.addAction("关闭")
-        close_action.triggered.connect(self.close)
-        
-        menu.exec_(event.globalPos())
-    
-    def toggle_pin(self):
-        self.always_on_top = not self.always_on_top
-        self.update_flags()
+        if visible:
+            self.show()
 
 class SettingsWindow(QMainWindow):
     def __init__(self):
@@ -94,9 +3847,6 @@ class SettingsWindow(QMainWindow):
         self.setWindowTitle("透明网页小部件-设置界面")
         self.setGeometry(100, 100, 800, 600)
         self.setMinimumSize(700, 500)
-        self.active_web_views = []
-        self.setup_ui()
-        self.load_config()
         self.setStyleSheet("""
     QMainWindow {
         background-color: #2d3e50;
@@ -171,11 +3921,52 @@ class SettingsWindow(QMainWindow):
 """)
         
         self.web_widgets = []
+        self.app_settings = {}  # 全局设置，保存在配置文件的 settings 字段
+        self.data_bus = None
+        self.watchdog = None
+        self.devtools = None
+        self.profile_manager = ProfileManager(self)
+        self.snippets = SnippetRegistry()
+        self.opened_items = {}          # 小部件 -> (已打开列表项, 名称)
+        self.overlays = {}              # 屏幕名称 -> 叠加窗口
+        self.reload_coordinator = None
+        self.tasks = AsyncTaskManager(self)
+        self.session_detector = None
+        self.scheduler = WidgetScheduler(self)
+        self.scheduler.state_changed.connect(self.apply_schedule_state)
+        self.warmer = ConnectionWarmer(parent=self)
+        self.animator = WidgetAnimator(parent=self)
+        self.widgets_hidden = False
+        self.metadata = WidgetMetadataCache(self.tasks, parent=self)
+        self.metadata.loaded.connect(self.update_widget_item)
+        self.parked_views = set()       # 没有屏幕可放而暂停的小部件
+        self.relayout_timer = QTimer(self)
+        self.relayout_timer.setSingleShot(True)
+        self.relayout_timer.setInterval(SCREEN_RELAYOUT_DELAY_MS)
+        self.relayout_timer.timeout.connect(self.relayout_widgets)
+        QApplication.instance().screenAdded.connect(self.watch_screen)
+        QApplication.instance().screenRemoved.connect(self.relayout_timer.start)
+        for screen in QApplication.screens():
+            self.watch_screen(screen)
+        self.host_supervisor = HostSupervisor(self)
+        self.host_supervisor.notify.connect(self.show_notification)
+        self.host_supervisor.jank.connect(self.on_widget_jank)
+        self.host_supervisor.resized.connect(lambda widget_id, rect: self.persist_widget_geometry(widget_id, *rect))
+        self.download_profiles = set()  # 已经监听下载的存储分区
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.setInterval(2000)
+        self.metrics_timer.timeout.connect(self.update_opened_metrics)
+        self.profile_manager.usage_ready.connect(self.show_profile_usage)
         self.tray_icon = None
         self.active_web_views = []  # 存储活动的网页视图
         self.global_pinned = True  # 添加全局置顶状态
         self.setup_ui()
         self.load_config()
+        # 配置加载后就开始预热，用户点击启动时握手多半已经完成
+        self.warm_connections()
+        self.config_watcher = ConfigWatcher(CONFIG_FILE, self)
+        self.config_watcher.config_changed.connect(self.apply_config_change)
+        self.config_watcher.config_rejected.connect(self.reject_config_change)
 
         
     def close_selected_widget(self):
@@ -185,16 +3976,33 @@ class SettingsWindow(QMainWindow):
             return
         
         for item in selected_items:
-            index = item.data(Qt.UserRole)
-            if 0 <= index < len(self.active_web_views) and self.active_web_views[index]:
-                self.active_web_views[index].close()
-                self.active_web_views[index] = None
-                
-                # 从列表移除
-                self.opened_widgets_list.takeItem(self.opened_widgets_list.row(item))
-        
-        # 清理无效引用
-        self.active_web_views = [v for v in self.active_web_views if v is not None]
+            view = self.item_view(item)
+            if view in self.active_web_views:
+                self.close_widget_view(view)
+
+    def close_widget_view(self, view):
+        """关闭一个正在运行的小部件并从已打开列表移除"""
+        if self.reload_coordinator:
+            self.reload_coordinator.untrack(view)
+        release_view(view)
+        self.active_web_views.remove(view)
+        item, _ = self.opened_items.pop(view)
+        self.parked_views.discard(view)
+        self.opened_widgets_list.takeItem(self.opened_widgets_list.row(item))
+
+    def item_view(self, item):
+        """已打开列表项对应的小部件"""
+        for view, (opened_item, _) in self.opened_items.items():
+            if opened_item is item:
+                return view
+        return None
+
+    def view_for(self, widget_id):
+        """按小部件编号找到正在运行的小部件"""
+        for view, (item, _) in self.opened_items.items():
+            if item.data(Qt.UserRole) == widget_id:
+                return view
+        return None
 
     def setup_ui(self):
         central_widget = QWidget()
@@ -227,8 +4035,13 @@ class SettingsWindow(QMainWindow):
         self.remove_btn.setObjectName("removeBtn")
         self.remove_btn.clicked.connect(self.remove_widget)
 
+        self.layout_btn = QPushButton("自动排列")
+        self.layout_btn.setToolTip("把选中的小部件排进一个屏幕，结果写回配置并立即应用")
+        self.layout_btn.clicked.connect(self.show_layout_dialog)
+
         btn_layout.addWidget(self.add_btn)
         btn_layout.addWidget(self.remove_btn)
+        btn_layout.addWidget(self.layout_btn)
         left_layout.addLayout(btn_layout)
 
         # 右侧面板 - 使用滚动区域
@@ -252,6 +4065,42 @@ class SettingsWindow(QMainWindow):
         url_layout.addWidget(self.url_edit)
         settings_layout.addLayout(url_layout)
 
+        # 最近一次的画面，图片在后台线程解码好之后才显示
+        self.thumbnail_label = QLabel()
+        self.thumbnail_label.setFixedSize(*METADATA_THUMBNAIL_SIZE)
+        self.thumbnail_label.setAlignment(Qt.AlignCenter)
+        self.thumbnail_label.hide()
+        settings_layout.addWidget(self.thumbnail_label)
+
+        # 小部件类型（网页或原生小部件）
+        type_layout = QHBoxLayout()
+        type_layout.addWidget(QLabel("类型:"))
+        self.type_combo = QComboBox()
+        self.type_combo.addItems(available_widget_types())
+        self.type_combo.setToolTip("clock/cpu/note 等原生小部件不需要浏览器进程，网址对它们无效")
+        type_layout.addWidget(self.type_combo, 1)
+        type_layout.addWidget(QLabel("便签内容:"))
+        self.note_text_edit = QLineEdit()
+        self.note_text_edit.setPlaceholderText("note 类型显示的文字")
+        type_layout.addWidget(self.note_text_edit, 2)
+        settings_layout.addLayout(type_layout)
+
+        # 存储分区设置
+        profile_layout = QHBoxLayout()
+        profile_layout.addWidget(QLabel("存储分区:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.setEditable(True)
+        self.profile_combo.addItem(DEFAULT_PROFILE_LABEL)
+        self.profile_combo.setToolTip("同名分区的小部件共享登录状态和缓存，输入新名称即可创建分区，重新启动网页后生效")
+        profile_layout.addWidget(self.profile_combo, 1)
+        profile_layout.addWidget(QLabel("宿主进程:"))
+        self.host_group_edit = QLineEdit()
+        self.host_group_edit.setPlaceholderText("留空在主进程运行")
+        self.host_group_edit.setToolTip("同名分组的网页小部件在同一个独立进程中运行，卡死时只重启这一组；"
+                                        "命名存储分区不能同时被多个进程使用，共用分区的小部件请放在同一分组")
+        profile_layout.addWidget(self.host_group_edit, 1)
+        settings_layout.addLayout(profile_layout)
+
         # 透明度设置
         opacity_layout = QHBoxLayout()
         opacity_layout.addWidget(QLabel("透明度:"))
@@ -285,13 +4134,13 @@ class SettingsWindow(QMainWindow):
         # 位置设置
         grid_layout.addWidget(QLabel("位置 X:"), 0, 0)
         self.x_edit = QLineEdit("100")
-        self.x_edit.setValidator(QIntValidator(0, 5000))
+        self.x_edit.setValidator(QIntValidator(-32768, 32767))  # 主屏幕左边或上边的显示器坐标是负数
         self.x_edit.setFixedWidth(80)
         grid_layout.addWidget(self.x_edit, 0, 1)
 
         grid_layout.addWidget(QLabel("Y:"), 0, 2)
         self.y_edit = QLineEdit("100")
-        self.y_edit.setValidator(QIntValidator(0, 5000))
+        self.y_edit.setValidator(QIntValidator(-32768, 32767))
         self.y_edit.setFixedWidth(80)
         grid_layout.addWidget(self.y_edit, 0, 3)
 
@@ -308,6 +4157,59 @@ class SettingsWindow(QMainWindow):
         self.height_edit.setFixedWidth(80)
         grid_layout.addWidget(self.height_edit, 1, 3)
 
+        # 刷新和流量限额（0 表示关闭）
+        grid_layout.addWidget(QLabel("自动刷新(秒):"), 2, 0)
+        self.refresh_edit = QLineEdit("0")
+        self.refresh_edit.setValidator(QIntValidator(0, 86400))
+        self.refresh_edit.setFixedWidth(80)
+        grid_layout.addWidget(self.refresh_edit, 2, 1)
+
+        grid_layout.addWidget(QLabel("页面缩放:"), 2, 2)
+        self.zoom_combo = QComboBox()
+        self.zoom_combo.setEditable(True)
+        self.zoom_combo.addItems(ZOOM_CHOICES)
+        self.zoom_combo.setFixedWidth(80)
+        self.zoom_combo.setToolTip("缩小后页面按更宽的布局排版，适合把大页面放进小窗口；"
+                                   "自适应按页面内容宽度自动计算，修改后不会重新加载页面")
+        grid_layout.addWidget(self.zoom_combo, 2, 3)
+
+        grid_layout.addWidget(QLabel("流量上限(kbps):"), 3, 0)
+        self.bandwidth_edit = QLineEdit("0")
+        self.bandwidth_edit.setValidator(QIntValidator(0, 1000000))
+        self.bandwidth_edit.setFixedWidth(80)
+        self.bandwidth_edit.setToolTip("启用调试端口时在网络层统计并执行限制（暂停媒体和定时刷新）；"
+                                       "否则只能在页面内估算，跨域资源、流媒体和上传统计不到，"
+                                       "估算值只是下限，超出时只提示不限制")
+        grid_layout.addWidget(self.bandwidth_edit, 3, 1)
+
+        grid_layout.addWidget(QLabel("请求上限(次/分):"), 3, 2)
+        self.request_limit_edit = QLineEdit("0")
+        self.request_limit_edit.setValidator(QIntValidator(0, 100000))
+        self.request_limit_edit.setFixedWidth(80)
+        grid_layout.addWidget(self.request_limit_edit, 3, 3)
+
+        grid_layout.addWidget(QLabel("显示时段:"), 4, 0)
+        self.schedule_edit = QLineEdit()
+        self.schedule_edit.setPlaceholderText("留空一直显示，例如 1-5 09:00-18:00; 22:00-02:00")
+        self.schedule_edit.setToolTip("分号分隔多个时段，开头的 1-7 表示周一到周日，省略表示每天；"
+                                      "不在时段内的小部件会完全卸载，开始前几分钟提前加载")
+        grid_layout.addWidget(self.schedule_edit, 4, 1, 1, 3)
+
+        grid_layout.addWidget(QLabel("卡顿处理:"), 5, 0)
+        self.jank_action_combo = QComboBox()
+        for action, label in JANK_ACTIONS.items():
+            self.jank_action_combo.addItem(label, action)
+        self.jank_action_combo.setToolTip("页面脚本长时间占用时的处理方式；省电模式会暂停刷新、静音并停止页面动画，"
+                                          f"冻结 {JANK_FREEZE_SECONDS // 60} 分钟后自动恢复")
+        grid_layout.addWidget(self.jank_action_combo, 5, 1)
+
+        grid_layout.addWidget(QLabel("长任务(ms/分):"), 5, 2)
+        self.jank_threshold_edit = QLineEdit(str(JANK_DEFAULT_LONG_TASK_MS))
+        self.jank_threshold_edit.setValidator(QIntValidator(0, 60000))
+        self.jank_threshold_edit.setFixedWidth(80)
+        self.jank_threshold_edit.setToolTip("最近一分钟内超过 50ms 的脚本任务累计时间超过这个值时处理，0 表示不检查")
+        grid_layout.addWidget(self.jank_threshold_edit, 5, 3)
+
         settings_layout.addLayout(grid_layout)
 
         # 置顶设置
@@ -315,12 +4217,90 @@ class SettingsWindow(QMainWindow):
         self.always_on_top.setChecked(True)
         settings_layout.addWidget(self.always_on_top)
 
+        # 数据总线（本地页面通过 QWebChannel 订阅推送的数据）
+        self.data_bus_check = QCheckBox("启用数据总线")
+        self.data_bus_check.setToolTip("本地页面可通过 pyglass.subscribe(topic, callback) 接收推送的数据")
+        settings_layout.addWidget(self.data_bus_check)
+
+        # 用户片段（精简第三方页面）
+        snippets_layout = QGridLayout()
+        snippets_layout.addWidget(QLabel("共享片段:"), 0, 0)
+        self.snippet_names_edit = QLineEdit()
+        self.snippet_names_edit.setPlaceholderText("settings.snippets 中的名称，用逗号分隔")
+        snippets_layout.addWidget(self.snippet_names_edit, 0, 1)
+        snippets_layout.addWidget(QLabel("自定义 CSS:"), 1, 0)
+        self.user_css_edit = QPlainTextEdit()
+        self.user_css_edit.setPlaceholderText(".banner, video { display: none !important; }")
+        self.user_css_edit.setFixedHeight(70)
+        snippets_layout.addWidget(self.user_css_edit, 1, 1)
+        snippets_layout.addWidget(QLabel("自定义 JS:"), 2, 0)
+        self.user_js_edit = QPlainTextEdit()
+        self.user_js_edit.setPlaceholderText("document.querySelectorAll('video').forEach(v => v.autoplay = false);")
+        self.user_js_edit.setFixedHeight(70)
+        snippets_layout.addWidget(self.user_js_edit, 2, 1)
+        settings_layout.addLayout(snippets_layout)
+
         # 全局置顶
         self.global_always_on_top = QCheckBox("所有网页置顶")
         self.global_always_on_top.setChecked(True)
         self.global_always_on_top.stateChanged.connect(self.toggle_all_pin)
         settings_layout.addWidget(self.global_always_on_top)
 
+        # 相同网址的小部件共用一个渲染进程
+        self.share_renderer_check = QCheckBox("相同网址共用渲染")
+        self.share_renderer_check.setToolTip("网址相同的小部件只渲染一次，其余窗口显示镜像画面，下次启动网页时生效")
+        self.share_renderer_check.stateChanged.connect(
+            lambda state: self.app_settings.__setitem__("share_renderer", state == Qt.Checked))
+        settings_layout.addWidget(self.share_renderer_check)
+
+        # 单一叠加窗口模式
+        self.overlay_mode_check = QCheckBox("单一叠加窗口模式")
+        self.overlay_mode_check.setToolTip("每个屏幕只创建一个全屏透明窗口承载所有小部件，小部件很多时减轻窗口管理器负担，下次启动网页时生效")
+        self.overlay_mode_check.stateChanged.connect(
+            lambda state: self.app_settings.__setitem__("overlay_mode", state == Qt.Checked))
+        settings_layout.addWidget(self.overlay_mode_check)
+
+        # 事件循环卡顿检测
+        self.watchdog_check = QCheckBox("卡顿检测")
+        self.watchdog_check.setToolTip(f"界面卡顿超过阈值时记录主线程调用栈到 {STALL_LOG_FILE}")
+        self.watchdog_check.stateChanged.connect(self.toggle_watchdog)
+        settings_layout.addWidget(self.watchdog_check)
+
+        # 连接预热
+        self.warmup_check = QCheckBox("启动前预热连接")
+        self.warmup_check.setToolTip("读取配置和启动网页时先对所有网址完成 DNS 和 TLS 握手，缩短首次显示时间")
+        self.warmup_check.stateChanged.connect(
+            lambda state: self.app_settings.__setitem__("warmup_connections", state == Qt.Checked))
+        settings_layout.addWidget(self.warmup_check)
+
+        # 锁屏和空闲时暂停
+        self.pause_when_away_check = QCheckBox("锁屏或空闲时暂停")
+        self.pause_when_away_check.setToolTip("锁屏、屏保或长时间无操作时隐藏并冻结所有小部件，回来后自动恢复")
+        self.pause_when_away_check.stateChanged.connect(self.toggle_pause_when_away)
+        settings_layout.addWidget(self.pause_when_away_check)
+
+        # 远程调试端口
+        devtools_layout = QHBoxLayout()
+        devtools_layout.addWidget(QLabel("调试端口:"))
+        self.devtools_port_edit = QLineEdit()
+        self.devtools_port_edit.setValidator(QIntValidator(0, 65535))
+        self.devtools_port_edit.setFixedWidth(80)
+        self.devtools_port_edit.setPlaceholderText("关闭")
+        self.devtools_port_edit.setToolTip("启用后可在小部件右键菜单中进行性能采集，重启应用后生效")
+        self.devtools_port_edit.editingFinished.connect(
+            lambda: self.app_settings.__setitem__("devtools_port", int(self.devtools_port_edit.text() or 0)))
+        devtools_layout.addWidget(self.devtools_port_edit)
+        # 设备像素比对整个渲染进程生效，只能作为全局设置
+        devtools_layout.addWidget(QLabel("渲染分辨率:"))
+        self.render_scale_combo = QComboBox()
+        self.render_scale_combo.addItems(RENDER_SCALE_CHOICES)
+        self.render_scale_combo.setToolTip("降低网页的设备像素比，栅格化和合成的开销随之减少，画面会变模糊，重启应用后生效")
+        self.render_scale_combo.activated[str].connect(
+            lambda text: self.app_settings.__setitem__("render_scale", int(text.rstrip("%")) / 100))
+        devtools_layout.addWidget(self.render_scale_combo)
+        devtools_layout.addStretch()
+        settings_layout.addLayout(devtools_layout)
+
         # 应用设置按钮
         self.apply_btn = QPushButton("应用设置")
         self.apply_btn.setIcon(self.style().standardIcon(QStyle.SP_DialogApplyButton))
@@ -331,6 +4311,17 @@ class SettingsWindow(QMainWindow):
         # 添加到滚动区域
         self.scroll_layout.addWidget(settings_group)
 
+        # 存储分区占用
+        profiles_group = QGroupBox("存储分区")
+        profiles_layout = QVBoxLayout(profiles_group)
+        self.profile_usage_list = QListWidget()
+        self.profile_usage_list.setMaximumHeight(120)
+        profiles_layout.addWidget(self.profile_usage_list)
+        refresh_usage_btn = QPushButton("刷新占用")
+        refresh_usage_btn.clicked.connect(self.refresh_profile_usage)
+        profiles_layout.addWidget(refresh_usage_btn)
+        self.scroll_layout.addWidget(profiles_group)
+
         # 已打开小部件列表
         opened_group = QGroupBox("已打开的小部件")
         opened_layout = QVBoxLayout(opened_group)
@@ -425,6 +4416,7 @@ class SettingsWindow(QMainWindow):
         # 设置窗口最小尺寸
         self.setMinimumSize(800, 600)
 
+    @traced("toggle_all_pin")
     def toggle_all_pin(self, state):
         """切换所有网页小部件的置顶状态"""
         self.global_pinned = (state == Qt.Checked)
@@ -443,13 +4435,16 @@ class SettingsWindow(QMainWindow):
 
     def add_widget(self):
         count = self.widget_list.count()
+        widget_id = new_widget_id()
         item = QListWidgetItem(f"网页小部件 {count+1}")
         item.setFlags(item.flags() | Qt.ItemIsEditable)  # 设置可编辑
+        item.setData(Qt.UserRole, widget_id)
         self.widget_list.addItem(item)
         self.widget_list.setCurrentItem(item)
         
         # 添加到配置列表
         self.web_widgets.append({
+            "id": widget_id,
             "name": f"网页小部件 {count+1}",  # 添加名称字段
             "url": "https://www.example.com",
             "opacity": 0.8,
@@ -476,12 +4471,14 @@ class SettingsWindow(QMainWindow):
         row = self.widget_list.currentRow()
         if row >= 0:
             self.widget_list.takeItem(row)
-            self.web_widgets.pop(row)
+            self.metadata.invalidate(self.web_widgets.pop(row)["id"])
         
     def show_widget_settings(self, index):
         if index >= 0 and index < len(self.web_widgets):
             widget = self.web_widgets[index]
             self.url_edit.setText(widget["url"])
+            self.type_combo.setCurrentText(widget.get("type", WEB_WIDGET_TYPE))
+            self.note_text_edit.setText(widget.get("text", ""))
             self.opacity_slider.setValue(int(widget["opacity"] * 100))
             self.bg_color_preview.setStyleSheet(f"background-color: {widget['bg_color']};")
             self.x_edit.setText(str(widget["x"]))
@@ -489,6 +4486,21 @@ class SettingsWindow(QMainWindow):
             self.width_edit.setText(str(widget["width"]))
             self.height_edit.setText(str(widget["height"]))
             self.always_on_top.setChecked(widget["always_on_top"])
+            self.refresh_edit.setText(str(widget.get("refresh_interval", 0)))
+            self.schedule_edit.setText(format_schedule(widget.get("schedule", [])))
+            self.zoom_combo.setCurrentText(format_zoom(widget.get("zoom", 1.0)))
+            self.show_widget_thumbnail(widget)
+            jank_policy = widget.get("jank_policy", {})
+            self.jank_action_combo.setCurrentIndex(self.jank_action_combo.findData(jank_policy.get("action", "none")))
+            self.jank_threshold_edit.setText(str(jank_policy.get("long_task_ms", JANK_DEFAULT_LONG_TASK_MS)))
+            self.bandwidth_edit.setText(str(widget.get("bandwidth_limit_kbps", 0)))
+            self.request_limit_edit.setText(str(widget.get("request_rate_limit", 0)))
+            self.data_bus_check.setChecked(widget.get("data_bus", False))
+            self.profile_combo.setCurrentText(widget.get("profile") or DEFAULT_PROFILE_LABEL)
+            self.host_group_edit.setText(widget.get("host_group", ""))
+            self.snippet_names_edit.setText(", ".join(widget.get("snippets", [])))
+            self.user_css_edit.setPlainText(widget.get("user_css", ""))
+            self.user_js_edit.setPlainText(widget.get("user_js", ""))
         
     def apply_settings(self):
         index = self.widget_list.currentRow()
@@ -503,8 +4515,12 @@ class SettingsWindow(QMainWindow):
                 if width < 100 or height < 100:
                     raise ValueError("窗口大小不能小于100x100")
                     
-                self.web_widgets[index] = {
-                    "name": self.web_widgets[index]["name"],  # 保留名称
+                # 在原配置上更新，保留名称和界面上没有的字段
+                previous = self.web_widgets[index]
+                widget = dict(previous)
+                widget.update({
+                    "type": self.type_combo.currentText() or WEB_WIDGET_TYPE,
+                    "text": self.note_text_edit.text(),
                     "url": self.url_edit.text(),
                     "opacity": self.opacity_slider.value() / 100,
                     "bg_color": self.bg_color_preview.styleSheet().split(":")[1].split(";")[0].strip(),
@@ -512,11 +4528,51 @@ class SettingsWindow(QMainWindow):
                     "y": y,
                     "width": width,
                     "height": height,
-                    "always_on_top": self.always_on_top.isChecked()
-                }
-                if index < len(self.active_web_views) and self.active_web_views[index]:
-                    self.active_web_views[index].always_on_top = self.always_on_top.isChecked()
-                    self.active_web_views[index].update_flags()
+                    "always_on_top": self.always_on_top.isChecked(),
+                    "refresh_interval": int(self.refresh_edit.text() or 0),
+                    "bandwidth_limit_kbps": int(self.bandwidth_edit.text() or 0),
+                    "request_rate_limit": int(self.request_limit_edit.text() or 0),
+                    "data_bus": self.data_bus_check.isChecked(),
+                    "snippets": [n.strip() for n in self.snippet_names_edit.text().split(",") if n.strip()],
+                    "user_css": self.user_css_edit.toPlainText(),
+                    "user_js": self.user_js_edit.toPlainText()
+                })
+                profile_name = self.profile_combo.currentText().strip()
+                if profile_name and profile_name != DEFAULT_PROFILE_LABEL:
+                    widget["profile"] = profile_name
+                    self.app_settings.setdefault("profiles", {}).setdefault(profile_name, {})
+                else:
+                    widget.pop("profile", None)
+                anchor_to_screen(widget)
+                schedule = parse_schedule(self.schedule_edit.text())
+                if schedule:
+                    widget["schedule"] = schedule
+                else:
+                    widget.pop("schedule", None)
+                jank_action = self.jank_action_combo.currentData()
+                if jank_action == "none":
+                    widget.pop("jank_policy", None)
+                else:
+                    # 保留配置文件里手动设置的布局偏移阈值
+                    widget["jank_policy"] = dict(widget.get("jank_policy", {}), action=jank_action,
+                                                 long_task_ms=int(self.jank_threshold_edit.text() or 0))
+                zoom = parse_zoom(self.zoom_combo.currentText())
+                if zoom == 1.0:
+                    widget.pop("zoom", None)
+                else:
+                    widget["zoom"] = zoom
+                host_group = self.host_group_edit.text().strip()
+                if host_group:
+                    widget["host_group"] = host_group
+                else:
+                    widget.pop("host_group", None)
+                self.web_widgets[index] = widget
+                self.update_profile_choices()
+                view = self.view_for(widget["id"])
+                if view:
+                    self.update_widget_view(view, widget, previous)
+                if self.opened_items and widget.get("schedule") != previous.get("schedule"):
+                    self.update_schedule()
             
                 self.show_notification("设置已保存", f"网页小部件 {index+1} 设置已更新")
             except Exception as e:
@@ -525,50 +4581,600 @@ class SettingsWindow(QMainWindow):
             except Exception as e:
                 QMessageBox.warning(self, "输入错误", f"无效的输入值: {str(e)}")
         
+    def update_widget_view(self, view, widget, previous):
+        """把配置变化直接应用到正在运行的小部件，不需要重新启动"""
+        view.always_on_top = widget["always_on_top"]
+        # 合成路径变化时会顺带刷新窗口标志
+        if not view.apply_appearance(widget["opacity"], widget["bg_color"]):
+            view.update_flags()
+        if isinstance(view, (NativeWidget, HostedWidget)):
+            view.apply_config(widget)
+        if isinstance(view, DraggableWebView):
+            if widget["url"] != previous.get("url"):
+                view.setUrl(QUrl(widget["url"]))
+                self.metadata.invalidate(widget["id"])
+            # 片段直接更新到正在运行的页面
+            view.apply_snippets(self.widget_scripts(widget))
+            view.set_refresh_interval(widget.get("refresh_interval", 0))
+            view.set_limits(widget.get("bandwidth_limit_kbps", 0), widget.get("request_rate_limit", 0))
+            if widget.get("zoom", 1.0) != previous.get("zoom", 1.0):
+                view.set_zoom(widget.get("zoom", 1.0))
+            view.set_jank_policy(widget.get("jank_policy"))
+        geometry = [widget[key] for key in ("x", "y", "width", "height")]
+        if not isinstance(view, HostedWidget) and geometry != [previous.get(key) for key in ("x", "y", "width", "height")]:
+            self.set_view_geometry(view, widget)
+
+    def set_view_geometry(self, view, widget):
+        """按配置里的绝对坐标设置小部件的位置和大小，叠加窗口模式下换到目标屏幕的叠加窗口"""
+        if isinstance(view, HostedWidget):
+            view.apply_config(widget)
+            return
+        if view.overlay:
+            overlay = self.overlay_for(widget)
+            if overlay is not view.overlay:
+                previous = view.overlay
+                view.removeEventFilter(previous)
+                view.setParent(overlay)
+                view.overlay = overlay
+                overlay.host(view)
+                previous.schedule_mask()
+                if not view.suspend_reasons:
+                    view.show()
+        offset = view.overlay.pos() if view.overlay else QPoint()
+        view.setGeometry(widget["x"] - offset.x(), widget["y"] - offset.y(), widget["width"], widget["height"])
+
+    def show_layout_dialog(self):
+        dialog = LayoutDialog(self.web_widgets, self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        self.apply_auto_layout(dialog.selected_ids(), dialog.screen(), dialog.mode(), dialog.gap())
+
+    @traced("apply_auto_layout")
+    def apply_auto_layout(self, widget_ids, screen, mode="shelf", gap=10):
+        """排列结果写回配置，正在运行的小部件统一调整一次"""
+        widgets = [widget for widget in self.web_widgets if widget["id"] in widget_ids]
+        area = screen.availableGeometry()
+        placements = pack_widgets(widgets, (area.x(), area.y(), area.width(), area.height()), mode, gap)
+        moves = []
+        skipped = 0
+        for widget, placement in zip(widgets, placements):
+            if placement is None:
+                skipped += 1
+                continue
+            widget["x"], widget["y"], widget["width"], widget["height"] = placement
+            anchor_to_screen(widget)
+            view = self.view_for(widget["id"])
+            if view:
+                moves.append((view, widget))
+        for view, widget in moves:
+            self.set_view_geometry(view, widget)
+        self.save_config()
+        self.show_widget_settings(self.widget_list.currentRow())
+        message = f"已排列 {len(widgets) - skipped} 个小部件"
+        if skipped:
+            message += f"，{skipped} 个放不下，位置未改变"
+        self.show_notification("自动排列", message)
+
+    def widget_needs_recreate(self, view, widget, previous):
+        if any(widget.get(key) != previous.get(key) for key in WIDGET_RECREATE_KEYS):
+            return True
+        # 镜像窗口没有自己的页面，网址变了只能重新创建
+        return isinstance(view, MirrorWebView) and widget.get("url") != previous.get("url")
+
+    def apply_config_change(self, settings, widgets):
+        """外部修改的配置按小部件编号比较，只有变化的小部件会被更新、创建或关闭"""
+        old = {widget["id"]: widget for widget in self.web_widgets}
+        # 没有编号的小部件按名称沿用原来的编号，都找不到时当作新的小部件
+        names = {widget.get("name"): widget["id"] for widget in self.web_widgets}
+        used = {widget["id"] for widget in widgets if "id" in widget}
+        for widget in widgets:
+            widget.setdefault("name", "网页小部件")
+            if "id" not in widget:
+                widget_id = names.get(widget["name"])
+                if widget_id is None or widget_id in used:
+                    widget_id = new_widget_id()
+                widget["id"] = widget_id
+                used.add(widget_id)
+
+        for widget in widgets:
+            previous = old.get(widget["id"])
+            # 外部改了坐标却没改屏幕记录时，以新坐标为准
+            moved = previous and (widget["x"], widget["y"]) != (previous["x"], previous["y"])
+            if "screen" not in widget or (moved and widget.get("screen") == previous.get("screen")):
+                anchor_to_screen(widget)
+
+        running = bool(self.opened_items)
+        self.app_settings = settings
+        self.web_widgets = widgets
+        added = removed = changed = 0
+        for widget_id in old:
+            view = self.view_for(widget_id)
+            if widget_id not in used and view:
+                self.close_widget_view(view)
+                removed += 1
+        for widget in widgets:
+            previous = old.get(widget["id"])
+            if previous == widget:
+                continue
+            view = self.view_for(widget["id"])
+            if view is not None and previous is not None and not self.widget_needs_recreate(view, widget, previous):
+                self.update_widget_view(view, widget, previous)
+                item, _ = self.opened_items[view]
+                item.setText(widget["name"])
+                self.opened_items[view] = (item, widget["name"])
+                changed += 1
+                continue
+            if view is not None:
+                self.close_widget_view(view)
+            if view is None and not (running and previous is None):
+                continue  # 没有运行的小部件只更新配置
+            if self.scheduler.state_of(widget) != "off" and self.open_widget_view(widget):
+                if previous is None:
+                    added += 1
+                else:
+                    changed += 1
+        self.refresh_widget_list()
+        self.sync_global_settings_ui()
+        if running:
+            self.update_schedule()
+            self.show_notification("配置已更新", f"新增 {added} 个，修改 {changed} 个，关闭 {removed} 个小部件")
+
+    def reject_config_change(self, message):
+        """配置文件有错误时保持现有小部件不变"""
+        print(f"配置文件未生效: {message}")
+        self.show_notification("配置文件有误", f"修改未生效: {message}")
+
+    def widget_metadata(self, widget):
+        return self.metadata.lookup(widget) if widget.get("type", WEB_WIDGET_TYPE) == WEB_WIDGET_TYPE else None
+
+    def decorate_widget_item(self, item, widget):
+        """列表项显示网站图标，悬停时显示页面标题和网址"""
+        found = self.widget_metadata(widget)
+        if not found:
+            item.setIcon(QIcon())
+            item.setToolTip(widget.get("url", ""))
+            return
+        entry, icon, _ = found
+        item.setIcon(icon or QIcon())
+        item.setToolTip(f"<b>{html.escape(entry.get('title') or widget['name'])}</b><br>{html.escape(widget['url'])}")
+
+    def show_widget_thumbnail(self, widget):
+        found = self.widget_metadata(widget)
+        thumbnail = found[2] if found else None
+        if thumbnail is None:
+            self.thumbnail_label.hide()
+            return
+        self.thumbnail_label.setPixmap(QPixmap.fromImage(thumbnail))
+        self.thumbnail_label.show()
+
+    def update_widget_item(self, widget_id):
+        for row, widget in enumerate(self.web_widgets):
+            item = self.widget_list.item(row)
+            if widget["id"] == widget_id and item is not None and item.data(Qt.UserRole) == widget_id:
+                self.decorate_widget_item(item, widget)
+                if row == self.widget_list.currentRow():
+                    self.show_widget_thumbnail(widget)
+                return
+
+    def watch_metadata(self, view, widget_id):
+        """页面加载成功后稍等片刻记录图标、标题和缩略图；定时器挂在视图上，两个信号都连到方法而不是捕获视图的 lambda，
+        视图关闭后可以正常销毁"""
+        timer = QTimer(view)
+        timer.setObjectName(METADATA_TIMER_NAME)
+        timer.setProperty("widget_id", widget_id)
+        timer.setSingleShot(True)
+        timer.setInterval(METADATA_CAPTURE_DELAY_MS)
+        timer.timeout.connect(self.on_metadata_timer)
+        view.loadFinished.connect(self.on_metadata_load_finished)
+
+    def on_metadata_load_finished(self, ok):
+        timer = self.sender().findChild(QTimer, METADATA_TIMER_NAME)
+        if ok and timer:
+            timer.start()
+
+    def on_metadata_timer(self):
+        timer = self.sender()
+        self.capture_metadata(timer.parent(), timer.property("widget_id"))
+
+    def on_view_resized(self, view):
+        """拖动调整大小后按绝对坐标保存，叠加窗口里的小部件加上叠加窗口的位置"""
+        if view not in self.opened_items:
+            return
+        item, _ = self.opened_items[view]
+        offset = view.overlay.pos() if view.overlay else QPoint()
+        self.persist_widget_geometry(item.data(Qt.UserRole), view.x() + offset.x(), view.y() + offset.y(),
+                                     view.width(), view.height())
+
+    def persist_widget_geometry(self, widget_id, x, y, width, height):
+        widget = next((w for w in self.web_widgets if w["id"] == widget_id), None)
+        if widget is None:
+            return
+        widget.update({"x": x, "y": y, "width": width, "height": height})
+        anchor_to_screen(widget)
+        self.save_config()
+        # 正在编辑这个小部件时同步界面上的数值，其余未应用的修改保持不变
+        row = self.widget_list.currentRow()
+        if 0 <= row < len(self.web_widgets) and self.web_widgets[row]["id"] == widget_id:
+            for edit, value in ((self.x_edit, x), (self.y_edit, y), (self.width_edit, width), (self.height_edit, height)):
+                edit.setText(str(value))
+
+    def on_widget_jank(self, widget_id, action, stats):
+        widget = next((w for w in self.web_widgets if w["id"] == widget_id), None)
+        name = widget["name"] if widget else widget_id
+        message = f"{name} 最近一分钟脚本长任务 {stats.get('long_task_ms', 0)}ms，布局偏移 {stats.get('layout_shift', 0)}"
+        print(f"页面卡顿: {message}，处理: {JANK_ACTIONS.get(action, action)}")
+        if action != "none":
+            self.show_notification("页面卡顿", f"{message}，已{JANK_ACTIONS.get(action, action)}")
+
+    def capture_metadata(self, view, widget_id):
+        widget = next((w for w in self.web_widgets if w["id"] == widget_id), None)
+        if widget is None:
+            return
+        icon = view.icon()
+        icon_image = icon.pixmap(METADATA_ICON_SIZE).toImage() if not icon.isNull() else None
+        thumbnail_image = None
+        # 隐藏或冻结的页面截不到画面
+        if view.isVisible() and not view.suspend_reasons:
+            thumbnail_image = view.grab().scaled(
+                *METADATA_THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation).toImage()
+        self.metadata.store(widget_id, widget["url"], view.title(), icon_image, thumbnail_image)
+
+    def refresh_widget_list(self):
+        """按当前配置重建小部件列表，保留选中项"""
+        current = self.widget_list.currentRow()
+        current_id = self.widget_list.item(current).data(Qt.UserRole) if current >= 0 else None
+        self.widget_list.blockSignals(True)
+        self.widget_list.clear()
+        for widget in self.web_widgets:
+            item = QListWidgetItem(widget.get("name", "网页小部件"))
+            item.setFlags(item.flags() | Qt.ItemIsEditable)
+            item.setData(Qt.UserRole, widget["id"])
+            self.decorate_widget_item(item, widget)
+            self.widget_list.addItem(item)
+        ids = [widget["id"] for widget in self.web_widgets]
+        row = ids.index(current_id) if current_id in ids else min(current, len(ids) - 1)
+        self.widget_list.setCurrentRow(row)
+        self.widget_list.blockSignals(False)
+        self.show_widget_settings(row)
+
     def choose_bg_color(self):
         color = QColorDialog.getColor()
         if color.isValid():
-            # 使用RGBA格式保存颜色信息
-            rgba = f"rgba({color.red()}, {color.green()}, {color.blue()}, {color.alpha()})"
-            self.bg_color_preview.setStyleSheet(f"background-color: {rgba};")
+            # 使用 #AARRGGBB 保存颜色信息，透明度的范围不会有歧义
+            argb = color.name(QColor.HexArgb)
+            self.bg_color_preview.setStyleSheet(f"background-color: {argb};")
         
+    @traced("launch_widgets")
     def launch_widgets(self):
         try:
             self.save_config()
             self.close_all_widgets()  # 关闭之前的所有网页
+            self.setup_data_bus()
+            self.setup_devtools()
+            self.setup_reload_coordinator()
+            self.relayout_widgets()  # 按当前屏幕换算位置
+            self.warm_connections()  # 握手和渲染进程启动同时进行
+            share_renderer = self.app_settings.get("share_renderer", False)
+            primaries = {}  # 网址 -> 负责渲染的小部件
+
+            # 指定了宿主进程分组的网页小部件按组交给独立进程
+            host_groups = {}
+            for widget in self.web_widgets:
+                group = self.widget_host_group(widget)
+                if group and self.scheduler.state_of(widget) != "off":
+                    host_groups.setdefault(group, {})[widget["id"]] = dict(widget)
+            for group, widgets in host_groups.items():
+                self.host_supervisor.start_group(group, widgets, self.app_settings)
             
-            # 创建所有网页小部件
-            for i, widget in enumerate(self.web_widgets):
-                web_view = DraggableWebView(
-                    url=widget["url"],
-                    opacity=widget["opacity"],
-                    bg_color=widget["bg_color"],
-                    x=widget["x"],
-                    y=widget["y"],
-                    width=widget["width"],
-                    height=widget["height"],
-                    always_on_top=widget["always_on_top"]
-                )
-                web_view.show()
-                self.active_web_views.append(web_view)
-
-                # 添加到已打开列表
-                item = QListWidgetItem(widget["name"])
-                item.setData(Qt.UserRole, i)  # 存储索引
-                self.opened_widgets_list.addItem(item)
+            # 创建所有网页小部件，最后一起渐显
+            revealed = []
+            for widget in self.web_widgets:
+                state = self.scheduler.state_of(widget)
+                if state == "off":
+                    continue  # 不在显示时段内的小部件不创建，不占用渲染进程
+                view = self.open_widget_view(widget, primaries if share_renderer else None, show=False)
+                if view and state == "preload":
+                    view.suspend(SCHEDULE_SUSPEND_REASON, freeze=False)
+                elif view:
+                    revealed.append(view)
+            self.animator.show_views(revealed)
+            self.update_schedule()
+            self.metrics_timer.start()
             
             # 隐藏主窗口到系统托盘
             self.hide_to_tray()
-            self.show_notification("启动成功", f"已启动 {len(self.web_widgets)} 个网页小部件")
+            self.show_notification("启动成功", f"已启动 {len(self.active_web_views)} 个网页小部件")
         except Exception as e:
             QMessageBox.critical(self, "启动错误", f"无法启动网页小部件: {str(e)}")
         
+    def open_widget_view(self, widget, primaries=None, show=True):
+        """创建并显示一个小部件，加入已打开列表"""
+        group = self.widget_host_group(widget)
+        if group:
+            if not self.host_supervisor.has_widget(group, widget["id"]):
+                # 运行中新增的小部件，分组的宿主进程可能还没启动
+                self.host_supervisor.add_widget(group, widget["id"], widget, self.app_settings)
+            web_view = HostedWidget(self.host_supervisor, group, widget["id"], widget, self)
+        else:
+            web_view = self.create_widget_view(widget, primaries)
+        if web_view is None:
+            return None
+        if not isinstance(web_view, HostedWidget):
+            web_view.on_resized = self.on_view_resized
+        if show:
+            web_view.show()
+        if self.session_detector and self.session_detector.away:
+            web_view.suspend(SESSION_SUSPEND_REASON)
+        if place_widget(widget, self.app_settings.get("screen_fallback", "park")) is None:
+            web_view.suspend(SCREEN_SUSPEND_REASON)
+            self.parked_views.add(web_view)
+        self.active_web_views.append(web_view)
+
+        # 添加到已打开列表
+        item = QListWidgetItem(widget["name"])
+        item.setData(Qt.UserRole, widget["id"])  # 存储小部件编号
+        item.setToolTip(f"合成路径: {web_view.composition}")
+        self.opened_widgets_list.addItem(item)
+        self.opened_items[web_view] = (item, widget["name"])
+        return web_view
+
+    def watch_screen(self, screen):
+        screen.geometryChanged.connect(self.relayout_timer.start)
+        screen.availableGeometryChanged.connect(self.relayout_timer.start)
+        screen.logicalDotsPerInchChanged.connect(self.relayout_timer.start)
+        self.relayout_timer.start()
+
+    def relayout_widgets(self):
+        """屏幕变化后先算出所有小部件的新位置，再一次性移动；无处可放的暂停，屏幕回来后恢复"""
+        fallback = self.app_settings.get("screen_fallback", "park")
+        for overlay in self.overlays.values():
+            screen = screen_by_name(overlay.screen_name)
+            if screen:
+                overlay.setGeometry(screen.geometry())
+
+        moves, park, unpark = [], [], []
+        for widget in self.web_widgets:
+            placement = place_widget(widget, fallback)
+            view = self.view_for(widget["id"])
+            # 叠加窗口里的小部件只能留在原来的屏幕上
+            overlay = getattr(view, "overlay", None)
+            if placement is not None and overlay:
+                screen = screen_of_rect(placement[0], placement[1], widget["width"], widget["height"])
+                if screen is None or screen.name() != overlay.screen_name:
+                    placement = None
+            if placement is not None and placement != (widget["x"], widget["y"]):
+                widget["x"], widget["y"] = placement
+                if view:
+                    moves.append((view, widget))
+            if view is None:
+                continue
+            if placement is None and view not in self.parked_views:
+                park.append(view)
+            elif placement is not None and view in self.parked_views:
+                unpark.append(view)
+
+        for view, widget in moves:
+            self.set_view_geometry(view, widget)
+        for view in park:
+            self.parked_views.add(view)
+            view.suspend(SCREEN_SUSPEND_REASON)
+        for view in unpark:
+            self.parked_views.discard(view)
+            view.resume(SCREEN_SUSPEND_REASON)
+        if moves or park or unpark:
+            print(f"屏幕变化：移动 {len(moves)} 个，暂停 {len(park)} 个，恢复 {len(unpark)} 个小部件")
+
+    def update_schedule(self):
+        self.scheduler.set_widgets(
+            self.web_widgets, self.app_settings.get("schedule_preload_minutes", SCHEDULE_PRELOAD_MINUTES))
+
+    def apply_schedule_state(self, widget_id, state):
+        """时段外卸载小部件，提前加载时只创建不显示，进入时段后显示"""
+        widget = next((w for w in self.web_widgets if w["id"] == widget_id), None)
+        if widget is None:
+            return
+        view = self.view_for(widget_id)
+        if state == "off":
+            if view:
+                self.close_widget_view(view)
+            return
+        if view is None:
+            view = self.open_widget_view(widget, show=False)
+            if view is None:
+                return
+        if state == "preload":
+            view.suspend(SCHEDULE_SUSPEND_REASON, freeze=False)
+        else:
+            view.resume(SCHEDULE_SUSPEND_REASON)
+
+    def widget_host_group(self, widget):
+        """网页小部件所在的宿主进程分组，没有时在主进程中运行"""
+        if widget.get("type", WEB_WIDGET_TYPE) != WEB_WIDGET_TYPE:
+            return None
+        return widget.get("host_group") or None
+
+    def overlay_for(self, widget):
+        """叠加窗口模式下小部件所在屏幕的叠加窗口，按需创建"""
+        screen = screen_of_rect(widget["x"], widget["y"], widget["width"], widget["height"]) or QApplication.primaryScreen()
+        overlay = self.overlays.get(screen.name())
+        if overlay is None:
+            overlay = OverlayHost(screen)
+            self.overlays[screen.name()] = overlay
+        return overlay
+
+    def create_widget_view(self, widget, primaries=None):
+        """按配置创建小部件窗口；primaries 不为空时相同网址的网页小部件只渲染一次"""
+        # 叠加窗口模式下坐标换算成叠加窗口内的坐标
+        overlay = self.overlay_for(widget) if self.app_settings.get("overlay_mode") else None
+        x, y = widget["x"], widget["y"]
+        if overlay:
+            x -= overlay.x()
+            y -= overlay.y()
+
+        widget_type = widget.get("type", WEB_WIDGET_TYPE)
+        if widget_type != WEB_WIDGET_TYPE:
+            widget_class = native_widget_class(widget_type)
+            if widget_class is None:
+                print(f"未知的小部件类型: {widget_type}")
+                return None
+            view = widget_class(
+                widget,
+                opacity=widget["opacity"],
+                bg_color=widget["bg_color"],
+                x=x,
+                y=y,
+                width=widget["width"],
+                height=widget["height"],
+                always_on_top=widget["always_on_top"],
+                parent=overlay
+            )
+            if overlay:
+                overlay.host(view)
+            return view
+
+        primary = primaries.get(widget["url"]) if primaries is not None else None
+        if primary:
+            view = MirrorWebView(
+                primary,
+                opacity=widget["opacity"],
+                bg_color=widget["bg_color"],
+                x=x,
+                y=y,
+                width=widget["width"],
+                height=widget["height"],
+                always_on_top=widget["always_on_top"],
+                parent=overlay
+            )
+            if overlay:
+                overlay.host(view)
+            return view
+
+        web_view = DraggableWebView(
+            url=widget["url"],
+            opacity=widget["opacity"],
+            bg_color=widget["bg_color"],
+            x=x,
+            y=y,
+            width=widget["width"],
+            height=widget["height"],
+            always_on_top=widget["always_on_top"],
+            data_bus=self.data_bus if widget.get("data_bus") else None,
+            devtools=self.devtools,
+            profile=self.widget_profile(widget),
+            scripts=self.widget_scripts(widget),
+            parent=overlay
+        )
+        if overlay:
+            overlay.host(web_view)
+        if primaries is not None:
+            primaries[widget["url"]] = web_view
+        if self.app_settings.get("warmup_connections", True):
+            web_view.warmer = self.warmer
+        if self.reload_coordinator:
+            self.reload_coordinator.track(web_view)
+        web_view.set_refresh_interval(widget.get("refresh_interval", 0))
+        web_view.set_limits(widget.get("bandwidth_limit_kbps", 0), widget.get("request_rate_limit", 0))
+        web_view.set_zoom(widget.get("zoom", 1.0))
+        web_view.set_jank_policy(widget.get("jank_policy"))
+        web_view.jank_detected.connect(
+            lambda action, stats, widget_id=widget["id"]: self.on_widget_jank(widget_id, action, stats))
+        self.watch_metadata(web_view, widget["id"])
+        self.watch_downloads(web_view.page().profile())
+        return web_view
+
+    def setup_data_bus(self):
+        """按全局设置重建数据总线，只有小部件用到时才创建"""
+        if self.data_bus:
+            self.data_bus.shutdown()
+            self.data_bus.deleteLater()
+            self.data_bus = None
+        if not any(widget.get("data_bus") for widget in self.web_widgets):
+            return
+        self.data_bus = DataBus(
+            sources=self.app_settings.get("data_sources", []),
+            socket_name=self.app_settings.get("data_bus_socket"),
+            parent=self
+        )
+
+    def warm_connections(self):
+        """按存储分区汇总将要打开的网页小部件的源，去重后预热；宿主进程里的小部件不在这里预热"""
+        if not self.app_settings.get("warmup_connections", True):
+            return
+        origins = {}
+        for widget in self.web_widgets:
+            if widget.get("type", WEB_WIDGET_TYPE) != WEB_WIDGET_TYPE or self.widget_host_group(widget):
+                continue
+            if self.scheduler.state_of(widget) == "off":
+                continue
+            origins.setdefault(widget.get("profile"), set()).add(url_origin(widget.get("url", "")))
+        for name, profile_origins in origins.items():
+            self.warmer.warm(profile_origins, self.widget_profile({"profile": name}))
+
+    def widget_scripts(self, widget):
+        return self.snippets.scripts_for(widget, self.app_settings.get("snippets", {}))
+
+    def widget_profile(self, widget):
+        """小部件使用的存储分区，多个小部件引用同一名称时共用"""
+        name = widget.get("profile")
+        return self.profile_manager.get(name, self.app_settings.get("profiles", {}).get(name, {}))
+
+    def refresh_profile_usage(self):
+        profiles = self.app_settings.get("profiles", {})
+        self.profile_usage_list.clear()
+        if not profiles:
+            self.profile_usage_list.addItem("尚未配置命名存储分区")
+            return
+        self.profile_usage_list.addItem("正在统计...")
+        self.profile_manager.measure_usage(profiles)
+
+    def show_profile_usage(self, usage):
+        self.profile_usage_list.clear()
+        for name, size in sorted(usage.items()):
+            users = sum(1 for widget in self.web_widgets if widget.get("profile") == name)
+            self.profile_usage_list.addItem(f"{name}: {size / 1024 / 1024:.1f} MB（{users} 个小部件）")
+
+    def update_profile_choices(self):
+        current = self.profile_combo.currentText()
+        self.profile_combo.clear()
+        self.profile_combo.addItem(DEFAULT_PROFILE_LABEL)
+        self.profile_combo.addItems(sorted(self.app_settings.get("profiles", {})))
+        self.profile_combo.setCurrentText(current or DEFAULT_PROFILE_LABEL)
+
+    def setup_reload_coordinator(self):
+        """按当前设置创建重新加载协调器"""
+        if self.reload_coordinator:
+            self.reload_coordinator.deleteLater()
+        self.reload_coordinator = ReloadCoordinator(
+            probe_url=self.app_settings.get("connectivity_probe_url"),
+            stale_after=self.app_settings.get("stale_after_minutes", 30) * 60,
+            parent=self
+        )
+
+    def reload_failed_widgets(self):
+        """只重新加载失败或过期的小部件，正常的不受影响"""
+        if self.reload_coordinator:
+            self.reload_coordinator.reconcile()
+
+    def setup_devtools(self):
+        """调试端口只能在启动时设置，这里只在端口真正启用时创建客户端"""
+        if self.devtools or not os.environ.get("QTWEBENGINE_REMOTE_DEBUGGING"):
+            return
+        port = self.app_settings.get("devtools_port")
+        if not port:
+            return
+        self.devtools = DevToolsClient(port, self.app_settings.get("devtools_capture_seconds", 5), self)
+        self.devtools.notify.connect(self.show_notification)
+
+    @traced("close_all_widgets")
     def close_all_widgets(self):
         """关闭所有活动的网页视图"""
+        self.animator.finish()
+        self.widgets_hidden = False
+        self.update_visibility_action()
         for web_view in self.active_web_views:
             if web_view:
                 try:
-                    web_view.close()
+                    release_view(web_view)
                 except Exception as e:
                     print(f"关闭小部件时出错: {e}")
     
@@ -577,6 +5183,108 @@ class SettingsWindow(QMainWindow):
 
         # 清空已打开列表
         self.opened_widgets_list.clear()
+        self.opened_items = {}
+        self.metrics_timer.stop()
+        self.scheduler.stop()
+        self.parked_views = set()
+        if self.reload_coordinator:
+            self.reload_coordinator.clear()
+        self.host_supervisor.shutdown()
+
+        # 叠加窗口随托管的小部件一起销毁
+        for overlay in self.overlays.values():
+            overlay.close()
+            overlay.deleteLater()
+        self.overlays = {}
+
+    def watch_downloads(self, profile):
+        """下载流量也算到发起下载的小部件上"""
+        if profile in self.download_profiles:
+            return
+        self.download_profiles.add(profile)
+        profile.downloadRequested.connect(self.on_download_requested)
+
+    def on_download_requested(self, download):
+        view = next((v for v in self.active_web_views if isinstance(v, DraggableWebView) and v.page() is download.page()), None)
+        if view is None:
+            return
+        received = [0]
+
+        def on_progress(bytes_received, bytes_total):
+            # 下载转交给下载管理后不再出现在页面的网络事件里，两种来源都要计入
+            view.meter.add_bytes(bytes_received - received[0], view.meter.source)
+            received[0] = bytes_received
+        download.downloadProgress.connect(on_progress)
+
+    def update_opened_metrics(self):
+        """在已打开列表中显示每个小部件的流量"""
+        for view, (item, name) in self.opened_items.items():
+            if not isinstance(view, DraggableWebView):
+                continue
+            stats = view.meter.snapshot()
+            estimated = stats["bytes_source"] != "network"
+            text = f"{name}  {'≥' if estimated else ''}{format_bytes(stats['total_bytes'])} · {stats['total_requests']} 请求"
+            if stats["over_budget"]:
+                text += " · 已限流"
+            elif stats["estimate_over_budget"]:
+                text += " · 估算超出流量上限"
+            item.setText(text)
+            item.setToolTip(
+                f"合成路径: {view.composition}\n"
+                f"速率: {stats['rate_kbps']} kbps{'（页面内估算，下限）' if estimated else '（网络层统计）'}，"
+                f"{stats['requests_per_minute']} 请求/分钟\n"
+                f"已拦截请求: {stats['blocked_requests']}")
+
+    def collect_metrics(self):
+        """汇总运行指标，供导出使用"""
+        widgets = []
+        for view, (_, name) in self.opened_items.items():
+            entry = {"name": name, "composition": view.composition}
+            if isinstance(view, DraggableWebView):
+                entry["url"] = view.url().toString()
+                entry["bandwidth"] = view.meter.snapshot()
+                entry["zoom"] = round(view.zoomFactor(), 2)
+                entry["first_paint_ms"] = view.first_paint_ms
+                entry["launch_to_paint_ms"] = view.launch_to_paint_ms
+                entry["jank"] = dict(view.jank.snapshot(), action=view.jank_action, low_power=view.low_power)
+            widgets.append(entry)
+        metrics = {"time": time.strftime("%Y-%m-%d %H:%M:%S"), "widgets": widgets,
+                   "warmup_connections": self.app_settings.get("warmup_connections", True),
+                   "warmup_ms": dict(self.warmer.results)}
+        if self.watchdog:
+            metrics["stalls"] = {
+                "histogram": self.watchdog.histogram_text(),
+                "worst_ms": [round(duration) for duration, _, _ in self.watchdog.worst],
+            }
+        return metrics
+
+    def export_metrics(self):
+        self.start_task(self.write_metrics(), "导出运行指标")
+
+    async def write_metrics(self):
+        """在界面线程收集指标，写文件放到线程池"""
+        path = time.strftime("metrics_%Y%m%d_%H%M%S.json")
+        data = json.dumps(self.collect_metrics(), indent=2, ensure_ascii=False)
+
+        def write():
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        try:
+            await self.run_blocking(write)
+            self.show_notification("指标已导出", f"运行指标已写入 {os.path.abspath(path)}")
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", f"无法导出运行指标: {str(e)}")
+
+    def start_task(self, coro, name=None, timeout=None):
+        """在 Qt 事件循环上运行协程，返回 asyncio.Task"""
+        return self.tasks.start(coro, name, timeout)
+
+    def cancel_task(self, name):
+        self.tasks.cancel(name)
+
+    def run_blocking(self, func, *args):
+        """把阻塞操作放到线程池，在协程里 await 结果"""
+        return self.tasks.run_blocking(func, *args)
         
     def hide_to_tray(self):
         # 如果托盘图标已存在，直接隐藏窗口
@@ -597,13 +5305,32 @@ class SettingsWindow(QMainWindow):
     
         restart_action = tray_menu.addAction("重启网页小部件")
         restart_action.triggered.connect(self.launch_widgets)
+
+        reload_failed_action = tray_menu.addAction("重新加载失败的网页")
+        reload_failed_action.triggered.connect(self.reload_failed_widgets)
     
         close_all_action = tray_menu.addAction("关闭所有网页")
-        close_all_action.triggered.connect(self.close_all_widgets)
+        close_all_action.triggered.connect(self.fade_out_all_widgets)
+
+        self.visibility_action = tray_menu.addAction("隐藏所有网页")
+        self.visibility_action.triggered.connect(self.toggle_widgets_visible)
     
         # 添加全局置顶菜单项
         pin_action = tray_menu.addAction("所有网页置顶" if not self.global_pinned else "取消所有置顶")
         pin_action.triggered.connect(self.toggle_all_pin_from_tray)
+
+        stall_action = tray_menu.addAction("最近卡顿")
+        stall_action.triggered.connect(self.show_stall_report)
+
+        tasks_action = tray_menu.addAction("后台任务")
+        tasks_action.triggered.connect(self.show_task_report)
+
+        metrics_action = tray_menu.addAction("导出运行指标")
+        metrics_action.triggered.connect(self.export_metrics)
+
+        if TRACE_ENABLED:
+            trace_action = tray_menu.addAction("导出性能追踪")
+            trace_action.triggered.connect(self.export_trace)
     
         tray_menu.addSeparator()
     
@@ -618,33 +5345,34 @@ class SettingsWindow(QMainWindow):
         # 隐藏窗口
         self.hide()
 
+    @traced("tray.toggle_all_pin")
     def toggle_all_pin_from_tray(self):
         self.global_pinned = not self.global_pinned
         self.global_always_on_top.setChecked(self.global_pinned)
         self.toggle_all_pin(Qt.Checked if self.global_pinned else Qt.Unchecked)
     
         
-    def animate_window(self, window, show):
-        # 如果窗口已经显示，直接返回
-        if show and window.isVisible():
-            return
-            
-        animation = QPropertyAnimation(window, b"windowOpacity")
-        animation.setDuration(300)
-        animation.setEasingCurve(QEasingCurve.InOutQuad)
-        
-        if show:
-            window.setWindowOpacity(0.0)  # 确保从透明开始
-            window.show()
-            animation.setStartValue(0.0)
-            animation.setEndValue(1.0)
+    @traced("tray.close_all")
+    def fade_out_all_widgets(self):
+        self.animator.hide_views(self.active_web_views, done=self.close_all_widgets)
+
+    @traced("tray.toggle_visible")
+    def toggle_widgets_visible(self):
+        """从托盘隐藏或显示所有小部件，隐藏期间页面冻结"""
+        views = list(self.active_web_views)
+        self.widgets_hidden = not self.widgets_hidden
+        if self.widgets_hidden:
+            self.animator.hide_views(views, done=lambda: [view.suspend(TRAY_SUSPEND_REASON) for view in views])
         else:
-            animation.setStartValue(1.0)
-            animation.setEndValue(0.0)
-            animation.finished.connect(window.hide)
-        
-        animation.start()
+            self.animator.show_views(views, reveal=lambda view: view.resume(TRAY_SUSPEND_REASON),
+                                     reason=TRAY_SUSPEND_REASON)
+        self.update_visibility_action()
+
+    def update_visibility_action(self):
+        if self.tray_icon:
+            self.visibility_action.setText("显示所有网页" if self.widgets_hidden else "隐藏所有网页")
         
+    @traced("tray.show_settings")
     def show_from_tray(self):
         self.setWindowOpacity(1.0)
         self.show()
@@ -659,32 +5387,145 @@ class SettingsWindow(QMainWindow):
         if self.tray_icon:
             self.tray_icon.showMessage(title, message, QSystemTrayIcon.Information, 2000)
         
+    @traced("save_config")
     def save_config(self):
         try:
-            with open(CONFIG_FILE, "w") as f:
-                json.dump(self.web_widgets, f, indent=2)
+            data = json.dumps({"settings": self.app_settings, "web_widgets": self.web_widgets}, indent=2).encode("utf-8")
+            # 先登记再写入，避免把自己的修改当成外部修改重新加载
+            if getattr(self, "config_watcher", None):
+                self.config_watcher.mark_written(data)
+            with open(CONFIG_FILE, "wb") as f:
+                f.write(data)
         except Exception as e:
             QMessageBox.warning(self, "保存失败", f"无法保存配置: {str(e)}")
         
+    @traced("load_config")
     def load_config(self):
         if os.path.exists(CONFIG_FILE):
             try:
-                with open(CONFIG_FILE, "r") as f:
-                    self.web_widgets = json.load(f)
-                    for widget in self.web_widgets:
-                        name = widget.get("name", "网页小部件")
-                        item = QListWidgetItem(name)
-                        item.setFlags(item.flags() | Qt.ItemIsEditable)
-                        self.widget_list.addItem(item)
+                self.app_settings, self.web_widgets = read_config_file()
+                for widget in self.web_widgets:
+                    widget.setdefault("id", new_widget_id())
+                    if "screen" not in widget:
+                        anchor_to_screen(widget)
+                    name = widget.get("name", "网页小部件")
+                    item = QListWidgetItem(name)
+                    item.setData(Qt.UserRole, widget["id"])
+                    item.setFlags(item.flags() | Qt.ItemIsEditable)
+                    self.decorate_widget_item(item, widget)
+                    self.widget_list.addItem(item)
             except:
+                self.app_settings = {}
                 self.web_widgets = []
                 self.add_widget()  # 添加默认小部件
         else:
             self.add_widget()  # 添加默认小部件
+        self.sync_global_settings_ui()
+
+    def sync_global_settings_ui(self):
+        """把全局设置同步到界面控件"""
+        self.share_renderer_check.setChecked(self.app_settings.get("share_renderer", False))
+        self.overlay_mode_check.setChecked(self.app_settings.get("overlay_mode", False))
+        self.watchdog_check.setChecked(self.app_settings.get("stall_watchdog", {}).get("enabled", False))
+        self.pause_when_away_check.setChecked(self.app_settings.get("pause_when_away", True))
+        self.warmup_check.setChecked(self.app_settings.get("warmup_connections", True))
+        port = self.app_settings.get("devtools_port")
+        self.devtools_port_edit.setText(str(port) if port else "")
+        self.render_scale_combo.setCurrentText(f"{round(render_scale_of(self.app_settings) * 100)}%")
+        self.update_profile_choices()
+        self.refresh_profile_usage()
+
+    def toggle_watchdog(self, state):
+        """开关事件循环卡顿检测"""
+        watchdog_settings = self.app_settings.setdefault("stall_watchdog", {})
+        watchdog_settings["enabled"] = (state == Qt.Checked)
+        if watchdog_settings["enabled"] and not self.watchdog:
+            self.watchdog = EventLoopWatchdog(watchdog_settings.get("threshold_ms", 200), self)
+            self.watchdog.start()
+        elif not watchdog_settings["enabled"] and self.watchdog:
+            self.watchdog.stop()
+            self.watchdog.deleteLater()
+            self.watchdog = None
+
+    def toggle_pause_when_away(self, state):
+        """开关锁屏和空闲检测，关闭时恢复已经暂停的小部件"""
+        self.app_settings["pause_when_away"] = (state == Qt.Checked)
+        if self.app_settings["pause_when_away"] and not self.session_detector:
+            self.session_detector = create_session_detector(
+                self.app_settings.get("session_detector", "auto"),
+                self.app_settings.get("idle_minutes", SESSION_IDLE_MINUTES),
+                self
+            )
+            self.session_detector.away_changed.connect(self.on_away_changed)
+            self.session_detector.start()
+        elif not self.app_settings["pause_when_away"] and self.session_detector:
+            self.session_detector.stop()
+            self.session_detector.deleteLater()
+            self.session_detector = None
+            self.on_away_changed(False, "")
+
+    def on_away_changed(self, away, reason):
+        self.cancel_task("恢复小部件")
+        if away:
+            print(f"{reason}，暂停所有小部件")
+            for view in self.active_web_views:
+                view.suspend(SESSION_SUSPEND_REASON)
+        else:
+            self.start_task(self.resume_views(), "恢复小部件")
+
+    async def resume_views(self):
+        """逐个恢复，避免所有页面同时解冻重绘"""
+        for view in list(self.active_web_views):
+            if view in self.active_web_views:
+                view.resume(SESSION_SUSPEND_REASON)
+            await asyncio.sleep(SESSION_RESUME_STAGGER_MS / 1000)
+
+    def export_trace(self):
+        """导出追踪数据，可拖进 https://ui.perfetto.dev 查看"""
+        path = time.strftime("trace_%Y%m%d_%H%M%S.json")
+        try:
+            count = TRACER.export(path)
+            self.show_notification("追踪已导出", f"{count} 个事件已写入 {os.path.abspath(path)}")
+        except OSError as e:
+            QMessageBox.warning(self, "导出失败", f"无法导出追踪数据: {str(e)}")
+
+    def show_stall_report(self):
+        """显示最近最严重的几次卡顿"""
+        if not self.watchdog:
+            QMessageBox.information(self, "卡顿记录", "卡顿检测未开启，可在设置界面勾选“卡顿检测”")
+            return
+        if not self.watchdog.worst:
+            QMessageBox.information(self, "卡顿记录", "暂无卡顿记录")
+            return
+        lines = []
+        for duration_ms, when, stack in self.watchdog.worst:
+            # 只显示调用栈最内层的一行
+            last_line = stack.strip().splitlines()[-1].strip() if stack.strip() else ""
+            lines.append(f"{when}  {duration_ms:.0f}ms  {last_line}")
+        lines.append("")
+        lines.append(self.watchdog.histogram_text())
+        QMessageBox.information(self, "最近卡顿", "\n".join(lines))
         
+    def show_task_report(self):
+        """显示正在运行的后台任务，可能卡住的排在前面"""
+        rows = self.tasks.snapshot()
+        lines = []
+        for row in sorted(rows, key=lambda row: not row["stuck"]):
+            mark = "可能卡住  " if row["stuck"] else ""
+            lines.append(f"{mark}{row['name']}  已运行 {row['age']:.0f}s  {row['where']}")
+        if self.tasks.slow_ticks:
+            lines.append("")
+            lines.append("阻塞界面线程的记录:")
+            lines.extend(f"{when}  {duration_ms:.0f}ms" for when, duration_ms in self.tasks.slow_ticks)
+        QMessageBox.information(self, "后台任务", "\n".join(lines) if lines else "没有正在运行的后台任务")
+
+    @traced("close_app")
     def close_app(self):
         self.save_config()
         self.close_all_widgets()
+        self.tasks.shutdown()
+        if self.watchdog:
+            self.watchdog.stop()
         QApplication.quit()
         
     def closeEvent(self, event):
@@ -715,7 +5556,374 @@ class SettingsWindow(QMainWindow):
             self.hide_to_tray()
             event.accept()
 
+# 基准测试：python main.py --benchmark <场景> [--seconds N] [--url 网址]，结果以 JSON 打印
+BENCHMARK_SECONDS = 10
+BENCHMARK_LOAD_TIMEOUT_MS = 30000
+BENCHMARK_SETTLE_MS = 1000          # 加载完成后等页面稳定再开始计时
+BENCHMARK_LONG_FRAME_MS = 25        # 超过这个间隔的帧算作掉帧
+BENCHMARK_TRIALS = 5
+BENCHMARK_RTT_MS = 100              # 替身服务器模拟的网络往返时间
+BENCHMARK_POLL_MS = 50
+# 合成路径基准：同一个页面分别用三种合成路径显示，比较帧间隔和界面进程的 CPU 占用
+BENCHMARK_COMPOSITIONS = (
+    (COMPOSITION_OPAQUE, 1.0, "#ff202020"),
+    (COMPOSITION_WINDOW_OPACITY, 0.8, "#ff202020"),
+    (COMPOSITION_PER_PIXEL, 1.0, "#80202020"),
+)
+BENCHMARK_PAGE_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><style>
+body { margin: 0; overflow: hidden; color: #ecf0f1; font: 24px sans-serif; }
+.box { position: absolute; width: 120px; height: 120px; border-radius: 12px;
+       background: linear-gradient(135deg, #3498db, #9b59b6); animation: move 2s ease-in-out infinite alternate; }
+@keyframes move { from { transform: translate(20px, 20px) rotate(0deg); }
+                  to { transform: translate(calc(100vw - 160px), calc(100vh - 160px)) rotate(360deg); } }
+</style></head><body><div class="box"></div><div class="box" style="animation-delay: -1s"></div><p id="clock"></p>
+<script>setInterval(function () { document.getElementById("clock").textContent = new Date().toISOString(); }, 50);</script>
+</body></html>"""
+# 用 requestAnimationFrame 记录帧间隔，合成跟不上时帧间隔变长
+BENCHMARK_FRAMES_JS = """
+(function () {
+    var last = 0, intervals = [];
+    window.__pyglassFrames = intervals;
+    function tick(now) {
+        if (window.__pyglassFrames !== intervals) return;
+        if (last) intervals.push(now - last);
+        last = now;
+        requestAnimationFrame(tick);
+    }
+    requestAnimationFrame(tick);
+})();
+"""
+BENCHMARK_FRAMES_RESULT_JS = """
+(function () {
+    var d = (window.__pyglassFrames || []).slice().sort(function (a, b) { return a - b; });
+    window.__pyglassFrames = null;
+    if (!d.length) return null;
+    var sum = d.reduce(function (a, b) { return a + b; }, 0);
+    return JSON.stringify({
+        frames: d.length, mean_ms: sum / d.length, p95_ms: d[Math.floor(d.length * 0.95)], max_ms: d[d.length - 1],
+        long_frames: d.filter(function (v) { return v > %(long)d; }).length});
+})()
+""" % {"long": BENCHMARK_LONG_FRAME_MS}
+
+def benchmark_wait(ms, signal=None):
+    """运行事件循环，直到超时或 signal 触发"""
+    loop = QEventLoop()
+    if signal is not None:
+        signal.connect(loop.quit)
+    QTimer.singleShot(int(ms), loop.quit)
+    loop.exec_()
+    if signal is not None:
+        signal.disconnect(loop.quit)
+
+def benchmark_until(predicate, timeout_ms=BENCHMARK_LOAD_TIMEOUT_MS):
+    """运行事件循环直到条件成立或超时，返回条件是否成立"""
+    deadline = time.monotonic() + timeout_ms / 1000
+    while not predicate() and time.monotonic() < deadline:
+        benchmark_wait(BENCHMARK_POLL_MS)
+    return predicate()
+
+def benchmark_js(view, code, timeout_ms=5000):
+    """同步执行页面脚本并取回结果"""
+    result = []
+    loop = QEventLoop()
+    view.page().runJavaScript(code, lambda value: (result.append(value), loop.quit()))
+    QTimer.singleShot(timeout_ms, loop.quit)
+    if not result:
+        loop.exec_()
+    return result[0] if result else None
+
+def benchmark_composition(options):
+    """主进程的 CPU 时间包括界面线程和 Chromium 浏览器进程一侧的合成，系统合成器的开销不在其中"""
+    seconds = options["seconds"]
+    url = options["url"] or "data:text/html;charset=utf-8," + urllib.parse.quote(BENCHMARK_PAGE_HTML)
+    results = {}
+    for composition, opacity, bg_color in BENCHMARK_COMPOSITIONS:
+        view = DraggableWebView(url, opacity, bg_color, 100, 100, 800, 600, False)
+        if view.composition != composition:
+            raise RuntimeError(f"{bg_color} 选择了 {view.composition}，预期 {composition}")
+        view.show()
+        benchmark_wait(BENCHMARK_LOAD_TIMEOUT_MS, view.loadFinished)
+        benchmark_wait(BENCHMARK_SETTLE_MS)
+        benchmark_js(view, BENCHMARK_FRAMES_JS)
+        cpu, start = time.process_time(), time.perf_counter()
+        benchmark_wait(seconds * 1000)
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        frames = json.loads(benchmark_js(view, BENCHMARK_FRAMES_RESULT_JS) or "{}")
+        entry = {key: round(value, 2) for key, value in frames.items()}
+        entry["gui_cpu_percent"] = round(cpu / elapsed * 100, 1)
+        results[composition] = entry
+        release_view(view)
+        benchmark_wait(BENCHMARK_SETTLE_MS)
+    return results
+
+BENCHMARK_STAND_IN_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>PyGlassPane</title></head>
+<body><h1>PyGlassPane</h1><p>stand-in</p></body></html>"""
+
+class StandInServer:
+    """本机替身服务器：HTTP 或自签名证书的 HTTPS，可以随时开关；
+    每个新连接延迟 rtt_ms 模拟 TCP 握手，HTTPS 再延迟一次模拟 TLS 握手，复用的连接没有延迟"""
+
+    def __init__(self, tls=False, rtt_ms=0, html=BENCHMARK_STAND_IN_HTML):
+        self.rtt_ms = rtt_ms
+        self.html = html
+        self.context = self.make_context() if tls else None
+        self.port = 0           # 第一次启动时分配，之后重启沿用同一个端口
+        self.server = None
+        self.connections = set()
+        self.requests = 0
+
+    @staticmethod
+    def make_context():
+        """用 openssl 生成一次性的自签名证书，浏览器一侧需要 --ignore-certificate-errors"""
+        directory = tempfile.mkdtemp(prefix="pyglasspane-benchmark-")
+        cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+        subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                        "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert], check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        return context
+
+    @property
+    def origin(self):
+        return f"{'https' if self.context else 'http'}://127.0.0.1:{self.port}"
+
+    @property
+    def running(self):
+        return self.server is not None
+
+    def start(self):
+        stand_in = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # 保持连接，预热的连接才能被复用
+
+            def setup(self):
+                handshakes = 2 if stand_in.context else 1
+                time.sleep(stand_in.rtt_ms * handshakes / 1000)
+                if stand_in.context:
+                    self.request = stand_in.context.wrap_socket(self.request, server_side=True)
+                stand_in.connections.add(self.request)
+                super().setup()
+
+            def finish(self):
+                super().finish()
+                stand_in.connections.discard(self.request)
+
+            def send_page(self, with_body):
+                stand_in.requests += 1
+                body = stand_in.html.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self.send_page(True)
+
+            def do_HEAD(self):
+                self.send_page(False)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(http.server.ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass    # 关闭服务器时断开的连接和证书被拒绝的握手都不用打印
+
+        self.server = Server(("127.0.0.1", self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        """停止监听并断开已有的连接，模拟网络断开"""
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server.server_close()
+        self.server = None
+        for conn in list(self.connections):
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.connections.clear()
+
+def benchmark_launch_to_paint(url, profile):
+    """创建小部件到首次内容绘制的时间，超时返回 None"""
+    view = DraggableWebView(url, 1.0, "#ff202020", 100, 100, 400, 300, False, profile=profile)
+    view.show()
+    benchmark_until(lambda: view.launch_to_paint_ms is not None)
+    result = view.launch_to_paint_ms
+    release_view(view)
+    return result
+
+def summarize_ms(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return {"samples": 0}
+    return {"samples": len(values), "median_ms": round(statistics.median(values)),
+            "min_ms": round(min(values)), "max_ms": round(max(values))}
+
+def benchmark_warmup(options):
+    """本机 HTTPS 替身服务器上比较不预热和预热后，创建小部件到首次内容绘制的时间；
+    每次都用新的临时存储分区，连接池互不影响，两种方式交替进行"""
+    server = StandInServer(tls=True, rtt_ms=options["rtt_ms"])
+    server.start()
+    url = server.origin + "/"
+    samples = {"cold": [], "warm": [], "warmup": []}
+    profiles = []   # 页面销毁之前不能释放存储分区
+    try:
+        for _ in range(options["trials"]):
+            for mode in ("cold", "warm"):
+                profile = QWebEngineProfile()
+                profiles.append(profile)
+                if mode == "warm":
+                    warmer = ConnectionWarmer()
+                    warmer.warm([server.origin], profile)
+                    benchmark_until(lambda: profile not in warmer.busy)
+                    samples["warmup"].append(warmer.results.get(server.origin))
+                    warmer.deleteLater()
+                samples[mode].append(benchmark_launch_to_paint(url, profile))
+                benchmark_wait(BENCHMARK_SETTLE_MS)
+    finally:
+        server.stop()
+    cold, warm = summarize_ms(samples["cold"]), summarize_ms(samples["warm"])
+    results = {"cold": cold, "warm": warm, "warmup": summarize_ms(samples["warmup"]),
+               "samples": samples, "stand_in_requests": server.requests}
+    if cold["samples"] and warm["samples"]:
+        results["gain_ms"] = cold["median_ms"] - warm["median_ms"]
+    return results
+
+def benchmark_reload(options):
+    """本机 HTTP 替身服务器模拟断网和恢复：trials 个小部件加载完成后停掉服务器，其中一半在断网期间刷新失败；
+    断网 seconds 秒后恢复服务器并发出联网通知，统计断网期间的重试、恢复用时、错峰间隔和正常小部件被重新加载的次数"""
+    server = StandInServer(rtt_ms=options["rtt_ms"])
+    server.start()
+    coordinator = ReloadCoordinator(probe_url=server.origin + "/")
+    count = max(2, options["trials"])
+    views, loads = [], {}   # 小部件 -> 每次加载的 {"start", "end", "ok"}
+    for i in range(count):
+        view = DraggableWebView(f"{server.origin}/?widget={i}", 1.0, "#ff202020", 100 + i * 20, 100, 300, 200, False)
+        records = loads[view] = []
+
+        def started(records=records):
+            records.append({"start": time.monotonic(), "end": None, "ok": None})
+
+        def finished(ok, records=records):
+            if records:
+                records[-1].update(end=time.monotonic(), ok=ok)
+        view.loadStarted.connect(started)
+        view.loadFinished.connect(finished)
+        coordinator.track(view)
+        view.show()
+        views.append(view)
+    failed, healthy = views[:count // 2], views[count // 2:]
+    results = {"widgets": count, "failed": len(failed)}
+    try:
+        if not benchmark_until(lambda: all(coordinator.states[v]["ok"] for v in views)):
+            raise RuntimeError("小部件没有全部加载成功")
+        baseline = {view: len(loads[view]) for view in views}
+        # 断网：一半的小部件这时刷新，加载失败
+        server.stop()
+        for view in failed:
+            view.reload()
+        benchmark_until(lambda: all(coordinator.states[v]["ok"] is False for v in failed))
+        coordinator.probe()
+        benchmark_until(lambda: coordinator.online is False)
+        benchmark_wait(options["seconds"] * 1000)
+        # 每个失败的小部件手动刷新算一次，其余都是断网期间的重试
+        results["retries_while_offline"] = sum(len(loads[v]) - baseline[v] - 1 for v in failed)
+        # 恢复：服务器重新启动后像系统一样发出联网通知
+        server.start()
+        restored = time.monotonic()
+        coordinator.on_online_state_changed(True)
+        benchmark_until(lambda: all(coordinator.states[v]["ok"] for v in failed))
+        recovered = [loads[v][-1]["end"] for v in failed if loads[v] and loads[v][-1]["ok"]]
+        starts = sorted(record["start"] for v in views for record in loads[v] if record["start"] >= restored)
+        results.update({
+            "recovered": len(recovered),
+            "recovery_ms": round((max(recovered) - restored) * 1000) if recovered else None,
+            "stagger_ms": [round((b - a) * 1000) for a, b in zip(starts, starts[1:])],
+            "healthy_reloads": sum(len(loads[v]) - baseline[v] for v in healthy),
+            "stand_in_requests": server.requests,
+        })
+    finally:
+        coordinator.clear()
+        for view in views:
+            coordinator.untrack(view)
+            release_view(view)
+        coordinator.deleteLater()
+        server.stop()
+        benchmark_wait(BENCHMARK_SETTLE_MS)
+    return results
+
+# 场景 -> (函数, 需要的 Chromium 参数)
+BENCHMARKS = {
+    "composition": (benchmark_composition, ""),
+    "warmup": (benchmark_warmup, "--ignore-certificate-errors"),
+    "reload": (benchmark_reload, ""),
+}
+# 参数 -> (类型, 默认值)，命令行写作 --seconds、--rtt-ms
+BENCHMARK_OPTIONS = {
+    "seconds": (float, BENCHMARK_SECONDS),
+    "url": (str, None),
+    "trials": (int, BENCHMARK_TRIALS),
+    "rtt_ms": (int, BENCHMARK_RTT_MS),
+}
+
+def run_benchmark(argv):
+    kind = argv[argv.index("--benchmark") + 1] if argv.index("--benchmark") + 1 < len(argv) else ""
+    if kind not in BENCHMARKS:
+        print(f"用法: main.py --benchmark {{{'|'.join(BENCHMARKS)}}} [--seconds N] [--url 网址] [--trials N] [--rtt-ms N]")
+        return 2
+    options = {}
+    for name, (cast, default) in BENCHMARK_OPTIONS.items():
+        flag = "--" + name.replace("_", "-")
+        options[name] = cast(argv[argv.index(flag) + 1]) if flag in argv else default
+    function, chromium_flags = BENCHMARKS[kind]
+    if chromium_flags:
+        flags = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+        os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = f"{flags} {chromium_flags}".strip()
+    app = QApplication(argv)
+    results = function(options)
+    print(json.dumps({"benchmark": kind, "options": options, "results": results}, ensure_ascii=False, indent=2))
+    app.quit()
+    return 0
+
 if __name__ == "__main__":
+    if "--host" in sys.argv:
+        # 宿主进程：只承载主进程分配的一组网页小部件
+        group = sys.argv[sys.argv.index("--host") + 1]
+        server_name = sys.argv[sys.argv.index("--server") + 1]
+        # 默认存储分区按分组分开，避免和主进程争用同一个目录
+        QApplication.setApplicationName(f"PyGlassPane-{group}")
+        app = QApplication(sys.argv)
+        app.setQuitOnLastWindowClosed(False)
+        host = WidgetHost(server_name, group)
+        sys.exit(app.exec_())
+    if "--benchmark" in sys.argv:
+        sys.exit(run_benchmark(sys.argv))
+
+    # 远程调试端口和 Chromium 参数必须在创建 QApplication 之前设置，调试端口只监听本机
+    try:
+        startup_settings = read_config_file()[0]
+    except Exception:
+        startup_settings = {}
+    devtools_port = startup_settings.get("devtools_port")
+    if devtools_port:
+        os.environ["QTWEBENGINE_REMOTE_DEBUGGING"] = f"127.0.0.1:{devtools_port}"
+    # 宿主进程继承环境变量，渲染分辨率同样生效
+    render_scale = render_scale_of(startup_settings)
+    if render_scale < 1:
+        flags = os.environ.get("QTWEBENGINE_CHROMIUM_FLAGS", "")
+        os.environ["QTWEBENGINE_CHROMIUM_FLAGS"] = f"{flags} --force-device-scale-factor={render_scale}".strip()
+
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
     app.setQuitOnLastWindowClosed(False)  # 防止关闭所有窗口时退出应用